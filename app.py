@@ -3,7 +3,18 @@ from routes.main import main_bp
 from routes.student import student_bp
 from routes.teacher import teacher_bp
 from models import db
+from models.migrations import run_migrations
 from config import Config
+from services.http_cache import init_http_cache
+from services.tool_cache import init_tool_cache
+from services.view_counter import init_view_counter
+from services.answer_cache import init_answer_cache
+from services.jobs import init_job_runner
+from services.quiz_dedupe import init_quiz_index
+from services.rate_limit import init_rate_limiter
+from services.quiz_retrieval import init_quiz_retriever
+from services.bulk_import import init_bulk_import
+from services.data_export import init_data_export
 
 app = Flask(__name__)
 
@@ -13,14 +24,29 @@ app.config.from_object(Config)
 # 初始化数据库
 db.init_app(app)
 
+# 注册HTTP缓存与压缩中间件
+init_http_cache(app)
+init_tool_cache(app)
+init_answer_cache(app)
+init_quiz_index(app)
+init_quiz_retriever(app)
+init_rate_limiter(app)
+init_bulk_import(app)
+init_data_export(app)
+
 # 注册蓝图
 app.register_blueprint(main_bp)
 app.register_blueprint(student_bp)
 app.register_blueprint(teacher_bp)
 
-# 创建数据库表
+# 创建数据库表并执行迁移
 with app.app_context():
     db.create_all()
+    run_migrations()
+
+# 启动浏览次数后台写入和后台任务执行器
+init_view_counter(app)
+init_job_runner(app)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
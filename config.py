@@ -14,14 +14,107 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///quiz.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # HTTP缓存与压缩配置
+    APP_VERSION = os.getenv('APP_VERSION', '1.0.0')  # 参与ETag计算，发版后旧缓存自动失效
+    HTTP_COMPRESS_MIN_SIZE = int(os.getenv('HTTP_COMPRESS_MIN_SIZE', '1024'))  # 小于该字节数的响应不压缩
+    HTTP_COMPRESS_LEVEL = int(os.getenv('HTTP_COMPRESS_LEVEL', '6'))
+    SEND_FILE_MAX_AGE_DEFAULT = int(os.getenv('STATIC_CACHE_MAX_AGE', '86400'))  # static/ 静态资源缓存秒数
+    
+    # 工具内容缓存配置
+    TOOL_CACHE_MAX_BYTES = int(os.getenv('TOOL_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 缓存总容量（含压缩版本）
+    TOOL_CACHE_MAX_ENTRY_BYTES = int(os.getenv('TOOL_CACHE_MAX_ENTRY_BYTES', str(8 * 1024 * 1024)))  # 超过该大小的工具不缓存
+    TOOL_CACHE_REVALIDATE_SECONDS = float(os.getenv('TOOL_CACHE_REVALIDATE_SECONDS', '2'))  # 检查文件mtime的最小间隔
+    
+    # 工具上传配置
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))  # 请求体最大字节数，超出返回413
+    TOOL_UPLOAD_CHUNK_SIZE = int(os.getenv('TOOL_UPLOAD_CHUNK_SIZE', str(64 * 1024)))  # 流式保存上传文件的块大小
+    
+    # 工具浏览次数合并写入配置
+    TOOL_VIEWS_FLUSH_SECONDS = float(os.getenv('TOOL_VIEWS_FLUSH_SECONDS', '10'))  # 定期写入数据库的间隔
+    TOOL_VIEWS_MAX_PENDING = int(os.getenv('TOOL_VIEWS_MAX_PENDING', '1000'))  # 缓冲次数达到该值时提前写入
+    
     # DeepSeek API配置
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
-    DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+    DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com/v1')
+    DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+    
+    # 大模型调用网关配置
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))  # 单次调用读超时（秒）
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))  # 网络错误/限流/5xx时的重试次数
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))  # 退避基准时间（秒），实际等待带随机抖动
+    LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '20'))  # 每个进程的最大连接数
+    LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))  # 连续失败多少次后熔断
+    LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))  # 熔断持续时间（秒），之后只放行一个试探请求
     
     # AI聊天配置
     AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '1000'))
     AI_TEMPERATURE = float(os.getenv('AI_TEMPERATURE', '0.7'))
-    AI_MAX_HISTORY = int(os.getenv('AI_MAX_HISTORY', '20'))  # 最多保存20条历史消息
+    AI_MAX_HISTORY = int(os.getenv('AI_MAX_HISTORY', '20'))  # 每次最多携带20条历史消息
+    AI_HISTORY_TOKEN_BUDGET = int(os.getenv('AI_HISTORY_TOKEN_BUDGET', '2000'))  # 历史消息的token预算，超出的早期对话并入摘要
+    AI_SUMMARY_MAX_TOKENS = int(os.getenv('AI_SUMMARY_MAX_TOKENS', '300'))  # 早期对话摘要的token上限
+    AI_MAX_MESSAGE_CHARS = int(os.getenv('AI_MAX_MESSAGE_CHARS', '2000'))  # 单条提问的最大字数
+    
+    # AI回答缓存配置
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))  # 缓存有效期（秒）
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '1000'))
+    AI_CACHE_CONTEXT_MESSAGES = int(os.getenv('AI_CACHE_CONTEXT_MESSAGES', '2'))  # 参与缓存键计算的最近历史消息条数
+    
+    # AI聊天题库检索配置
+    AI_RETRIEVAL_ENABLED = os.getenv('AI_RETRIEVAL_ENABLED', 'true').lower() == 'true'
+    AI_RETRIEVAL_MIN_TERMS = int(os.getenv('AI_RETRIEVAL_MIN_TERMS', '4'))  # 问题切词后少于该数量时不检索
+    AI_RETRIEVAL_ANSWER_COVERAGE = float(os.getenv('AI_RETRIEVAL_ANSWER_COVERAGE', '0.9'))  # 最相关题目覆盖问题的比例达到该值时直接用题目回答
+    AI_RETRIEVAL_CONTEXT_COVERAGE = float(os.getenv('AI_RETRIEVAL_CONTEXT_COVERAGE', '0.2'))  # 达到该比例的题目作为参考资料附在请求中
+    AI_RETRIEVAL_CONTEXT_PASSAGES = int(os.getenv('AI_RETRIEVAL_CONTEXT_PASSAGES', '3'))  # 最多附带的参考题目数
+    AI_RETRIEVAL_PASSAGE_CHARS = int(os.getenv('AI_RETRIEVAL_PASSAGE_CHARS', '200'))  # 参考题目每个字段保留的最大字数
+    
+    # 智能出题配置
+    SMART_QUIZ_MAX_QUESTIONS = int(os.getenv('SMART_QUIZ_MAX_QUESTIONS', '50'))  # 每次最多生成的题目数
+    SMART_QUIZ_CHUNK_SIZE = int(os.getenv('SMART_QUIZ_CHUNK_SIZE', '5'))  # 每次调用大模型生成的题目数
+    SMART_QUIZ_MAX_CONCURRENCY = int(os.getenv('SMART_QUIZ_MAX_CONCURRENCY', '4'))  # 同一次出题最多并发的调用数
+    SMART_QUIZ_CHUNK_RETRIES = int(os.getenv('SMART_QUIZ_CHUNK_RETRIES', '1'))  # 单组解析失败后的重试次数
+    
+    # 题库查重配置
+    QUIZ_DEDUPE_THRESHOLD = float(os.getenv('QUIZ_DEDUPE_THRESHOLD', '0.8'))  # 内容相似度（Jaccard估计值）达到该值视为重复
+    QUIZ_DEDUPE_SKIP = os.getenv('QUIZ_DEDUPE_SKIP', 'true').lower() == 'true'  # 重复题目是否跳过不保存（否则只标记）
+    QUIZ_INDEX_SYNC_INTERVAL = float(os.getenv('QUIZ_INDEX_SYNC_INTERVAL', '5'))  # 查重和检索索引检查其他进程增删题目的最短间隔（秒）
+    
+    # 批量学生分析配置
+    ANALYSIS_BATCH_CONCURRENCY = int(os.getenv('ANALYSIS_BATCH_CONCURRENCY', '8'))  # 批量分析时同时进行的大模型调用数
+    ANALYSIS_BATCH_RATE_PER_MINUTE = float(os.getenv('ANALYSIS_BATCH_RATE_PER_MINUTE', '120'))  # 批量分析每分钟最多发起的调用数（必须大于0）
+    
+    # AI接口限流配置
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory')  # memory: 进程内；sqlite: 多个工作进程共享
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', '')  # 为空时使用 instance/rate_limit.db
+    AI_USER_RATE_PER_MINUTE = float(os.getenv('AI_USER_RATE_PER_MINUTE', '10'))  # 每个用户每个接口每分钟的请求数
+    AI_USER_BURST = int(os.getenv('AI_USER_BURST', '5'))  # 每个用户允许的突发请求数
+    AI_ENDPOINT_RATE_PER_MINUTE = float(os.getenv('AI_ENDPOINT_RATE_PER_MINUTE', '300'))  # 每个接口所有用户合计每分钟的请求数
+    AI_ENDPOINT_BURST = int(os.getenv('AI_ENDPOINT_BURST', '30'))  # 每个接口允许的突发请求数
+    AI_MAX_IN_FLIGHT = int(os.getenv('AI_MAX_IN_FLIGHT', '8'))  # 同时进行中的AI请求数上限
+    AI_IN_FLIGHT_LEASE_SECONDS = int(os.getenv('AI_IN_FLIGHT_LEASE_SECONDS', '300'))  # 共享模式下名额的最长占用时间，进程异常退出后自动回收
+    
+    # 试卷配置（自动组卷、批量编辑、后台删除）
+    PAPER_ASSEMBLY_MAX_QUESTIONS = int(os.getenv('PAPER_ASSEMBLY_MAX_QUESTIONS', '200'))  # 一次最多抽取的题目数
+    PAPER_MAX_QUESTIONS = int(os.getenv('PAPER_MAX_QUESTIONS', '500'))  # 批量编辑时一份试卷最多的题目数
+    PAPER_DELETE_BATCH_SIZE = int(os.getenv('PAPER_DELETE_BATCH_SIZE', '1000'))  # 后台删除试卷时每个事务删除的行数
+    PAPER_DELETE_BATCH_PAUSE = float(os.getenv('PAPER_DELETE_BATCH_PAUSE', '0.05'))  # 每批之间的间隔（秒），让出写锁给答题提交
+    
+    # 批量导入配置
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))  # 每个事务写入的行数
+    IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '100'))  # 结果中最多保留的出错行明细
+    IMPORT_MAX_CONTENT_LENGTH = int(os.getenv('IMPORT_MAX_CONTENT_LENGTH', str(4 * 1024 * 1024 * 1024)))  # 导入接口允许上传的最大字节数
+    IMPORT_UPLOAD_FOLDER = os.getenv('IMPORT_UPLOAD_FOLDER', os.path.join('instance', 'imports'))  # 上传文件在导入完成前的暂存目录
+    
+    # 数据导出配置
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))  # 每次从数据库游标读取并发送的行数
+    
+    # 后台任务配置
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '2'))  # 同时执行的后台任务数
+    JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', '10'))  # 最多排队等待的任务数，超过时拒绝提交
+    JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '15'))  # 执行进程为未完成任务续租的间隔
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))  # 超过该时间未续租的任务视为执行进程已退出
     
     # 系统提示词
     AI_SYSTEM_PROMPT = """你是一个专业的AI课程助手，名字叫"小智"。你的主要职责是：
@@ -7,7 +7,11 @@ db = SQLAlchemy()
 # 导入所有模型
 from .paper import Paper
 from .quiz import Quiz
+from .quiz_tag import QuizTag
 from .paper_quiz import PaperQuiz
 from .answer import Answer
 from .exam_record import ExamRecord
-from .tool import Tool 
\ No newline at end of file
+from .tool import Tool
+from .conversation import Conversation, ConversationMessage
+from .background_job import BackgroundJob
+from .student_analysis_report import StudentAnalysisReport
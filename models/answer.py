@@ -4,15 +4,18 @@ from datetime import datetime
 class Answer(db.Model):
     """答题记录模型"""
     __tablename__ = 'answers'
+    __table_args__ = (
+        db.Index('ix_answers_student_paper', 'student_id', 'paper_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    student_id = db.Column(db.String(50), nullable=False, comment='学生ID')
-    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, comment='试卷ID')
+    student_id = db.Column(db.String(50), nullable=False, index=True, comment='学生ID')
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, index=True, comment='试卷ID')
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False, comment='题目ID')
     student_answer = db.Column(db.Text, nullable=False, comment='学生答案')
     is_correct = db.Column(db.Boolean, default=False, comment='是否正确')
     score = db.Column(db.Float, default=0.0, comment='得分')
-    answered_at = db.Column(db.DateTime, default=datetime.utcnow, comment='答题时间')
+    answered_at = db.Column(db.DateTime, default=datetime.utcnow, index=True, comment='答题时间')
     
     # 关联关系
     paper = db.relationship('Paper', backref=db.backref('answers', lazy='dynamic'))
@@ -34,6 +37,13 @@ class Answer(db.Model):
             'answered_at': self.answered_at.isoformat() if self.answered_at else None
         }
     
+    @staticmethod
+    def is_correct_answer(student_answer, correct_answer):
+        """自动判题：忽略大小写和首尾空格的文本比较"""
+        if not correct_answer:
+            return False
+        return student_answer.strip().lower() == correct_answer.strip().lower()
+
     @classmethod
     def add_answer(cls, student_id, paper_id, quiz_id, student_answer, is_correct=False, score=0.0):
         """添加答题记录"""
@@ -61,6 +71,31 @@ class Answer(db.Model):
             query = query.filter_by(paper_id=paper_id)
         return query.order_by(cls.answered_at.desc()).all()
     
+    @classmethod
+    def get_student_fingerprint(cls, student_id):
+        """获取学生答题记录的变更指纹：(答题数, 最大记录ID, 总得分, 正确题数)，重新判分也会改变指纹"""
+        row = db.session.query(
+            db.func.count(cls.id),
+            db.func.max(cls.id),
+            db.func.sum(cls.score),
+            db.func.sum(db.case((cls.is_correct.is_(True), 1), else_=0))
+        ).filter(cls.student_id == student_id).one()
+        return tuple(row)
+
+    @staticmethod
+    def fingerprint_of(answers):
+        """由已查出的答题记录计算变更指纹，与 get_student_fingerprint 的结果一致（按ID顺序求和，空值与SQL相同）"""
+        if not answers:
+            return (0, None, None, None)
+        answers = sorted(answers, key=lambda answer: answer.id)
+        scores = [answer.score for answer in answers if answer.score is not None]
+        return (
+            len(answers),
+            answers[-1].id,
+            sum(scores) if scores else None,
+            sum(1 for answer in answers if answer.is_correct is True)
+        )
+
     @classmethod
     def get_paper_answers(cls, paper_id):
         """获取试卷的所有答题记录"""
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台任务模型
+"""
+
+import json
+import uuid
+from models import db
+from datetime import datetime, timedelta
+
+class BackgroundJob(db.Model):
+    """后台任务（智能出题等耗时操作），用于查询进度和结果"""
+    __tablename__ = 'background_jobs'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True, comment='任务ID')
+    kind = db.Column(db.String(50), nullable=False, index=True, comment='任务类型')
+    status = db.Column(db.String(20), nullable=False, default='pending', comment='状态: pending, running, done, failed')
+    total = db.Column(db.Integer, default=0, comment='总工作量')
+    completed = db.Column(db.Integer, default=0, comment='已完成工作量')
+    message = db.Column(db.String(255), comment='进度说明')
+    result = db.Column(db.Text, comment='任务结果（JSON）')
+    error = db.Column(db.Text, comment='错误信息')
+    created_by = db.Column(db.String(50), comment='提交者')
+    owner = db.Column(db.String(100), comment='执行任务的进程（主机名:进程号）')
+    heartbeat_at = db.Column(db.DateTime, comment='执行进程最近一次续租的时间')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.kind} {self.status}>'
+
+    def get_result(self):
+        """解析任务结果"""
+        return json.loads(self.result) if self.result else {}
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'message': self.message,
+            'result': self.get_result(),
+            'error': self.error,
+            'finished': self.status in (self.STATUS_DONE, self.STATUS_FAILED),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def add_job(cls, kind, total=0, created_by=None, owner=None):
+        """创建等待执行的任务，owner 为执行任务的进程"""
+        try:
+            job = cls(id=uuid.uuid4().hex, kind=kind, status=cls.STATUS_PENDING, total=total, created_by=created_by,
+                      owner=owner, heartbeat_at=datetime.utcnow())
+            db.session.add(job)
+            db.session.commit()
+            return job
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @classmethod
+    def get_job(cls, job_id, kind=None):
+        """根据ID获取任务，指定 kind 时类型不符返回None"""
+        job = db.session.get(cls, job_id)
+        if job and kind and job.kind != kind:
+            return None
+        return job
+
+    def update(self, **fields):
+        """更新任务状态/进度，result 传入字典"""
+        try:
+            if 'result' in fields:
+                fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+            for key, value in fields.items():
+                setattr(self, key, value)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @classmethod
+    def renew_leases(cls, owner):
+        """续租该进程所有未完成的任务，返回续租的数量"""
+        try:
+            count = cls.query.filter(
+                cls.owner == owner, cls.status.in_([cls.STATUS_PENDING, cls.STATUS_RUNNING])
+            ).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            return count
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @classmethod
+    def fail_interrupted_jobs(cls, lease_seconds, owner_alive=None):
+        """把执行进程已不在的未完成任务标记为失败，返回标记的数量
+
+        超过 lease_seconds 未续租、没有记录执行进程（旧版本创建），
+        或 owner_alive(owner) 返回 False 的任务视为中断；其他进程仍在执行的任务不受影响。
+        """
+        unfinished = [cls.STATUS_PENDING, cls.STATUS_RUNNING]
+        expired_before = datetime.utcnow() - timedelta(seconds=lease_seconds)
+        rows = db.session.query(cls.id, cls.owner, cls.heartbeat_at).filter(cls.status.in_(unfinished)).all()
+        interrupted = [
+            job_id for job_id, owner, heartbeat_at in rows
+            if not owner or heartbeat_at is None or heartbeat_at < expired_before
+            or (owner_alive is not None and not owner_alive(owner))
+        ]
+        if not interrupted:
+            return 0
+        try:
+            count = cls.query.filter(cls.id.in_(interrupted), cls.status.in_(unfinished)).update(
+                {'status': cls.STATUS_FAILED, 'error': '执行任务的进程已退出，任务已中断'}, synchronize_session=False
+            )
+            db.session.commit()
+            return count
+        except Exception as e:
+            db.session.rollback()
+            raise e
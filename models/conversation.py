@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AI助手对话模型
+"""
+
+from models import db
+from datetime import datetime
+
+class Conversation(db.Model):
+    """AI助手对话（每个学生可以有多段对话）"""
+    __tablename__ = 'conversations'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    student_id = db.Column(db.String(50), nullable=False, index=True, comment='学生ID')
+    ai_role = db.Column(db.String(50), comment='AI角色')
+    summary = db.Column(db.Text, comment='已移出上下文窗口的早期对话摘要')
+    summarized_until_id = db.Column(db.Integer, default=0, comment='已并入摘要的最后一条消息ID')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    def __repr__(self):
+        return f'<Conversation id={self.id} student_id={self.student_id}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'student_id': self.student_id,
+            'ai_role': self.ai_role,
+            'summary': self.summary,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def add_conversation(cls, student_id, ai_role=None):
+        """创建对话"""
+        try:
+            conversation = cls(student_id=student_id, ai_role=ai_role)
+            db.session.add(conversation)
+            db.session.commit()
+            return conversation
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @classmethod
+    def get_student_conversation(cls, student_id, conversation_id):
+        """获取属于该学生的对话，不存在或不属于该学生时返回None"""
+        return cls.query.filter_by(id=conversation_id, student_id=student_id).first()
+
+    def add_turn(self, user_message, assistant_message, user_tokens, assistant_tokens):
+        """保存一轮问答"""
+        try:
+            db.session.add(ConversationMessage(
+                conversation_id=self.id, role='user', content=user_message, token_count=user_tokens
+            ))
+            db.session.add(ConversationMessage(
+                conversation_id=self.id, role='assistant', content=assistant_message, token_count=assistant_tokens
+            ))
+            self.updated_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def get_recent_messages(self, limit):
+        """获取尚未并入摘要的最近消息（按时间倒序）"""
+        return ConversationMessage.query.filter(
+            ConversationMessage.conversation_id == self.id,
+            ConversationMessage.id > (self.summarized_until_id or 0)
+        ).order_by(ConversationMessage.id.desc()).limit(limit).all()
+
+class ConversationMessage(db.Model):
+    """对话消息"""
+    __tablename__ = 'conversation_messages'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False, index=True, comment='对话ID')
+    role = db.Column(db.String(20), nullable=False, comment='角色: user, assistant')
+    content = db.Column(db.Text, nullable=False, comment='消息内容')
+    token_count = db.Column(db.Integer, default=0, comment='估算的token数')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+
+    def __repr__(self):
+        return f'<ConversationMessage conversation_id={self.conversation_id} role={self.role}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'conversation_id': self.conversation_id,
+            'role': self.role,
+            'content': self.content,
+            'token_count': self.token_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -4,10 +4,17 @@ from datetime import datetime
 class ExamRecord(db.Model):
     """考试记录模型"""
     __tablename__ = 'exam_records'
+    __table_args__ = (
+        db.Index('ix_exam_records_student_paper', 'student_id', 'paper_id'),
+    )
+
+    # 考试记录来源：线下答题卡导入的记录由导入程序累加维护，在线考试的记录不会被导入修改
+    SOURCE_ONLINE = 'online'
+    SOURCE_IMPORT = 'import'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    student_id = db.Column(db.String(50), nullable=False, comment='学生ID')
-    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, comment='试卷ID')
+    student_id = db.Column(db.String(50), nullable=False, index=True, comment='学生ID')
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, index=True, comment='试卷ID')
     start_time = db.Column(db.DateTime, default=datetime.utcnow, comment='开始答题时间')
     submit_time = db.Column(db.DateTime, nullable=False, comment='提交时间')
     total_questions = db.Column(db.Integer, nullable=False, comment='总题目数')
@@ -17,6 +24,7 @@ class ExamRecord(db.Model):
     max_score = db.Column(db.Float, nullable=False, comment='满分')
     accuracy_rate = db.Column(db.Float, nullable=False, comment='正确率(%)')
     status = db.Column(db.String(20), default='completed', comment='考试状态: completed, incomplete')
+    source = db.Column(db.String(20), default='online', comment='来源: online-在线考试, import-线下答题卡导入')
     
     # 关联关系
     paper = db.relationship('Paper', backref=db.backref('exam_records', lazy='dynamic'))
@@ -76,6 +84,28 @@ class ExamRecord(db.Model):
             query = query.limit(limit)
         return query.all()
     
+    @classmethod
+    def get_student_ids(cls):
+        """获取所有有考试记录的学生ID"""
+        return [row[0] for row in db.session.query(cls.student_id).distinct().order_by(cls.student_id)]
+
+    @classmethod
+    def get_student_fingerprint(cls, student_id):
+        """获取学生考试记录的变更指纹：(考试次数, 最大记录ID, 总得分)"""
+        row = db.session.query(
+            db.func.count(cls.id),
+            db.func.max(cls.id),
+            db.func.sum(cls.total_score)
+        ).filter(cls.student_id == student_id).one()
+        return tuple(row)
+
+    @staticmethod
+    def fingerprint_of(records):
+        """由已查出的考试记录计算变更指纹，与 get_student_fingerprint 的结果一致（按ID顺序求和，空值与SQL相同）"""
+        records = sorted(records, key=lambda record: record.id)
+        scores = [record.total_score for record in records if record.total_score is not None]
+        return (len(records), records[-1].id if records else None, sum(scores) if scores else None)
+
     @classmethod
     def get_paper_exam_records(cls, paper_id):
         """获取某试卷的所有考试记录"""
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库迁移
+
+db.create_all() 只会创建缺失的表，不会为已有表补充新增的列。
+应用启动时调用 run_migrations()，所有迁移都是幂等的，可重复执行。
+"""
+
+import os
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from models import db
+from models.tool import Tool, URL_LINK_PREFIX
+from models.quiz import Quiz
+from models.paper import Paper
+from models.exam_record import ExamRecord
+
+# 为已有表补充的列：(表名, 列名, 列定义)
+ADDED_COLUMNS = [
+    ('tools', 'target_url', 'VARCHAR(2048)'),
+    ('tools', 'content_hash', 'VARCHAR(64)'),
+    ('quizzes', 'content_signature', 'BLOB'),
+    ('background_jobs', 'owner', 'VARCHAR(100)'),
+    ('background_jobs', 'heartbeat_at', 'DATETIME'),
+    ('exam_records', 'source', "VARCHAR(20) DEFAULT 'online'"),
+]
+
+# 为已有表补充的索引：(索引名, 表名, 列名，多列用逗号分隔)
+ADDED_INDEXES = [
+    ('ix_tools_content_hash', 'tools', 'content_hash'),
+    ('ix_exam_records_student_id', 'exam_records', 'student_id'),
+    ('ix_answers_student_id', 'answers', 'student_id'),
+    ('ix_answers_answered_at', 'answers', 'answered_at'),
+    ('ix_answers_paper_id', 'answers', 'paper_id'),
+    ('ix_exam_records_paper_id', 'exam_records', 'paper_id'),
+    ('ix_paper_quizzes_paper_id', 'paper_quizzes', 'paper_id'),
+    ('ix_answers_student_paper', 'answers', 'student_id, paper_id'),
+    ('ix_exam_records_student_paper', 'exam_records', 'student_id, paper_id'),
+]
+
+# 题库全文检索：trigram分词的FTS5外部内容表，由触发器与 quizzes 表保持同步
+QUIZ_SEARCH_TABLE = 'quizzes_fts'
+QUIZ_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE {QUIZ_SEARCH_TABLE} USING fts5("
+    "content, answer, analysis, content='quizzes', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS quizzes_fts_ai AFTER INSERT ON quizzes BEGIN
+        INSERT INTO {QUIZ_SEARCH_TABLE} (rowid, content, answer, analysis)
+        VALUES (new.id, new.content, new.answer, new.analysis);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS quizzes_fts_ad AFTER DELETE ON quizzes BEGIN
+        INSERT INTO {QUIZ_SEARCH_TABLE} ({QUIZ_SEARCH_TABLE}, rowid, content, answer, analysis)
+        VALUES ('delete', old.id, old.content, old.answer, old.analysis);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS quizzes_fts_au AFTER UPDATE OF content, answer, analysis ON quizzes BEGIN
+        INSERT INTO {QUIZ_SEARCH_TABLE} ({QUIZ_SEARCH_TABLE}, rowid, content, answer, analysis)
+        VALUES ('delete', old.id, old.content, old.answer, old.analysis);
+        INSERT INTO {QUIZ_SEARCH_TABLE} (rowid, content, answer, analysis)
+        VALUES (new.id, new.content, new.answer, new.analysis);
+    END""",
+]
+
+def add_missing_columns():
+    """为已有表补充缺失的列"""
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    for table, column, ddl in ADDED_COLUMNS:
+        if table not in existing_tables:
+            continue
+        columns = {col['name'] for col in inspector.get_columns(table)}
+        if column not in columns:
+            db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            current_app.logger.info(f"迁移: {table} 表新增列 {column}")
+    for index, table, column in ADDED_INDEXES:
+        db.session.execute(db.text(f'CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})'))
+    db.session.commit()
+
+def backfill_tool_target_urls():
+    """从 static/tools 中的文件回填URL链接工具的跳转地址
+
+    文件不存在或解析不出地址的工具记为空字符串（访问时按"跳转地址为空"处理），避免每次启动重复处理。
+    """
+    tools = Tool.query.filter(
+        Tool.file_name.ilike(URL_LINK_PREFIX.replace('_', '\\_') + '%', escape='\\'),
+        Tool.target_url.is_(None)
+    ).all()
+    for tool in tools:
+        if not os.path.exists(tool.file_path):
+            current_app.logger.warning(f"迁移: 工具文件不存在，无法回填跳转地址 {tool.file_path}")
+            tool.target_url = ''
+            continue
+        with open(tool.file_path, 'r', encoding='utf-8', errors='replace') as f:
+            tool.target_url = Tool.parse_target_url(f.read()) or ''
+    if tools:
+        db.session.commit()
+
+def backfill_tool_content_hashes():
+    """为已有工具文件计算内容哈希，使新上传的相同文件可以复用"""
+    from services.tool_storage import hash_file
+    tools = Tool.query.filter(Tool.content_hash.is_(None)).all()
+    for tool in tools:
+        if os.path.exists(tool.file_path):
+            tool.content_hash = hash_file(tool.file_path)
+    if tools:
+        db.session.commit()
+
+def backfill_quiz_signatures(batch_size=500):
+    """为已有题目计算近似重复检测用的MinHash签名，每批提交一次"""
+    from services.quiz_dedupe import compute_signature
+    total = 0
+    while True:
+        quizzes = Quiz.query.filter(Quiz.content_signature.is_(None)).order_by(Quiz.id).limit(batch_size).all()
+        # 内容为空的题目签名为空字节，避免每次启动重复处理
+        for quiz in quizzes:
+            quiz.content_signature = compute_signature(quiz.content) or b''
+        if not quizzes:
+            break
+        db.session.commit()
+        total += len(quizzes)
+    if total:
+        current_app.logger.info(f"迁移: 为 {total} 道题目计算了内容签名")
+
+def delete_orphaned_exam_records():
+    """删除试卷已不存在的考试记录（旧版删除试卷时未删除考试记录）"""
+    count = ExamRecord.query.filter(
+        ExamRecord.paper_id.not_in(db.select(Paper.id))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    if count:
+        current_app.logger.info(f"迁移: 删除了 {count} 条已删除试卷遗留的考试记录")
+
+def quiz_search_index_exists():
+    """题库全文检索表是否已创建"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    return db.session.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': QUIZ_SEARCH_TABLE}
+    ).first() is not None
+
+def create_quiz_search_index():
+    """创建题库全文检索表和同步触发器，首次创建时导入已有题目
+
+    只支持SQLite（需要3.34以上版本的trigram分词器），不支持时题库搜索退回LIKE查询。
+    """
+    if db.engine.dialect.name != 'sqlite' or quiz_search_index_exists():
+        return
+    try:
+        for ddl in QUIZ_SEARCH_DDL:
+            db.session.execute(db.text(ddl))
+        db.session.execute(db.text(f"INSERT INTO {QUIZ_SEARCH_TABLE} ({QUIZ_SEARCH_TABLE}) VALUES ('rebuild')"))
+        db.session.commit()
+        current_app.logger.info("迁移: 创建题库全文检索索引")
+    except OperationalError as e:
+        db.session.rollback()
+        current_app.logger.warning(f"迁移: 当前SQLite不支持FTS5 trigram分词，题库搜索使用LIKE查询 ({e})")
+
+def run_migrations():
+    """执行所有迁移"""
+    add_missing_columns()
+    create_quiz_search_index()
+    backfill_tool_target_urls()
+    backfill_tool_content_hashes()
+    backfill_quiz_signatures()
+    delete_orphaned_exam_records()
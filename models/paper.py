@@ -4,10 +4,13 @@ from datetime import datetime
 class Paper(db.Model):
     """试卷模型"""
     __tablename__ = 'papers'
+
+    # 正在后台删除的试卷，学生端不可见，不能再修改状态
+    STATUS_DELETING = 'deleting'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(200), nullable=False, comment='试卷名称')
-    status = db.Column(db.String(20), default='draft', comment='试卷状态：draft-草稿, published-已发布, archived-已归档')
+    status = db.Column(db.String(20), default='draft', comment='试卷状态：draft-草稿, published-已发布, archived-已归档, deleting-删除中')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
     
@@ -56,14 +59,91 @@ class Paper(db.Model):
     
     @classmethod
     def update_paper_status(cls, paper_id, new_status):
-        """更新试卷状态"""
+        """更新试卷状态（删除中的试卷不能修改）"""
         paper = cls.get_paper_by_id(paper_id)
-        if paper:
+        if paper and paper.status != cls.STATUS_DELETING:
             paper.status = new_status
             db.session.commit()
             return True
         return False
     
+    @classmethod
+    def clone_paper(cls, paper_id, name=None, copy_quizzes=False):
+        """复制试卷及其全部题目，返回新试卷（原试卷不存在时返回None）
+
+        默认新试卷引用原来的题目，题目关联用一条 INSERT ... SELECT 复制。
+        copy_quizzes 为 True 时同时复制题目（含标签和MinHash签名），题目按顺序批量插入后
+        再批量写入关联和标签。所有写入在一个事务中完成，新试卷为草稿状态。
+        """
+        from models.paper_quiz import PaperQuiz
+        from models.quiz import Quiz
+        from models.quiz_tag import QuizTag
+        from services.quiz_dedupe import compute_signature, get_quiz_index
+        from services.quiz_retrieval import get_quiz_retriever, quiz_document
+        source = cls.get_paper_by_id(paper_id)
+        if not source:
+            return None
+        now = datetime.utcnow()
+        copied = []
+        try:
+            paper = cls(name=name or f'{source.name}（副本）', status='draft')
+            db.session.add(paper)
+            db.session.flush()
+            if not copy_quizzes:
+                db.session.execute(db.insert(PaperQuiz).from_select(
+                    ['paper_id', 'quiz_id', 'question_order', 'score', 'created_at'],
+                    db.select(
+                        db.literal(paper.id), PaperQuiz.quiz_id, PaperQuiz.question_order,
+                        PaperQuiz.score, db.literal(now)
+                    ).where(PaperQuiz.paper_id == paper_id)
+                ))
+            else:
+                rows = db.session.execute(
+                    db.select(PaperQuiz.quiz_id, PaperQuiz.question_order, PaperQuiz.score,
+                              Quiz.content, Quiz.answer, Quiz.analysis, Quiz.content_signature)
+                    .join(Quiz, Quiz.id == PaperQuiz.quiz_id)
+                    .where(PaperQuiz.paper_id == paper_id)
+                    .order_by(PaperQuiz.question_order, PaperQuiz.id)
+                ).all()
+                # 同一道题在试卷中只复制一次
+                sources = list({row.quiz_id: row for row in rows}.values())
+                if sources:
+                    quiz_rows = [{
+                        'content': row.content,
+                        'answer': row.answer,
+                        'analysis': row.analysis,
+                        'content_signature': row.content_signature or compute_signature(row.content),
+                        'created_at': now,
+                        'updated_at': now
+                    } for row in sources]
+                    new_ids = db.session.execute(
+                        db.insert(Quiz).returning(Quiz.id, sort_by_parameter_order=True), quiz_rows
+                    ).scalars().all()
+                    id_map = dict(zip((row.quiz_id for row in sources), new_ids))
+                    db.session.execute(db.insert(PaperQuiz), [
+                        {'paper_id': paper.id, 'quiz_id': id_map[row.quiz_id], 'question_order': row.question_order,
+                         'score': row.score, 'created_at': now}
+                        for row in rows
+                    ])
+                    tags = db.session.execute(
+                        db.select(QuizTag.quiz_id, QuizTag.tag).where(QuizTag.quiz_id.in_(list(id_map)))
+                    ).all()
+                    if tags:
+                        db.session.execute(db.insert(QuizTag), [
+                            {'quiz_id': id_map[quiz_id], 'tag': tag} for quiz_id, tag in tags
+                        ])
+                    copied = list(zip(new_ids, quiz_rows))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        index = get_quiz_index()
+        retriever = get_quiz_retriever()
+        for quiz_id, row in copied:
+            index.add(quiz_id, row['content_signature'])
+            retriever.add(quiz_id, quiz_document(row['content'], row['analysis']))
+        return paper
+
     @classmethod
     def delete_paper(cls, paper_id):
         """删除试卷"""
@@ -1,4 +1,5 @@
 from models import db
+import hashlib
 from datetime import datetime
 
 class PaperQuiz(db.Model):
@@ -6,7 +7,7 @@ class PaperQuiz(db.Model):
     __tablename__ = 'paper_quizzes'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, comment='试卷ID')
+    paper_id = db.Column(db.Integer, db.ForeignKey('papers.id'), nullable=False, index=True, comment='试卷ID')
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False, comment='题目ID')
     question_order = db.Column(db.Integer, nullable=False, comment='题目顺序')
     score = db.Column(db.Float, default=1.0, comment='题目分值')
@@ -30,6 +31,14 @@ class PaperQuiz(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
+    @staticmethod
+    def _touch_paper(paper_id, now=None):
+        """更新试卷的 updated_at，与题目修改在同一事务中提交"""
+        from models.paper import Paper
+        db.session.execute(
+            db.update(Paper).where(Paper.id == paper_id).values(updated_at=now or datetime.utcnow())
+        )
+
     @classmethod
     def add_quiz_to_paper(cls, paper_id, quiz_id, question_order, score=1.0):
         """向试卷添加题目"""
@@ -41,6 +50,7 @@ class PaperQuiz(db.Model):
                 score=score
             )
             db.session.add(paper_quiz)
+            cls._touch_paper(paper_id)
             db.session.commit()
             return paper_quiz
         except Exception as e:
@@ -54,13 +64,63 @@ class PaperQuiz(db.Model):
     
     @classmethod
     def remove_quiz_from_paper(cls, paper_id, quiz_id):
-        """从试卷中移除题目"""
+        """从试卷中移除题目，后面的题目顺序依次前移"""
         paper_quiz = cls.query.filter_by(paper_id=paper_id, quiz_id=quiz_id).first()
         if paper_quiz:
-            db.session.delete(paper_quiz)
-            db.session.commit()
+            try:
+                db.session.delete(paper_quiz)
+                cls.query.filter(
+                    cls.paper_id == paper_id, cls.question_order > paper_quiz.question_order
+                ).update({cls.question_order: cls.question_order - 1}, synchronize_session=False)
+                cls._touch_paper(paper_id)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
             return True
         return False
+
+    @classmethod
+    def replace_paper_quizzes(cls, paper_id, items):
+        """按新的题目列表整体更新试卷，在一个事务中只写入有变化的部分
+
+        items 为按顺序排列的 (题目ID, 分值) 列表，题目顺序重新从1连续编号。
+        不在列表中的题目被移除，新题目被添加，顺序或分值变化的题目被更新。
+        返回 {'added', 'removed', 'updated', 'unchanged'} 各自的数量。
+        """
+        try:
+            existing = {pq.quiz_id: pq for pq in cls.query.filter_by(paper_id=paper_id)}
+            wanted = {quiz_id for quiz_id, _ in items}
+            removed = [pq.id for quiz_id, pq in existing.items() if quiz_id not in wanted]
+            updates = []
+            inserts = []
+            now = datetime.utcnow()
+            for order, (quiz_id, score) in enumerate(items, 1):
+                pq = existing.get(quiz_id)
+                if pq is None:
+                    inserts.append({'paper_id': paper_id, 'quiz_id': quiz_id, 'question_order': order,
+                                    'score': score, 'created_at': now})
+                elif pq.question_order != order or pq.score != score:
+                    updates.append({'id': pq.id, 'question_order': order, 'score': score})
+
+            if removed:
+                cls.query.filter(cls.id.in_(removed)).delete(synchronize_session=False)
+            if updates:
+                db.session.execute(db.update(cls), updates)
+            if inserts:
+                db.session.execute(db.insert(cls), inserts)
+            if removed or updates or inserts:
+                cls._touch_paper(paper_id, now)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        return {
+            'added': len(inserts),
+            'removed': len(removed),
+            'updated': len(updates),
+            'unchanged': len(items) - len(inserts) - len(updates)
+        }
     
     @classmethod
     def update_quiz_order(cls, paper_id, quiz_id, new_order):
@@ -68,6 +128,34 @@ class PaperQuiz(db.Model):
         paper_quiz = cls.query.filter_by(paper_id=paper_id, quiz_id=quiz_id).first()
         if paper_quiz:
             paper_quiz.question_order = new_order
+            cls._touch_paper(paper_id)
             db.session.commit()
             return True
-        return False 
\ No newline at end of file
+        return False
+    
+    @classmethod
+    def get_papers_fingerprint(cls, paper_ids):
+        """获取试卷题目的变更指纹（用于HTTP缓存校验）
+
+        返回 (题目数, 题目列表摘要, 题目最后更新时间)。摘要按顺序对每道题的
+        (试卷ID, 顺序, 题目ID, 分值) 计算，增删题目、调整顺序、修改分值（包括两题互换分值）
+        都会改变摘要；修改题目内容会改变最后更新时间。
+        """
+        from models.quiz import Quiz
+        if not paper_ids:
+            return (0, None, None)
+        rows = db.session.execute(
+            db.select(cls.paper_id, cls.question_order, cls.quiz_id, cls.score, Quiz.updated_at)
+            .join(Quiz, Quiz.id == cls.quiz_id)
+            .where(cls.paper_id.in_(paper_ids))
+            .order_by(cls.paper_id, cls.question_order, cls.id)
+        )
+        digest = hashlib.sha1()
+        count = 0
+        last_updated = None
+        for paper_id, question_order, quiz_id, score, updated_at in rows:
+            digest.update(f'{paper_id}:{question_order}:{quiz_id}:{score!r};'.encode('utf-8'))
+            count += 1
+            if updated_at and (last_updated is None or updated_at > last_updated):
+                last_updated = updated_at
+        return (count, digest.hexdigest(), last_updated)
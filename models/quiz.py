@@ -9,6 +9,7 @@ class Quiz(db.Model):
     content = db.Column(db.Text, nullable=False, comment='题目内容')
     answer = db.Column(db.Text, nullable=False, comment='题目答案')
     analysis = db.Column(db.Text, comment='题目分析')
+    content_signature = db.Column(db.LargeBinary, comment='题目内容的MinHash签名，用于近似重复检测')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
     
@@ -29,24 +30,112 @@ class Quiz(db.Model):
     @classmethod
     def add_quiz(cls, content, answer, analysis=None):
         """添加题目的类方法"""
+        return cls.add_quizzes([{'content': content, 'answer': answer, 'analysis': analysis}])[0]
+
+    @classmethod
+    def add_quizzes(cls, items):
+        """批量添加题目，所有题目在同一个事务中提交
+
+        items 为包含 content、answer、analysis 的字典列表（可带已计算的 content_signature
+        和标签列表 tags），返回创建的题目列表。保存后登记到近似重复索引和题库检索索引。
+        """
+        from models.quiz_tag import QuizTag
+        from services.quiz_dedupe import compute_signature, get_quiz_index
+        from services.quiz_retrieval import get_quiz_retriever, quiz_document
         try:
-            quiz = cls(
-                content=content,
-                answer=answer,
-                analysis=analysis
-            )
-            db.session.add(quiz)
+            quizzes = [
+                cls(
+                    content=item['content'],
+                    answer=item['answer'],
+                    analysis=item.get('analysis'),
+                    content_signature=item.get('content_signature') or compute_signature(item['content'])
+                )
+                for item in items
+            ]
+            db.session.add_all(quizzes)
+            if any(item.get('tags') for item in items):
+                db.session.flush()
+                db.session.add_all(
+                    QuizTag(quiz_id=quiz.id, tag=tag)
+                    for quiz, item in zip(quizzes, items)
+                    for tag in QuizTag.normalize_tags(item.get('tags'))
+                )
             db.session.commit()
-            return quiz
         except Exception as e:
             db.session.rollback()
             raise e
-    
+        index = get_quiz_index()
+        retriever = get_quiz_retriever()
+        for quiz in quizzes:
+            index.add(quiz.id, quiz.content_signature)
+            retriever.add(quiz.id, quiz_document(quiz.content, quiz.analysis))
+        return quizzes
+
     @classmethod
     def get_all_quizzes(cls):
         """获取所有题目"""
         return cls.query.order_by(cls.created_at.desc()).all()
     
+    @classmethod
+    def search_quizzes(cls, query, page=1, per_page=20, exclude_paper_id=None):
+        """在题目内容、答案和解析中搜索，返回 (当前页题目列表, 匹配总数)
+
+        多个关键词以空白分隔，需同时匹配。关键词都不少于3个字时使用FTS5全文索引按相关度排序，
+        否则（trigram索引无法检索更短的词）退回LIKE查询，按创建时间倒序。
+        exclude_paper_id 不为空时排除已在该试卷中的题目。
+        """
+        from models.migrations import QUIZ_SEARCH_TABLE, quiz_search_index_exists
+        terms = query.split()
+        if not terms:
+            return [], 0
+        params = {'limit': per_page, 'offset': (page - 1) * per_page}
+        exclude = ''
+        if exclude_paper_id is not None:
+            exclude = ' AND q.id NOT IN (SELECT quiz_id FROM paper_quizzes WHERE paper_id = :paper_id)'
+            params['paper_id'] = exclude_paper_id
+
+        if min(len(term) for term in terms) >= 3 and quiz_search_index_exists():
+            # 每个关键词作为短语匹配，双引号转义后用AND连接
+            params['match'] = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+            source = (f'FROM {QUIZ_SEARCH_TABLE} JOIN quizzes q ON q.id = {QUIZ_SEARCH_TABLE}.rowid '
+                      f'WHERE {QUIZ_SEARCH_TABLE} MATCH :match{exclude}')
+            order = f'bm25({QUIZ_SEARCH_TABLE}, 3.0, 1.0, 1.0), q.id DESC'
+        else:
+            conditions = []
+            for number, term in enumerate(terms):
+                params[f'term{number}'] = '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+                conditions.append(
+                    f"(q.content LIKE :term{number} ESCAPE '\\' OR q.answer LIKE :term{number} ESCAPE '\\' "
+                    f"OR q.analysis LIKE :term{number} ESCAPE '\\')"
+                )
+            source = f"FROM quizzes q WHERE {' AND '.join(conditions)}{exclude}"
+            order = 'q.created_at DESC, q.id DESC'
+
+        total = db.session.execute(db.text(f'SELECT COUNT(*) {source}'), params).scalar()
+        ids = db.session.execute(
+            db.text(f'SELECT q.id {source} ORDER BY {order} LIMIT :limit OFFSET :offset'), params
+        ).scalars().all()
+        quizzes = {quiz.id: quiz for quiz in cls.query.filter(cls.id.in_(ids))} if ids else {}
+        return [quizzes[quiz_id] for quiz_id in ids if quiz_id in quizzes], total
+
+    @classmethod
+    def get_bank_version(cls):
+        """题库的版本标记 (题目数, 最新创建时间)，任何进程增删题目后都会变化"""
+        return tuple(db.session.query(db.func.count(cls.id), db.func.max(cls.created_at)).one())
+
+    @classmethod
+    def get_index_changes(cls, known_ids, since=None):
+        """与内存索引中的题目ID比较，返回 (已删除的ID集合, 需要重新读取的ID列表)
+
+        需要重新读取的是索引中没有的题目，以及 since 之后创建的题目
+        （SQLite会复用被删除的最大ID，同一个ID可能已经是另一道题）。
+        """
+        ids = set(db.session.scalars(db.select(cls.id)))
+        changed = ids - known_ids
+        if since is not None:
+            changed.update(db.session.scalars(db.select(cls.id).where(cls.created_at >= since)))
+        return known_ids - ids, sorted(changed)
+
     @classmethod
     def get_quiz_by_id(cls, quiz_id):
         """根据ID获取题目"""
@@ -55,9 +144,15 @@ class Quiz(db.Model):
     @classmethod
     def delete_quiz(cls, quiz_id):
         """删除题目"""
+        from services.quiz_dedupe import get_quiz_index
+        from services.quiz_retrieval import get_quiz_retriever
+        from models.quiz_tag import QuizTag
         quiz = cls.get_quiz_by_id(quiz_id)
         if quiz:
+            QuizTag.delete_quiz_tags(quiz_id)
             db.session.delete(quiz)
             db.session.commit()
+            get_quiz_index().remove(quiz_id)
+            get_quiz_retriever().remove(quiz_id)
             return True
         return False 
\ No newline at end of file
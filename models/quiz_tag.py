@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+题目标签模型
+"""
+
+import re
+from models import db
+
+# 标签之间的分隔符
+TAG_SEPARATOR_PATTERN = re.compile(r'[,，、;；\s]+')
+
+class QuizTag(db.Model):
+    """题目标签（学科、年级、题型、知识点等），用于组卷时按知识点筛选题目"""
+    __tablename__ = 'quiz_tags'
+    __table_args__ = (
+        db.UniqueConstraint('quiz_id', 'tag', name='uq_quiz_tags_quiz_tag'),
+        db.Index('ix_quiz_tags_tag_quiz', 'tag', 'quiz_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False, comment='题目ID')
+    tag = db.Column(db.String(100), nullable=False, comment='标签')
+
+    def __repr__(self):
+        return f'<QuizTag quiz_id={self.quiz_id} tag={self.tag}>'
+
+    @staticmethod
+    def normalize_tags(tags):
+        """把标签字符串或列表整理为去重后的标签列表（保持原顺序）"""
+        if not tags:
+            return []
+        if isinstance(tags, str):
+            tags = TAG_SEPARATOR_PATTERN.split(tags)
+        result = []
+        for tag in tags:
+            tag = str(tag).strip()[:100]
+            if tag and tag not in result:
+                result.append(tag)
+        return result
+
+    @classmethod
+    def get_tag_counts(cls, limit=200):
+        """各标签的题目数，按题目数降序"""
+        return db.session.query(cls.tag, db.func.count(cls.quiz_id)).group_by(cls.tag).order_by(
+            db.func.count(cls.quiz_id).desc(), cls.tag
+        ).limit(limit).all()
+
+    @classmethod
+    def delete_quiz_tags(cls, quiz_id):
+        """删除题目的所有标签（不提交）"""
+        cls.query.filter_by(quiz_id=quiz_id).delete()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+学生AI分析报告模型
+"""
+
+import hashlib
+from models import db
+from datetime import datetime
+
+# 修改分析提示词后递增，使已保存的报告全部失效
+ANALYSIS_REPORT_VERSION = '1'
+
+class StudentAnalysisReport(db.Model):
+    """已生成的学生AI分析报告，按学生数据指纹判断是否仍然有效"""
+    __tablename__ = 'student_analysis_reports'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    student_id = db.Column(db.String(50), nullable=False, unique=True, comment='学生ID')
+    fingerprint = db.Column(db.String(64), nullable=False, comment='生成报告时学生考试和答题数据的指纹')
+    report = db.Column(db.Text, nullable=False, comment='报告内容（Markdown）')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='最后生成时间')
+
+    def __repr__(self):
+        return f'<StudentAnalysisReport student_id={self.student_id}>'
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'student_id': self.student_id,
+            'fingerprint': self.fingerprint,
+            'report': self.report,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @staticmethod
+    def compute_fingerprint(student_id, model_name):
+        """计算学生数据指纹，学生没有考试记录时返回None
+
+        新提交考试、新增或重新判分答题、更换模型或修改提示词版本都会改变指纹。
+        """
+        from models.exam_record import ExamRecord
+        from models.answer import Answer
+        exam_part = ExamRecord.get_student_fingerprint(student_id)
+        if not exam_part[0]:
+            return None
+        return StudentAnalysisReport.combine_fingerprint(model_name, exam_part, Answer.get_student_fingerprint(student_id))
+
+    @staticmethod
+    def compute_fingerprint_from_records(exam_records, answers, model_name):
+        """由已查出的考试记录和答题记录计算指纹（批量分析时避免逐个学生查询），与 compute_fingerprint 一致"""
+        from models.exam_record import ExamRecord
+        from models.answer import Answer
+        if not exam_records:
+            return None
+        return StudentAnalysisReport.combine_fingerprint(
+            model_name, ExamRecord.fingerprint_of(exam_records), Answer.fingerprint_of(answers)
+        )
+
+    @staticmethod
+    def combine_fingerprint(model_name, exam_part, answer_part):
+        raw = '|'.join(str(value) for value in (ANALYSIS_REPORT_VERSION, model_name) + exam_part + answer_part)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_valid_report(cls, student_id, fingerprint):
+        """获取与当前指纹一致的报告，数据有变化或没有报告时返回None"""
+        return cls.query.filter_by(student_id=student_id, fingerprint=fingerprint).first()
+
+    @classmethod
+    def get_fingerprints(cls, student_ids):
+        """一次查询取出多个学生已保存报告的指纹：{学生ID: 指纹}"""
+        rows = db.session.query(cls.student_id, cls.fingerprint).filter(cls.student_id.in_(student_ids))
+        return dict(rows)
+
+    @classmethod
+    def save_report(cls, student_id, fingerprint, report):
+        """保存报告（每个学生只保留最新的一份）"""
+        try:
+            record = cls.query.filter_by(student_id=student_id).first()
+            if record is None:
+                record = cls(student_id=student_id)
+                db.session.add(record)
+            record.fingerprint = fingerprint
+            record.report = report
+            record.updated_at = datetime.utcnow()
+            db.session.commit()
+            return record
+        except Exception as e:
+            db.session.rollback()
+            raise e
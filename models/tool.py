@@ -5,9 +5,13 @@
 工具模型
 """
 
+import re
 from models import db
 from datetime import datetime
 
+# URL链接工具的文件名前缀
+URL_LINK_PREFIX = 'url_'
+
 class Tool(db.Model):
     """工具模型"""
     __tablename__ = 'tools'
@@ -22,12 +26,14 @@ class Tool(db.Model):
     status = db.Column(db.String(20), default='offline', comment='状态: online(上线), offline(下线)')
     creator = db.Column(db.String(50), comment='创建者')
     views = db.Column(db.Integer, default=0, comment='浏览次数')
+    target_url = db.Column(db.String(2048), comment='URL链接工具的跳转地址（上传时解析）')
+    content_hash = db.Column(db.String(64), index=True, comment='文件内容SHA-256')
     
     def __repr__(self):
         return f'<Tool {self.name}>'
     
     @classmethod
-    def add_tool(cls, name, description, file_path, file_name, file_size, creator):
+    def add_tool(cls, name, description, file_path, file_name, file_size, creator, target_url=None, content_hash=None):
         """添加工具"""
         tool = cls(
             name=name,
@@ -35,7 +41,9 @@ class Tool(db.Model):
             file_path=file_path,
             file_name=file_name,
             file_size=file_size,
-            creator=creator
+            creator=creator,
+            target_url=target_url,
+            content_hash=content_hash
         )
         db.session.add(tool)
         db.session.commit()
@@ -56,6 +64,46 @@ class Tool(db.Model):
         """根据ID获取工具"""
         return cls.query.get(tool_id)
     
+    @classmethod
+    def get_tool_by_content_hash(cls, content_hash):
+        """根据文件内容哈希获取工具"""
+        return cls.query.filter_by(content_hash=content_hash).first()
+    
+    @classmethod
+    def count_file_references(cls, file_path):
+        """统计引用该文件的工具数量"""
+        return cls.query.filter_by(file_path=file_path).count()
+    
+    @staticmethod
+    def is_url_link_file(file_name):
+        """判断是否为URL链接工具文件"""
+        return file_name.lower().startswith(URL_LINK_PREFIX)
+    
+    @staticmethod
+    def parse_target_url(content):
+        """从URL链接工具的文件内容中解析跳转地址，解析失败返回None"""
+        # 优先从全文提取第一个 http(s) 链接（兼容由编辑器生成的 HTML 包裹）
+        url_match = re.search(r"https?://[^\s\"'<>]+", content, re.IGNORECASE)
+        if url_match:
+            return url_match.group(0)
+        
+        # 回退：首个非空行，清理BOM/引号并补全协议
+        first_non_empty_line = ''
+        for line in content.splitlines():
+            stripped = line.strip().lstrip('\ufeff')
+            if stripped:
+                first_non_empty_line = stripped
+                break
+        if not first_non_empty_line:
+            return None
+        
+        target_url = first_non_empty_line
+        if (target_url.startswith('"') and target_url.endswith('"')) or (target_url.startswith("'") and target_url.endswith("'")):
+            target_url = target_url[1:-1].strip()
+        if not (target_url.lower().startswith('http://') or target_url.lower().startswith('https://')):
+            target_url = 'http://' + target_url
+        return target_url
+    
     def update_status(self, status):
         """更新工具状态"""
         if status in ['online', 'offline']:
@@ -75,9 +123,14 @@ class Tool(db.Model):
             return False
     
     def increment_views(self):
-        """增加浏览次数"""
-        self.views += 1
-        db.session.commit()
+        """增加浏览次数（先计入内存缓冲区，由后台定期批量写入）"""
+        from services.view_counter import get_view_counter
+        get_view_counter().increment(self.id)
+    
+    def get_live_views(self):
+        """获取实时浏览次数（已写入数据库的次数 + 缓冲区中待写入的次数）"""
+        from services.view_counter import get_view_counter
+        return (self.views or 0) + get_view_counter().get_pending(self.id)
     
     def get_file_size_formatted(self):
         """获取格式化的文件大小"""
@@ -107,5 +160,6 @@ class Tool(db.Model):
             'upload_time': self.upload_time.strftime('%Y-%m-%d %H:%M:%S'),
             'status': self.status,
             'creator': self.creator,
-            'views': self.views
+            'views': self.get_live_views(),
+            'target_url': self.target_url
         } 
\ No newline at end of file
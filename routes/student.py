@@ -5,14 +5,20 @@ from models.quiz import Quiz
 from models.answer import Answer
 from models.exam_record import ExamRecord
 from models.tool import Tool
-from openai import OpenAI
+from models.conversation import Conversation
 from config import Config
-import re
+from services.http_cache import conditional_response, paper_validators
+from services.tool_cache import tool_content_response
+from services.llm_gateway import get_llm_gateway
+from services.sse import format_sse, sse_response
+from services.chat_history import assemble_history, estimate_tokens
+from services.answer_cache import lookup_answer, begin_lookup, store_answer
+from services.rate_limit import rate_limited
+from services.quiz_retrieval import retrieve_for_chat, add_reference_context, reference_cache_prompt
 import os
 
 # 创建学生蓝图
 student_bp = Blueprint('student', __name__, url_prefix='/student')
-URL_LINK_PREFIX = 'url_'
 
 @student_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -56,20 +62,24 @@ def quiz():
     # 获取已发布的试卷
     published_papers = Paper.get_papers_by_status('published')
     
-    # 为每个试卷获取题目信息
-    papers_with_quizzes = []
-    for paper in published_papers:
-        paper_quizzes = PaperQuiz.get_paper_quizzes(paper.id)
-        quiz_count = len(paper_quizzes)
-        total_score = sum(pq.score for pq in paper_quizzes)
+    def render():
+        # 为每个试卷获取题目信息
+        papers_with_quizzes = []
+        for paper in published_papers:
+            paper_quizzes = PaperQuiz.get_paper_quizzes(paper.id)
+            quiz_count = len(paper_quizzes)
+            total_score = sum(pq.score for pq in paper_quizzes)
+            
+            papers_with_quizzes.append({
+                'paper': paper,
+                'quiz_count': quiz_count,
+                'total_score': total_score
+            })
         
-        papers_with_quizzes.append({
-            'paper': paper,
-            'quiz_count': quiz_count,
-            'total_score': total_score
-        })
+        return render_template('student/quiz.html', papers=papers_with_quizzes)
     
-    return render_template('student/quiz.html', papers=papers_with_quizzes)
+    etag, last_modified = paper_validators('student.quiz', published_papers)
+    return conditional_response(etag, last_modified, render)
 
 @student_bp.route('/take_quiz/<int:paper_id>')
 def take_quiz(paper_id):
@@ -89,18 +99,22 @@ def take_quiz(paper_id):
         flash('该试卷未发布，无法进行答题。' , 'error')
         return redirect(url_for('student.quiz'))
 
-    # 获取试卷中的所有题目
-    paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
-    quizzes_in_paper = []
-    for pq in paper_quizzes:
-        quiz = Quiz.get_quiz_by_id(pq.quiz_id)
-        if quiz:
-            quizzes_in_paper.append({
-                'paper_quiz': pq,
-                'quiz': quiz
-            })
+    def render():
+        # 获取试卷中的所有题目
+        paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
+        quizzes_in_paper = []
+        for pq in paper_quizzes:
+            quiz = Quiz.get_quiz_by_id(pq.quiz_id)
+            if quiz:
+                quizzes_in_paper.append({
+                    'paper_quiz': pq,
+                    'quiz': quiz
+                })
+        
+        return render_template('student/take_quiz.html', paper=paper, quizzes=quizzes_in_paper)
     
-    return render_template('student/take_quiz.html', paper=paper, quizzes=quizzes_in_paper)
+    etag, last_modified = paper_validators('student.take_quiz', [paper])
+    return conditional_response(etag, last_modified, render)
 
 @student_bp.route('/take_quiz2/<int:paper_id>')
 def take_quiz2(paper_id):
@@ -120,24 +134,28 @@ def take_quiz2(paper_id):
         flash('该试卷未发布，无法进行答题。' , 'error')
         return redirect(url_for('student.quiz'))
 
-    # 获取试卷中的所有题目
-    paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
-    quizzes_in_paper = []
-    for pq in paper_quizzes:
-        quiz = Quiz.get_quiz_by_id(pq.quiz_id)
-        if quiz:
-            quizzes_in_paper.append({
-                'paper_quiz': {
-                    'question_order': pq.question_order,
-                    'score': pq.score
-                },
-                'quiz': {
-                    'id': quiz.id,
-                    'content': quiz.content
-                }
-            })
+    def render():
+        # 获取试卷中的所有题目
+        paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
+        quizzes_in_paper = []
+        for pq in paper_quizzes:
+            quiz = Quiz.get_quiz_by_id(pq.quiz_id)
+            if quiz:
+                quizzes_in_paper.append({
+                    'paper_quiz': {
+                        'question_order': pq.question_order,
+                        'score': pq.score
+                    },
+                    'quiz': {
+                        'id': quiz.id,
+                        'content': quiz.content
+                    }
+                })
+        
+        return render_template('student/take_quiz2.html', paper=paper, quizzes=quizzes_in_paper)
     
-    return render_template('student/take_quiz2.html', paper=paper, quizzes=quizzes_in_paper)
+    etag, last_modified = paper_validators('student.take_quiz2', [paper])
+    return conditional_response(etag, last_modified, render)
 
 @student_bp.route('/ai-assistant')
 def ai_assistant():
@@ -149,7 +167,58 @@ def ai_assistant():
     
     return render_template('student/ai_assistant.html') 
 
+def get_or_create_conversation(student_id, conversation_id, ai_role):
+    """获取学生的对话；未指定或无效时创建新对话"""
+    conversation = None
+    if conversation_id:
+        conversation = Conversation.get_student_conversation(student_id, conversation_id)
+    if not conversation:
+        conversation = Conversation.add_conversation(student_id, ai_role)
+    return conversation
+
+def build_chat_messages(conversation, user_message):
+    """构建发送给大模型的消息列表（历史由服务端按token预算组装）"""
+    # 添加系统提示
+    messages = [{
+        "role": "system",
+        "content": Config.AI_SYSTEM_PROMPT
+    }]
+    
+    # 添加历史对话
+    messages.extend(assemble_history(
+        conversation,
+        token_budget=Config.AI_HISTORY_TOKEN_BUDGET,
+        summary_max_tokens=Config.AI_SUMMARY_MAX_TOKENS,
+        max_messages=Config.AI_MAX_HISTORY
+    ))
+    
+    # 添加新的用户消息
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+def save_chat_turn(conversation, user_message, ai_response):
+    """保存本轮问答到服务端对话记录"""
+    conversation.add_turn(
+        user_message, ai_response,
+        user_tokens=estimate_tokens(user_message),
+        assistant_tokens=estimate_tokens(ai_response)
+    )
+
+def parse_chat_request():
+    """解析聊天请求，返回 (用户消息, 对话, 错误信息)"""
+    data = request.get_json() or {}
+    user_message = data.get('message', '').strip()
+    if not user_message:
+        return user_message, None, '消息不能为空'
+    if len(user_message) > Config.AI_MAX_MESSAGE_CHARS:
+        return user_message, None, f'消息过长，请控制在{Config.AI_MAX_MESSAGE_CHARS}字以内'
+    conversation = get_or_create_conversation(
+        session['student_id'], data.get('conversation_id'), data.get('ai_role')
+    )
+    return user_message, conversation, None
+
 @student_bp.route('/ai_chat', methods=['POST'])
+@rate_limited('ai_chat')
 def ai_chat():
     """AI聊天接口"""
     # 检查是否已登录
@@ -157,62 +226,54 @@ def ai_chat():
         return jsonify({'success': False, 'error': '请先登录'})
     
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        conversation_history = data.get('conversation_history', [])
-        
-        if not user_message:
-            return jsonify({'success': False, 'error': '消息不能为空'})
+        user_message, conversation, error = parse_chat_request()
         
-        # 检查AI功能是否启用
-        if not Config.is_ai_enabled():
-            # 如果没有配置API密钥，返回模拟回复
-            return get_mock_response(user_message, conversation_history)
-        
-        # 初始化DeepSeek客户端
-        client = OpenAI(
-            api_key=Config.DEEPSEEK_API_KEY,
-            base_url=Config.DEEPSEEK_BASE_URL
-        )
+        if error:
+            return jsonify({'success': False, 'error': error})
         
         # 构建消息历史
-        messages = []
-        
-        # 添加系统提示
-        messages.append({
-            "role": "system",
-            "content": Config.AI_SYSTEM_PROMPT
-        })
+        messages = build_chat_messages(conversation, user_message)
         
-        # 添加历史对话
-        for msg in conversation_history:
-            messages.append(msg)
+        # 题库中有高度吻合的题目时直接用题目的答案和解析回答
+        direct_answer, passages = retrieve_for_chat(user_message, messages[1:-1], session['student_id'])
+        if direct_answer:
+            save_chat_turn(conversation, user_message, direct_answer)
+            return jsonify({
+                'success': True,
+                'response': direct_answer,
+                'cached': False,
+                'source': 'question_bank',
+                'conversation_id': conversation.id
+            })
         
-        # 添加新的用户消息
-        messages.append({"role": "user", "content": user_message})
+        def compute():
+            # 检查AI功能是否启用
+            if not Config.is_ai_enabled():
+                # 如果没有配置API密钥，返回模拟回复
+                return get_mock_reply(user_message)
+            
+            # 通过共享网关调用DeepSeek API，相关题目作为参考资料附在请求中
+            return get_llm_gateway().chat(
+                add_reference_context(messages, passages),
+                name='ai_chat',
+                max_tokens=Config.AI_MAX_TOKENS,
+                temperature=Config.AI_TEMPERATURE
+            )
         
-        # 调用DeepSeek API
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            max_tokens=Config.AI_MAX_TOKENS,
-            temperature=Config.AI_TEMPERATURE
+        # 相同问题优先使用缓存的回答
+        ai_response, cached = lookup_answer(
+            user_message, reference_cache_prompt(Config.AI_SYSTEM_PROMPT, passages), messages[1:-1], compute,
+            use_cache=not (request.get_json() or {}).get('no_cache')
         )
         
-        ai_response = response.choices[0].message.content
-        
-        # 更新对话历史
-        conversation_history.append({"role": "user", "content": user_message})
-        conversation_history.append({"role": "assistant", "content": ai_response})
-        
-        # 限制历史记录长度
-        if len(conversation_history) > Config.AI_MAX_HISTORY:
-            conversation_history = conversation_history[-Config.AI_MAX_HISTORY:]
+        # 保存对话记录
+        save_chat_turn(conversation, user_message, ai_response)
         
         return jsonify({
             'success': True,
             'response': ai_response,
-            'conversation_history': conversation_history
+            'cached': cached,
+            'conversation_id': conversation.id
         })
         
     except Exception as e:
@@ -222,8 +283,85 @@ def ai_chat():
             'error': f'AI服务暂时不可用: {str(e)}'
         })
 
-def get_mock_response(user_message, conversation_history):
-    """当没有配置API密钥时的模拟回复"""
+@student_bp.route('/ai_chat_stream', methods=['POST'])
+@rate_limited('ai_chat')
+def ai_chat_stream():
+    """AI聊天接口（流式）：以SSE逐段推送回复
+
+    事件格式：
+    - 默认事件 data: {"delta": "..."}，为新生成的文本片段
+    - event: done，data 中包含完整回复和对话ID
+    - event: error，data 中包含错误信息
+    """
+    # 检查是否已登录
+    if 'student_id' not in session:
+        return jsonify({'success': False, 'error': '请先登录'})
+    
+    user_message, conversation, error = parse_chat_request()
+    
+    if error:
+        return jsonify({'success': False, 'error': error})
+    
+    use_cache = not (request.get_json() or {}).get('no_cache')
+    student_id = session['student_id']
+    
+    def generate():
+        chunks = None
+        parts = []
+        try:
+            messages = build_chat_messages(conversation, user_message)
+            direct_answer, passages = retrieve_for_chat(user_message, messages[1:-1], student_id)
+            cache_key, cached_answer = (None, None) if direct_answer else begin_lookup(
+                user_message, reference_cache_prompt(Config.AI_SYSTEM_PROMPT, passages), messages[1:-1], use_cache
+            )
+            if direct_answer:
+                # 题库中有高度吻合的题目：一次性推送题目的答案和解析
+                chunks = iter([direct_answer])
+            elif cached_answer is not None:
+                # 命中缓存：一次性推送完整回答
+                chunks = iter([cached_answer])
+            elif Config.is_ai_enabled():
+                chunks = get_llm_gateway().stream_chat(
+                    add_reference_context(messages, passages),
+                    name='ai_chat_stream',
+                    max_tokens=Config.AI_MAX_TOKENS,
+                    temperature=Config.AI_TEMPERATURE
+                )
+            else:
+                # 演示模式：把模拟回复分段推送
+                mock_reply = get_mock_reply(user_message)
+                chunks = (mock_reply[i:i + 8] for i in range(0, len(mock_reply), 8))
+            
+            for delta in chunks:
+                parts.append(delta)
+                yield format_sse({'delta': delta})
+        except Exception as e:
+            current_app.logger.error(f"AI Chat Stream Error: {str(e)}")
+            yield format_sse({'error': f'AI服务暂时不可用: {str(e)}'}, event='error')
+            return
+        finally:
+            # 客户端断开时关闭上游流，停止继续生成
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        
+        # 只保存完整生成的回复，中途断开的不保存
+        ai_response = ''.join(parts)
+        if cached_answer is None and not direct_answer:
+            store_answer(cache_key, ai_response)
+        save_chat_turn(conversation, user_message, ai_response)
+        done = {
+            'response': ai_response,
+            'cached': cached_answer is not None,
+            'conversation_id': conversation.id
+        }
+        if direct_answer:
+            done['source'] = 'question_bank'
+        yield format_sse(done, event='done')
+    
+    return sse_response(generate())
+
+def get_mock_reply(user_message):
+    """当没有配置API密钥时的模拟回复文本"""
     mock_responses = {
         "你好": "你好！我是AI智能体助手，很高兴为你服务！",
         "hello": "Hello! I'm here to help you with your studies!",
@@ -241,16 +379,7 @@ def get_mock_response(user_message, conversation_history):
         if keyword in user_lower:
             response = mock_reply + "\n\n(当前为演示模式，请配置API密钥以获得完整AI功能)"
             break
-    
-    # 更新对话历史
-    conversation_history.append({"role": "user", "content": user_message})
-    conversation_history.append({"role": "assistant", "content": response})
-    
-    return jsonify({
-        'success': True,
-        'response': response,
-        'conversation_history': conversation_history
-    })
+    return response
 
 @student_bp.route('/submit_quiz/<int:paper_id>', methods=['POST'])
 def submit_quiz(paper_id):
@@ -295,15 +424,10 @@ def submit_quiz(paper_id):
                 is_correct = False
                 score = 0.0
                 
-                if quiz and quiz.answer:
-                    # 简单的文本比较判题（忽略大小写和首尾空格）
-                    correct_answer = quiz.answer.strip().lower()
-                    student_answer_normalized = student_answer.strip().lower()
-                    
-                    if correct_answer == student_answer_normalized:
-                        is_correct = True
-                        score = pq.score  # 使用试卷中设定的分值
-                        total_correct += 1
+                if quiz and Answer.is_correct_answer(student_answer, quiz.answer):
+                    is_correct = True
+                    score = pq.score  # 使用试卷中设定的分值
+                    total_correct += 1
                 
                 total_score += score
                 
@@ -528,37 +652,15 @@ def use_tool(tool_id):
     tool.increment_views()
     
     try:
-        # 如果是URL链接占位文件：读取并重定向到目标链接
-        if tool.file_name.lower().startswith(URL_LINK_PREFIX):
-            with open(tool.file_path, 'r', encoding='utf-8') as f:
-                content_all = f.read()
-            # 优先从全文提取第一个 http(s) 链接
-            url_match = re.search(r"https?://[^\s\"'<>]+", content_all, re.IGNORECASE)
-            if url_match:
-                return redirect(url_match.group(0))
-            # 回退：首个非空行，清理BOM/引号并补全协议
-            first_non_empty_line = ''
-            for line in content_all.splitlines():
-                stripped = line.strip().lstrip('\ufeff')
-                if stripped:
-                    first_non_empty_line = stripped
-                    break
-            if not first_non_empty_line:
+        # URL链接工具：跳转地址已在上传时解析，直接重定向
+        if Tool.is_url_link_file(tool.file_name):
+            if not tool.target_url:
                 flash('跳转地址为空！', 'error')
                 return redirect(url_for('student.toolbox'))
-            target_url = first_non_empty_line
-            if (target_url.startswith('"') and target_url.endswith('"')) or (target_url.startswith("'") and target_url.endswith("'")):
-                target_url = target_url[1:-1].strip()
-            if target_url.lower().startswith('www.'):
-                target_url = 'http://' + target_url
-            if not (target_url.lower().startswith('http://') or target_url.lower().startswith('https://')):
-                target_url = 'http://' + target_url
-            return redirect(target_url)
+            return redirect(tool.target_url)
 
-        # 常规HTML：读取并返回内容
-        with open(tool.file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
+        # 常规HTML：读取并返回内容（经内存缓存，文件未修改时不读磁盘）
+        return tool_content_response(tool.file_path)
     
     except Exception as e:
         current_app.logger.error(f"加载工具失败: {str(e)}")
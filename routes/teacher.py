@@ -2,20 +2,37 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from models.paper import Paper
 from models.paper_quiz import PaperQuiz
 from models.quiz import Quiz
+from models.quiz_tag import QuizTag
 from models.answer import Answer
 from models.exam_record import ExamRecord
 from models.tool import Tool
+from models.background_job import BackgroundJob
+from models.student_analysis_report import StudentAnalysisReport
 from models import db
 import os
-from openai import OpenAI
 import json
 import logging
 from config import Config
+from services.http_cache import conditional_response, paper_validators
+from services.tool_cache import get_tool_cache, tool_content_response
+from services.tool_storage import store_upload, release_file
+from services.llm_gateway import get_llm_gateway
+from services.answer_cache import get_answer_cache
+from services.quiz_generation import generate_quizzes, run_quiz_job, save_generated_quizzes, quiz_tags_for
+from services.quiz_dedupe import get_quiz_index
+from services.student_analysis import (
+    prepare_ai_analysis_prompt, call_ai_for_analysis, generate_mock_analysis, run_batch_analysis_job
+)
+from services.jobs import get_job_runner, JobQueueFullError
+from services.rate_limit import rate_limited, get_rate_limiter
+from services.paper_assembly import parse_constraints, assemble_paper as run_paper_assembly, PaperAssemblyError
+from services.paper_deletion import submit_paper_deletion
+from services.bulk_import import submit_import as queue_import_job, ImportFormatError
+from services.data_export import EXPORT_KINDS, EXPORT_FORMATS, ExportError, parse_filters, export_response
 from collections import defaultdict
-import re
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-import uuid
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # 创建老师蓝图
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/teacher')
@@ -23,7 +40,9 @@ teacher_bp = Blueprint('teacher', __name__, url_prefix='/teacher')
 # 配置文件上传
 UPLOAD_FOLDER = 'static/tools'
 ALLOWED_EXTENSIONS = {'html', 'htm'}
-URL_LINK_PREFIX = 'url_'
+
+# 正在后台删除的试卷不能再修改或复制
+PAPER_DELETING_ERROR = '试卷正在删除，不能修改！'
 
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
@@ -77,27 +96,31 @@ def view_paper(paper_id):
         flash('试卷不存在！', 'error')
         return redirect(url_for('teacher.paper_management'))
     
-    # 获取试卷中的所有题目
-    paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
-    quizzes_with_info = []
-    
-    for pq in paper_quizzes:
-        quiz = Quiz.get_quiz_by_id(pq.quiz_id)
-        if quiz:
-            quizzes_with_info.append({
-                'paper_quiz': pq,
-                'quiz': quiz
-            })
-    
-    # 计算试卷统计信息
-    total_questions = len(quizzes_with_info)
-    total_score = sum(pq['paper_quiz'].score for pq in quizzes_with_info)
+    def render():
+        # 获取试卷中的所有题目
+        paper_quizzes = PaperQuiz.get_paper_quizzes(paper_id)
+        quizzes_with_info = []
+        
+        for pq in paper_quizzes:
+            quiz = Quiz.get_quiz_by_id(pq.quiz_id)
+            if quiz:
+                quizzes_with_info.append({
+                    'paper_quiz': pq,
+                    'quiz': quiz
+                })
+        
+        # 计算试卷统计信息
+        total_questions = len(quizzes_with_info)
+        total_score = sum(pq['paper_quiz'].score for pq in quizzes_with_info)
+        
+        return render_template('teacher/view_paper.html', 
+                             paper=paper, 
+                             quizzes=quizzes_with_info,
+                             total_questions=total_questions,
+                             total_score=total_score)
     
-    return render_template('teacher/view_paper.html', 
-                         paper=paper, 
-                         quizzes=quizzes_with_info,
-                         total_questions=total_questions,
-                         total_score=total_score)
+    etag, last_modified = paper_validators('teacher.view_paper', [paper])
+    return conditional_response(etag, last_modified, render)
 
 @teacher_bp.route('/paper/create', methods=['GET', 'POST'])
 def create_paper():
@@ -120,6 +143,9 @@ def edit_paper(paper_id):
     if not paper:
         flash('试卷不存在！', 'error')
         return redirect(url_for('teacher.paper_management'))
+    if paper.status == Paper.STATUS_DELETING:
+        flash(PAPER_DELETING_ERROR, 'error')
+        return redirect(url_for('teacher.paper_management'))
     
     if request.method == 'POST':
         name = request.form.get('name')
@@ -164,6 +190,10 @@ def add_quiz_to_paper(paper_id):
     if not quiz_id:
         flash('请选择要添加的题目！', 'error')
         return redirect(url_for('teacher.edit_paper', paper_id=paper_id))
+    paper = Paper.get_paper_by_id(paper_id)
+    if not paper or paper.status == Paper.STATUS_DELETING:
+        flash('试卷不存在！' if not paper else PAPER_DELETING_ERROR, 'error')
+        return redirect(url_for('teacher.paper_management'))
     
     # 检查题目是否已存在于试卷中
     existing_pq = PaperQuiz.query.filter_by(paper_id=paper_id, quiz_id=quiz_id).first()
@@ -171,9 +201,10 @@ def add_quiz_to_paper(paper_id):
         flash('该题目已存在于当前试卷中！', 'warning')
         return redirect(url_for('teacher.edit_paper', paper_id=paper_id))
 
-    # 获取当前试卷中题目数量，作为新题目的顺序
-    paper_quizzes_count = PaperQuiz.query.filter_by(paper_id=paper_id).count()
-    new_order = paper_quizzes_count + 1
+    # 排在当前最后一道题之后
+    new_order = (db.session.query(db.func.max(PaperQuiz.question_order)).filter(
+        PaperQuiz.paper_id == paper_id
+    ).scalar() or 0) + 1
 
     # 可以设置默认分值，或者从表单获取
     default_score = 2.0 # 假设默认分值是2分
@@ -191,6 +222,121 @@ def add_quiz_to_paper(paper_id):
     
     return redirect(url_for('teacher.edit_paper', paper_id=paper_id))
 
+@teacher_bp.route('/paper/<int:paper_id>/assemble', methods=['POST'])
+def assemble_paper(paper_id):
+    """按约束条件自动抽题并追加到试卷（表单提交时跳转回编辑页，JSON请求返回JSON）"""
+    paper = Paper.get_paper_by_id(paper_id)
+    data = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+    error, status = None, 200
+    if not paper:
+        error, status = '试卷不存在！', 404
+    elif paper.status == Paper.STATUS_DELETING:
+        error, status = PAPER_DELETING_ERROR, 409
+    else:
+        try:
+            constraints = parse_constraints(data or {}, current_app.config['PAPER_ASSEMBLY_MAX_QUESTIONS'])
+            quiz_ids, scores = run_paper_assembly(paper_id, constraints)
+        except PaperAssemblyError as e:
+            error, status = str(e), 400
+
+    if request.is_json:
+        if error:
+            return jsonify({'success': False, 'error': error}), status
+        return jsonify({'success': True, 'quiz_ids': quiz_ids, 'scores': scores, 'total_score': round(sum(scores), 2)})
+    if error:
+        flash(f'自动组卷失败：{error}', 'error')
+    else:
+        flash(f'已自动添加 {len(quiz_ids)} 道题目，共 {round(sum(scores), 2)} 分！', 'success')
+    if status in (404, 409):
+        return redirect(url_for('teacher.paper_management'))
+    return redirect(url_for('teacher.edit_paper', paper_id=paper_id))
+
+def parse_paper_quiz_items(data, max_questions):
+    """校验批量编辑的题目列表，返回 ((题目ID, 分值) 列表, 错误信息)"""
+    entries = data.get('quizzes') if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return None, '请求中缺少题目列表quizzes'
+    if len(entries) > max_questions:
+        return None, f'一份试卷最多{max_questions}道题目'
+    items = []
+    seen = set()
+    for entry in entries:
+        try:
+            quiz_id = int(entry['quiz_id'])
+            score = float(entry.get('score', 1.0))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            return None, '每道题目需要整数quiz_id和数字score'
+        if score < 0:
+            return None, f'题目{quiz_id}的分值不能为负数'
+        if quiz_id in seen:
+            return None, f'题目{quiz_id}重复出现'
+        seen.add(quiz_id)
+        items.append((quiz_id, score))
+    if seen:
+        found = {quiz_id for quiz_id, in db.session.query(Quiz.id).filter(Quiz.id.in_(seen))}
+        missing = sorted(seen - found)
+        if missing:
+            return None, f'题目不存在: {missing[:10]}'
+    return items, None
+
+@teacher_bp.route('/paper/<int:paper_id>/quizzes', methods=['PUT'])
+def update_paper_quizzes(paper_id):
+    """按完整的有序题目列表批量编辑试卷（增删题目、调整顺序和分值），一个事务内完成"""
+    paper = Paper.get_paper_by_id(paper_id)
+    if not paper:
+        return jsonify({'success': False, 'error': '试卷不存在'}), 404
+    if paper.status == Paper.STATUS_DELETING:
+        return jsonify({'success': False, 'error': PAPER_DELETING_ERROR}), 409
+    items, error = parse_paper_quiz_items(request.get_json(silent=True),
+                                          current_app.config['PAPER_MAX_QUESTIONS'])
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    try:
+        changes = PaperQuiz.replace_paper_quizzes(paper_id, items)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'保存失败: {e}'}), 500
+    return jsonify({
+        'success': True,
+        'changes': changes,
+        'question_count': len(items),
+        'total_score': round(sum(score for _, score in items), 2)
+    })
+
+@teacher_bp.route('/paper/<int:paper_id>/clone', methods=['POST'])
+def clone_paper(paper_id):
+    """复制试卷（可选同时复制题目），表单提交时跳转到新试卷的编辑页，JSON请求返回JSON"""
+    data = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+    data = data or {}
+    copy_quizzes = str(data.get('copy_quizzes', '')).lower() in ('1', 'true', 'on', 'yes')
+    name = (data.get('name') or '').strip() or None
+    error, status = None, 200
+    source = Paper.get_paper_by_id(paper_id)
+    if not source:
+        error, status = '试卷不存在！', 404
+    elif source.status == Paper.STATUS_DELETING:
+        error, status = PAPER_DELETING_ERROR, 409
+    else:
+        try:
+            paper = Paper.clone_paper(paper_id, name=name, copy_quizzes=copy_quizzes)
+            if not paper:
+                error, status = '试卷不存在！', 404
+        except Exception as e:
+            error, status = f'复制试卷失败: {e}', 500
+
+    if request.is_json:
+        if error:
+            return jsonify({'success': False, 'error': error}), status
+        return jsonify({
+            'success': True,
+            'paper': paper.to_dict(),
+            'question_count': PaperQuiz.query.filter_by(paper_id=paper.id).count()
+        })
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('teacher.paper_management'))
+    flash(f'试卷已复制为“{paper.name}”！', 'success')
+    return redirect(url_for('teacher.edit_paper', paper_id=paper.id))
+
 @teacher_bp.route('/paper/<int:paper_id>/remove_quiz', methods=['POST'])
 def remove_quiz_from_paper(paper_id):
     """从试卷中移除题目"""
@@ -198,6 +344,10 @@ def remove_quiz_from_paper(paper_id):
     if not quiz_id:
         flash('请选择要移除的题目！', 'error')
         return redirect(url_for('teacher.edit_paper', paper_id=paper_id))
+    paper = Paper.get_paper_by_id(paper_id)
+    if not paper or paper.status == Paper.STATUS_DELETING:
+        flash('试卷不存在！' if not paper else PAPER_DELETING_ERROR, 'error')
+        return redirect(url_for('teacher.paper_management'))
     
     try:
         success = PaperQuiz.remove_quiz_from_paper(paper_id, quiz_id)
@@ -212,19 +362,43 @@ def remove_quiz_from_paper(paper_id):
 
 @teacher_bp.route('/paper/<int:paper_id>/delete', methods=['POST'])
 def delete_paper(paper_id):
-    """删除试卷"""
-    # 在删除试卷前，先删除所有关联的PaperQuiz和Answer记录
-    with db.session.no_autoflush:
-        PaperQuiz.query.filter_by(paper_id=paper_id).delete()
-        Answer.query.filter_by(paper_id=paper_id).delete()
-        
-    success = Paper.delete_paper(paper_id)
-    if success:
-        flash('试卷删除成功！', 'success')
+    """提交后台删除试卷任务（连同答题记录、考试记录、题目关联和相关分析报告）
+
+    表单提交时跳转回试卷管理页，JSON请求返回任务ID和进度查询地址。
+    """
+    error, status = None, 202
+    try:
+        job = submit_paper_deletion(paper_id, created_by=session.get('teacher_id'))
+        if not job:
+            error, status = '试卷不存在！', 404
+    except JobQueueFullError as e:
+        error, status = str(e), 503
+
+    if request.is_json:
+        if error:
+            response = jsonify({'success': False, 'error': error})
+            if status == 503:
+                response.headers['Retry-After'] = '10'
+            return response, status
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': url_for('teacher.paper_deletion_status', job_id=job.id)
+        }), 202
+    if error:
+        flash(f'试卷删除失败：{error}', 'error')
     else:
-        flash('试卷删除失败！', 'error')
+        flash('试卷正在后台删除，完成后将从列表中移除。', 'success')
     return redirect(url_for('teacher.paper_management'))
 
+@teacher_bp.route('/paper/delete-jobs/<job_id>')
+def paper_deletion_status(job_id):
+    """查询删除试卷任务进度"""
+    job = BackgroundJob.get_job(job_id, kind='paper_deletion')
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 @teacher_bp.route('/paper/<int:paper_id>/publish', methods=['POST'])
 def publish_paper(paper_id):
     """发布试卷"""
@@ -245,100 +419,80 @@ def unpublish_paper(paper_id):
         flash('操作失败！', 'error')
     return redirect(url_for('teacher.paper_management'))
 
+def parse_smart_quiz_form():
+    """解析并校验出题表单，返回 (出题参数, 题目数量, 错误信息)"""
+    subject = request.form.get('subject')
+    grade = request.form.get('grade')
+    question_type = request.form.get('question_type')
+    try:
+        num_questions = int(request.form.get('num_questions', 1))
+    except ValueError:
+        num_questions = 0
+    knowledge_points = request.form.get('knowledge_points')
+    current_app.logger.debug(
+        "[smart_quiz] Form params: subject=%s grade=%s type=%s num=%s kp_len=%s",
+        subject, grade, question_type, num_questions, len(knowledge_points or "")
+    )
+
+    if not all([subject, grade, question_type, num_questions, knowledge_points]):
+        current_app.logger.debug("[smart_quiz] Missing required fields.")
+        return None, 0, '请填写所有必填项！'
+
+    if not Config.DEEPSEEK_API_KEY:
+        current_app.logger.error("[smart_quiz] OPENAI_API_KEY is not set.")
+        return None, 0, 'OpenAI API 密钥未配置，请设置 OPENAI_API_KEY 环境变量。'
+
+    max_questions = current_app.config['SMART_QUIZ_MAX_QUESTIONS']
+    if num_questions < 1 or num_questions > max_questions:
+        return None, 0, f'题目数量需在1到{max_questions}之间！'
+
+    params = {
+        'subject': subject,
+        'grade': grade,
+        'question_type': question_type,
+        'knowledge_points': knowledge_points
+    }
+    return params, num_questions, None
+
+def smart_quiz_settings():
+    """分组生成相关配置"""
+    return {
+        'chunk_size': current_app.config['SMART_QUIZ_CHUNK_SIZE'],
+        'max_concurrency': current_app.config['SMART_QUIZ_MAX_CONCURRENCY'],
+        'retries': current_app.config['SMART_QUIZ_CHUNK_RETRIES']
+    }
+
 @teacher_bp.route('/smart-quiz', methods=['GET', 'POST'])
+@rate_limited('smart_quiz')
 def smart_quiz():
-    """智能出题页面"""
+    """智能出题页面（页面默认提交后台任务，此处的表单提交为未启用脚本时的同步方式）"""
     current_app.logger.debug("[smart_quiz] Entered function. method=%s", request.method)
     generated_quizzes = []
     if request.method == 'POST':
-        subject = request.form.get('subject')
-        grade = request.form.get('grade')
-        question_type = request.form.get('question_type')
-        num_questions = int(request.form.get('num_questions', 1))
-        knowledge_points = request.form.get('knowledge_points')
-        current_app.logger.debug(
-            "[smart_quiz] Form params: subject=%s grade=%s type=%s num=%s kp_len=%s",
-            subject, grade, question_type, num_questions, len(knowledge_points or "")
-        )
-
-        if not all([subject, grade, question_type, num_questions, knowledge_points]):
-            current_app.logger.debug("[smart_quiz] Missing required fields.")
-            flash('请填写所有必填项！', 'error')
-            return render_template('teacher/smart_quiz.html', generated_quizzes=generated_quizzes)
-
-        if not Config.DEEPSEEK_API_KEY:
-            current_app.logger.error("[smart_quiz] OPENAI_API_KEY is not set.")
-            flash('OpenAI API 密钥未配置，请设置 OPENAI_API_KEY 环境变量。' , 'error')
+        params, num_questions, error = parse_smart_quiz_form()
+        if error:
+            flash(error, 'error')
             return render_template('teacher/smart_quiz.html', generated_quizzes=generated_quizzes)
 
-        # 注意：避免在 f-string 中直接包含未转义的大括号，采用首段 f-string + 后续普通字符串拼接
-        prompt = (
-            f"请生成{num_questions}道关于{subject}{grade}的{question_type}，主要考察{knowledge_points}知识点。\n"
-            "每道题目需包含：题目内容(content)、题目答案(answer)、题目分析(analysis)。\n"
-            "请严格按照以下JSON格式返回（不要添加任何其他文字）：\n"
-            "{\n"
-            "  \"quizzes\": [\n"
-            "    {\"id\": 1, \"content\": \"题目内容描述。A. 选项1, B. 选项2, C. 选项3, D. 选项4\", \"answer\": \"B\", \"analysis\": \"答案解析\"},\n"
-            "    {\"id\": 2, \"content\": \"题目内容描述。A. 选项1, B. 选项2, C. 选项3, D. 选项4\", \"answer\": \"D\", \"analysis\": \"答案解析\"}\n"
-            "  ]\n"
-            "}\n"
-            "请确保JSON格式严格正确，并且所有键都必须是英文小写。\n"
-            "确保题型正确，如选择题，填空题，判断题，简答题，计算题，应用题，证明题，论述题，分析题，综合题，开放题，讨论题，辩论题，演讲题，写作题，翻译题，阅读理解题，听力理解题，口语交际题，作文题，其他题型。\n"
-            "选择题的题目和选项作为content的值，答案作为answer的值，分析作为analysis的值。"
-            "注意：选择题的正确答案要随机一点，不要每次都是A，也不要有规律。"
-        )
-        current_app.logger.debug("[smart_quiz] Prompt length=%s", len(prompt))
-
         try:
-            # 注意：base_url 和 model 可能由外部修改为 deepseek
-            current_app.logger.debug("[smart_quiz] Calling LLM chat.completions.create ...")
-            client = OpenAI(api_key=Config.DEEPSEEK_API_KEY, base_url=Config.DEEPSEEK_BASE_URL)
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "你是一位专业的教师，擅长出题。请严格按照用户要求生成题目，并以JSON格式返回。"
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=4000
-            )
-            current_app.logger.debug(
-                "[smart_quiz] LLM response received. has_choices=%s",
-                hasattr(response, 'choices')
-            )
-
-            response_content = response.choices[0].message.content if getattr(response, 'choices', None) else ''
-            current_app.logger.debug("[smart_quiz] Response content length=%s", len(response_content or ""))
-            current_app.logger.debug("[smart_quiz] Response content=%s", response_content)
-            data = json.loads(response_content)
-            quizzes = data.get("quizzes", [])
-            current_app.logger.debug("[smart_quiz] Parsed quizzes count=%s", len(quizzes))
+            current_app.logger.debug("[smart_quiz] Generating %s quizzes in chunks ...", num_questions)
+            quizzes, errors = generate_quizzes(params, num_questions, **smart_quiz_settings())
+            current_app.logger.debug("[smart_quiz] Parsed quizzes count=%s failed_parts=%s", len(quizzes), len(errors))
 
             if quizzes:
-                saved = 0
-                for q_data in quizzes:
-                    content = q_data.get('content')
-                    answer = q_data.get('answer')
-                    analysis = q_data.get('analysis')
-                    if content and answer:
-                        new_quiz = Quiz.add_quiz(content=content, answer=answer, analysis=analysis)
-                        generated_quizzes.append(new_quiz)
-                        saved += 1
-                current_app.logger.debug("[smart_quiz] Saved quizzes count=%s", saved)
-                flash(f'成功生成并保存 {saved} 道题目！', 'success')
-            else:
-                current_app.logger.error("[smart_quiz] JSON missing 'quizzes' or empty.")
-                flash('AI返回的数据格式不正确，请重试。' , 'error')
+                generated_quizzes, duplicates = save_generated_quizzes(quizzes, quiz_tags_for(params))
+                current_app.logger.debug("[smart_quiz] Saved quizzes count=%s", len(generated_quizzes))
+                flash(f'成功生成并保存 {len(generated_quizzes)} 道题目！', 'success')
+                if duplicates:
+                    skipped = '，已跳过' if current_app.config['QUIZ_DEDUPE_SKIP'] else ''
+                    flash(f'有 {len(duplicates)} 道题目与题库中的题目近似重复{skipped}。', 'error')
+            if errors:
+                current_app.logger.error("[smart_quiz] Failed parts: %s", errors)
+                if quizzes:
+                    flash(f'有 {len(errors)} 组题目生成失败，已保存其余题目，可重新生成补足数量。', 'error')
+                else:
+                    flash('AI返回的数据格式不正确，请重试。', 'error')
 
-        except json.JSONDecodeError as e:
-            current_app.logger.exception("[smart_quiz] JSON decode error: %s", e)
-            flash('AI返回的响应不是有效的JSON格式，请重试。' , 'error')
         except Exception as e:
             current_app.logger.exception("[smart_quiz] Unexpected error: %s", e)
             flash(f'生成题目时发生未知错误: {e}', 'error')
@@ -348,6 +502,152 @@ def smart_quiz():
 
     return render_template('teacher/smart_quiz.html', generated_quizzes=generated_quizzes)
 
+@teacher_bp.route('/smart-quiz/jobs', methods=['POST'])
+@rate_limited('smart_quiz', llm=False)
+def submit_smart_quiz_job():
+    """提交后台出题任务，立即返回任务ID"""
+    params, num_questions, error = parse_smart_quiz_form()
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    settings = smart_quiz_settings()
+    try:
+        job = get_job_runner().submit(
+            'smart_quiz', run_quiz_job, params, num_questions,
+            settings['chunk_size'], settings['max_concurrency'], settings['retries'],
+            total=num_questions, created_by=session.get('teacher_id')
+        )
+    except JobQueueFullError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    current_app.logger.debug("[smart_quiz] Submitted job %s", job.id)
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': url_for('teacher.smart_quiz_job_status', job_id=job.id)
+    }), 202
+
+@teacher_bp.route('/smart-quiz/jobs/<job_id>')
+def smart_quiz_job_status(job_id):
+    """查询出题任务进度，返回任务状态和已保存的题目"""
+    job = BackgroundJob.get_job(job_id, kind='smart_quiz')
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+
+    data = job.to_dict()
+    quiz_ids = data['result'].get('quiz_ids', [])
+    quizzes = Quiz.query.filter(Quiz.id.in_(quiz_ids)).order_by(Quiz.id).all() if quiz_ids else []
+    data['quizzes'] = [quiz.to_dict() for quiz in quizzes]
+    return jsonify({'success': True, 'job': data})
+
+@teacher_bp.route('/import', methods=['POST'])
+def submit_import():
+    """上传CSV/JSONL文件（kind 为 quizzes 题目或 answers 答题卡），提交后台导入任务"""
+    try:
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'success': False, 'error': '请选择要导入的文件'}), 400
+        job = queue_import_job(request.form.get('kind', 'quizzes'), file, request.form.get('format') or None,
+                            created_by=session.get('teacher_id'))
+    except RequestEntityTooLarge:
+        max_mb = current_app.config['IMPORT_MAX_CONTENT_LENGTH'] / (1024 * 1024)
+        return jsonify({'success': False, 'error': f'文件过大，最大允许上传 {max_mb:.0f} MB'}), 413
+    except ImportFormatError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except JobQueueFullError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': url_for('teacher.import_status', job_id=job.id)
+    }), 202
+
+@teacher_bp.route('/import/<job_id>')
+def import_status(job_id):
+    """查询导入任务进度和结果（导入行数、跳过的行及原因）"""
+    job = BackgroundJob.get_job(job_id)
+    if not job or not job.kind.startswith('import_'):
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@teacher_bp.route('/export/<kind>')
+def export_data(kind):
+    """流式导出答题记录（answers）或考试记录（exam_records），可按试卷、学生和时间范围筛选"""
+    fmt = request.args.get('format', 'csv')
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': '导出类型必须是answers或exam_records，格式必须是csv或jsonl'}), 400
+    try:
+        filters = parse_filters(request.args)
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return export_response(kind, fmt, filters)
+
+@teacher_bp.route('/api/quiz_duplicates')
+def api_quiz_duplicates():
+    """题库近似重复报告：返回相似题目分组"""
+    index = get_quiz_index()
+    groups = index.duplicate_groups()
+    limit = request.args.get('limit', 100, type=int)
+    shown = groups[:limit]
+    quiz_ids = [quiz_id for ids, _ in shown for quiz_id in ids]
+    contents = dict(
+        db.session.query(Quiz.id, Quiz.content).filter(Quiz.id.in_(quiz_ids)).all()
+    ) if quiz_ids else {}
+    return jsonify({
+        'success': True,
+        'threshold': index.threshold,
+        'total_quizzes': index.stats()['quizzes'],
+        'group_count': len(groups),
+        'duplicate_count': sum(len(ids) - 1 for ids, _ in groups),
+        'groups': [
+            {
+                'quiz_ids': ids,
+                'similarity': round(similarity, 2),
+                'quizzes': [{'id': quiz_id, 'content': contents.get(quiz_id)} for quiz_id in ids]
+            }
+            for ids, similarity in shown
+        ]
+    })
+
+@teacher_bp.route('/api/quizzes/search')
+def api_search_quizzes():
+    """题库搜索API：按相关度返回分页结果
+
+    参数：q 为关键词（空白分隔，需同时匹配），page、per_page 为分页，
+    exclude_paper_id 可排除已在该试卷中的题目。
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': '请输入搜索关键词'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    quizzes, total = Quiz.search_quizzes(
+        query, page=page, per_page=per_page,
+        exclude_paper_id=request.args.get('exclude_paper_id', type=int)
+    )
+    return jsonify({
+        'success': True,
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'quizzes': [quiz.to_dict() for quiz in quizzes]
+    })
+
+@teacher_bp.route('/api/quiz_tags')
+def api_quiz_tags():
+    """题目标签列表API：各标签（学科、知识点等）的题目数，供自动组卷选择"""
+    return jsonify({
+        'success': True,
+        'tags': [{'tag': tag, 'count': count} for tag, count in QuizTag.get_tag_counts()]
+    })
+
 @teacher_bp.route('/statistics')
 def statistics():
     """统计分析页面"""
@@ -592,6 +892,7 @@ def student_analysis(student_id):
                          analysis_data=analysis_data)
 
 @teacher_bp.route('/api/generate_student_analysis', methods=['POST'])
+@rate_limited('student_analysis')
 def generate_student_analysis():
     """使用AI生成学生学习分析报告"""
     try:
@@ -601,25 +902,39 @@ def generate_student_analysis():
         if not student_id:
             return jsonify({'success': False, 'error': '学生ID不能为空'})
         
+        # 学生数据没有变化时直接返回已保存的报告
+        fingerprint = StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL)
+        if fingerprint is None:
+            return jsonify({'success': False, 'error': '该学生没有考试记录'})
+        if Config.is_ai_enabled() and not data.get('refresh'):
+            saved = StudentAnalysisReport.get_valid_report(student_id, fingerprint)
+            if saved:
+                return jsonify({
+                    'success': True,
+                    'analysis': saved.report,
+                    'cached': True,
+                    'generated_at': saved.updated_at.isoformat()
+                })
+        
         # 获取学生数据
         exam_records = ExamRecord.get_student_exam_records(student_id)
         all_answers = Answer.get_student_answers(student_id)
         
-        if not exam_records:
-            return jsonify({'success': False, 'error': '该学生没有考试记录'})
-        
         # 准备AI分析的数据
         analysis_prompt = prepare_ai_analysis_prompt(student_id, exam_records, all_answers)
         
-        # 调用AI生成分析报告
+        # 调用AI生成分析报告（演示模式的报告不保存）
         if Config.is_ai_enabled():
             ai_analysis = call_ai_for_analysis(analysis_prompt)
+            if ai_analysis:
+                StudentAnalysisReport.save_report(student_id, fingerprint, ai_analysis)
         else:
             ai_analysis = generate_mock_analysis(student_id, exam_records)
         
         return jsonify({
             'success': True,
-            'analysis': ai_analysis
+            'analysis': ai_analysis,
+            'cached': False
         })
         
     except Exception as e:
@@ -629,6 +944,51 @@ def generate_student_analysis():
             'error': f'分析生成失败: {str(e)}'
         })
 
+@teacher_bp.route('/api/batch_analysis', methods=['POST'])
+def submit_batch_analysis():
+    """提交全班（或指定学生）AI分析报告的批量生成任务"""
+    data = request.get_json(silent=True) or {}
+    if not Config.is_ai_enabled():
+        return jsonify({'success': False, 'error': '未配置DEEPSEEK_API_KEY，演示模式下不支持批量生成'}), 400
+    if current_app.config['ANALYSIS_BATCH_RATE_PER_MINUTE'] <= 0:
+        return jsonify({'success': False, 'error': 'ANALYSIS_BATCH_RATE_PER_MINUTE 必须大于0'}), 500
+
+    student_ids = data.get('student_ids')
+    if student_ids:
+        # 去重并保持顺序
+        student_ids = list(dict.fromkeys(str(student_id) for student_id in student_ids))
+    else:
+        student_ids = ExamRecord.get_student_ids()
+    if not student_ids:
+        return jsonify({'success': False, 'error': '没有可分析的学生'}), 400
+
+    try:
+        job = get_job_runner().submit(
+            'batch_analysis', run_batch_analysis_job, student_ids, bool(data.get('refresh')),
+            Config.DEEPSEEK_MODEL,
+            current_app.config['ANALYSIS_BATCH_CONCURRENCY'],
+            current_app.config['ANALYSIS_BATCH_RATE_PER_MINUTE'],
+            total=len(student_ids), created_by=session.get('teacher_id')
+        )
+    except JobQueueFullError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': url_for('teacher.batch_analysis_status', job_id=job.id)
+    }), 202
+
+@teacher_bp.route('/api/batch_analysis/<job_id>')
+def batch_analysis_status(job_id):
+    """查询批量分析任务进度"""
+    job = BackgroundJob.get_job(job_id, kind='batch_analysis')
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
 def prepare_student_analysis_data(student_id, exam_records, all_answers):
     """准备学生分析数据"""
     # 基础统计
@@ -720,104 +1080,6 @@ def analyze_error_patterns(wrong_answers):
     
     return sorted(patterns, key=lambda x: x['error_count'], reverse=True)
 
-def prepare_ai_analysis_prompt(student_id, exam_records, all_answers):
-    """准备AI分析的提示词"""
-    # 统计数据
-    total_exams = len(exam_records)
-    total_score = sum(record.total_score for record in exam_records)
-    total_max_score = sum(record.max_score for record in exam_records)
-    success_rate = (total_score / total_max_score * 100) if total_max_score > 0 else 0
-    
-    # 错误答案分析
-    wrong_answers = [answer for answer in all_answers if not answer.is_correct]
-    error_rate = (len(wrong_answers) / len(all_answers) * 100) if all_answers else 0
-    
-    # 考试表现趋势
-    recent_records = sorted(exam_records, key=lambda x: x.submit_time)[-5:]  # 最近5次考试
-    trends = []
-    for record in recent_records:
-        rate = (record.total_score / record.max_score * 100) if record.max_score > 0 else 0
-        trends.append(f"{record.submit_time.strftime('%m-%d')}: {rate:.1f}%")
-    
-    prompt = f"""请分析学生ID为{student_id}的学习情况，并提供专业的学习建议。
-
-学生基本数据：
-- 总考试次数：{total_exams}次
-- 总体正确率：{success_rate:.1f}%
-- 错误率：{error_rate:.1f}%
-- 平均分：{total_score/total_exams if total_exams > 0 else 0:.1f}分
-
-最近考试表现趋势：
-{', '.join(trends)}
-
-请从以下几个方面进行分析：
-1. 学习表现总体评价
-2. 强项和弱项分析
-3. 学习趋势分析（是否有进步或退步）
-4. 具体学习建议和改进方向
-5. 老师关注重点
-
-请用专业、客观、建设性的语言进行分析，字数控制在500字以内。"""
-
-    return prompt
-
-def call_ai_for_analysis(prompt):
-    """调用AI生成分析报告"""
-    try:
-        client = OpenAI(
-            api_key=Config.DEEPSEEK_API_KEY,
-            base_url=Config.DEEPSEEK_BASE_URL
-        )
-        
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一位专业的教育分析师，擅长根据学生的学习数据进行深入分析并提供有价值的教学建议。请用专业、客观、建设性的语言进行分析。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=800,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        current_app.logger.error(f"AI分析调用失败: {str(e)}")
-        raise e
-
-def generate_mock_analysis(student_id, exam_records):
-    """生成模拟分析报告（演示模式）"""
-    total_exams = len(exam_records)
-    avg_score = sum(record.total_score for record in exam_records) / total_exams if total_exams > 0 else 0
-    
-    return f"""**学习表现分析报告**（演示模式）
-
-**总体评价：**
-学生{student_id}共参加了{total_exams}次考试，平均分为{avg_score:.1f}分。从整体表现来看，该学生学习态度较为积极，参与度较高。
-
-**强项分析：**
-- 考试参与度高，说明学习积极性较好
-- 持续性学习表现良好
-
-**改进建议：**
-1. 建议针对错误较多的题型进行专项练习
-2. 加强基础概念的理解和掌握
-3. 定期复习已学知识，形成知识体系
-4. 可以尝试做更多的综合性练习题
-
-**老师关注重点：**
-- 关注学生的学习方法是否得当
-- 及时反馈和鼓励，保持学习积极性
-- 个性化辅导，针对薄弱环节加强指导
-
-*注：当前为演示模式，配置DEEPSEEK_API_KEY后可获得更详细的AI分析报告。*"""
-
 @teacher_bp.route('/toolbox')
 def toolbox():
     """工具箱页面"""
@@ -858,35 +1120,37 @@ def upload_tool():
         original_filename = secure_filename(file.filename)
         file_extension = original_filename.rsplit('.', 1)[1].lower()
         
-        # 检查是否为URL链接文件（保持原始文件名）
-        if original_filename.lower().startswith(URL_LINK_PREFIX):
-            # URL链接文件：保持原始文件名
-            unique_filename = original_filename
-        else:
-            # 普通HTML文件：生成唯一文件名
-            unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        
-        # 保存文件
-        file.save(file_path)
-        
-        # 获取文件大小
-        file_size = os.path.getsize(file_path)
-        
-        # 保存到数据库
-        tool = Tool.add_tool(
-            name=name,
-            description=description,
-            file_path=file_path,
-            file_name=original_filename,
-            file_size=file_size,
-            creator='teacher'  # 可以从session获取实际的老师ID
-        )
+        # 流式保存文件，以内容哈希命名，相同内容只保存一份；没有登记成工具的文件在退出时删除
+        with store_upload(file, UPLOAD_FOLDER, file_extension,
+                          chunk_size=current_app.config['TOOL_UPLOAD_CHUNK_SIZE']) as (file_path, content_hash, file_size):
+            # URL链接文件：在上传时解析跳转地址
+            target_url = None
+            if Tool.is_url_link_file(original_filename):
+                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                    target_url = Tool.parse_target_url(f.read())
+                if not target_url:
+                    flash('URL链接文件中没有找到跳转地址！', 'error')
+                    return redirect(url_for('teacher.toolbox'))
+
+            # 保存到数据库
+            tool = Tool.add_tool(
+                name=name,
+                description=description,
+                file_path=file_path,
+                file_name=original_filename,
+                file_size=file_size,
+                creator='teacher',  # 可以从session获取实际的老师ID
+                target_url=target_url,
+                content_hash=content_hash
+            )
         
         flash(f'工具 "{name}" 上传成功！', 'success')
         return redirect(url_for('teacher.toolbox'))
         
+    except RequestEntityTooLarge:
+        max_mb = current_app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+        flash(f'文件过大，最大允许上传 {max_mb:.1f} MB！', 'error')
+        return redirect(url_for('teacher.toolbox'))
     except Exception as e:
         current_app.logger.error(f"文件上传失败: {str(e)}")
         flash(f'文件上传失败: {str(e)}', 'error')
@@ -904,43 +1168,15 @@ def preview_tool(tool_id):
     tool.increment_views()
     
     try:
-        # 特殊前缀文件：内容仅为URL，直接重定向
-        if tool.file_name.lower().startswith(URL_LINK_PREFIX):
-            with open(tool.file_path, 'r', encoding='utf-8') as f:
-                content_all = f.read()
-
-            # 先尝试从全文中提取第一个 http(s) URL（兼容由编辑器生成的 HTML 包裹）
-            url_match = re.search(r"https?://[^\s\"'<>]+", content_all, re.IGNORECASE)
-            if url_match:
-                return redirect(url_match.group(0))
-
-            # 回退：逐行扫描，取首个非空文本作为目标
-            first_non_empty_line = ''
-            for line in content_all.splitlines():
-                stripped = line.strip().lstrip('\ufeff')
-                if stripped:
-                    first_non_empty_line = stripped
-                    break
-            if not first_non_empty_line:
+        # URL链接工具：跳转地址已在上传时解析，直接重定向
+        if Tool.is_url_link_file(tool.file_name):
+            if not tool.target_url:
                 flash('跳转地址为空！', 'error')
                 return redirect(url_for('teacher.toolbox'))
+            return redirect(tool.target_url)
 
-            target_url = first_non_empty_line
-            # 去除包裹引号
-            if (target_url.startswith('"') and target_url.endswith('"')) or (target_url.startswith("'") and target_url.endswith("'")):
-                target_url = target_url[1:-1].strip()
-            # 以 www. 开头自动补协议
-            if target_url.lower().startswith('www.'):
-                target_url = 'http://' + target_url
-            # 缺少协议则补 http://
-            if not (target_url.lower().startswith('http://') or target_url.lower().startswith('https://')):
-                target_url = 'http://' + target_url
-            return redirect(target_url)
-
-        # 常规HTML：读取并直接返回内容
-        with open(tool.file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
+        # 常规HTML：读取并直接返回内容（经内存缓存，文件未修改时不读磁盘）
+        return tool_content_response(tool.file_path)
     
     except Exception as e:
         current_app.logger.error(f"预览工具失败: {str(e)}")
@@ -982,14 +1218,15 @@ def delete_tool(tool_id):
         return jsonify({'success': False, 'error': '工具不存在'})
     
     try:
-        # 删除文件
-        if os.path.exists(tool.file_path):
-            os.remove(tool.file_path)
+        file_path = tool.file_path
         
         # 删除数据库记录
         success = tool.delete_tool()
         
         if success:
+            # 文件不再被其他工具引用时才删除
+            if release_file(file_path):
+                get_tool_cache().invalidate(file_path)
             return jsonify({'success': True, 'message': '工具删除成功'})
         else:
             return jsonify({'success': False, 'error': '删除失败'})
@@ -998,6 +1235,18 @@ def delete_tool(tool_id):
         current_app.logger.error(f"删除工具失败: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@teacher_bp.route('/api/llm_metrics')
+def api_llm_metrics():
+    """大模型调用统计API（调用次数、错误、重试、耗时分位数、token用量、回答缓存命中率和限流情况）"""
+    gateway = get_llm_gateway()
+    return jsonify({
+        'success': True,
+        'breaker_state': gateway.breaker.state,
+        'metrics': gateway.metrics.snapshot(),
+        'answer_cache': get_answer_cache().stats(),
+        'rate_limit': get_rate_limiter().stats()
+    })
+
 @teacher_bp.route('/api/tools')
 def api_get_tools():
     """获取工具列表API"""
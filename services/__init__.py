@@ -0,0 +1 @@
+# 服务包初始化文件
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AI助手回答缓存
+
+以“规范化后的问题 + 系统提示 + 最近上下文指纹”为键缓存回答，带TTL和LRU淘汰。
+依赖上下文的追问（如“它是什么意思”）不走缓存。
+"""
+
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from flask import current_app
+
+# 去掉空白和标点后再比较问题
+NORMALIZE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+
+# 含有指代或承接前文的词语时认为问题依赖上下文
+CONTEXT_DEPENDENT_PATTERN = re.compile(r'(这个|那个|这些|那些|上面|上述|刚才|之前|前面|继续|接着|再说|换一种|换个|它|他们|她们|为什么呢)')
+
+def normalize_question(question):
+    """规范化问题文本：全半角统一、转小写、去掉空白和标点"""
+    text = unicodedata.normalize('NFKC', question).lower()
+    return NORMALIZE_PATTERN.sub('', text)
+
+def is_context_dependent(question, history):
+    """有对话历史且问题包含指代词时，回答依赖上下文，不应共享缓存"""
+    return bool(history) and bool(CONTEXT_DEPENDENT_PATTERN.search(question))
+
+def make_cache_key(question, system_prompt, context_messages):
+    """计算缓存键"""
+    digest = hashlib.sha256()
+    for part in [normalize_question(question), system_prompt] + [
+        f"{message['role']}:{message['content']}" for message in context_messages
+    ]:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+class AnswerCache:
+    """带TTL的LRU回答缓存"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def get(self, key):
+        """获取未过期的回答，不存在时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item and item[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, answer):
+        """写入回答"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_bypass(self):
+        """记录一次未使用缓存的请求"""
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self):
+        """命中率统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+def get_answer_cache():
+    """获取当前应用的回答缓存"""
+    return current_app.extensions['answer_cache']
+
+def begin_lookup(question, system_prompt, history, use_cache=True):
+    """查找缓存，返回 (缓存键, 已缓存的回答)
+
+    不使用缓存（已关闭、调用方跳过或问题依赖上下文）时缓存键为None。
+    history 为发送给大模型的历史消息，只取最近几条参与指纹计算。
+    """
+    cache = get_answer_cache()
+    if not current_app.config['AI_CACHE_ENABLED'] or not use_cache or is_context_dependent(question, history):
+        cache.record_bypass()
+        return None, None
+    key = cache_key_for(question, system_prompt, history)
+    return key, cache.get(key)
+
+def store_answer(key, answer):
+    """保存生成的回答（缓存键为None或回答为空时忽略）"""
+    if key and answer:
+        get_answer_cache().set(key, answer)
+
+def lookup_answer(question, system_prompt, history, compute, use_cache=True):
+    """统一的回答查找入口：命中缓存直接返回，否则调用 compute() 生成并写入缓存
+
+    返回 (回答, 是否命中缓存)。
+    """
+    key, answer = begin_lookup(question, system_prompt, history, use_cache)
+    if answer is not None:
+        return answer, True
+    answer = compute()
+    store_answer(key, answer)
+    return answer, False
+
+def cache_key_for(question, system_prompt, history):
+    """按配置截取最近的上下文消息计算缓存键"""
+    context_size = current_app.config['AI_CACHE_CONTEXT_MESSAGES']
+    context = [message for message in history if message['role'] != 'system']
+    context = context[-context_size:] if context_size > 0 else []
+    return make_cache_key(question, system_prompt, context)
+
+def init_answer_cache(app):
+    """根据配置创建回答缓存"""
+    app.extensions['answer_cache'] = AnswerCache(
+        max_entries=app.config['AI_CACHE_MAX_ENTRIES'],
+        ttl=app.config['AI_CACHE_TTL']
+    )
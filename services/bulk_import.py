@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+题目和线下答题卡的批量导入
+
+CSV 或 JSONL 文件逐行读取，经过生成器流水线校验后按块（IMPORT_CHUNK_SIZE 行）写入，
+每块一个事务，内存占用与文件大小无关。
+
+- 题目：content、answer 必填，analysis、tags 可选（CSV 中多个标签用逗号等分隔），
+  经近似重复检测后用 Quiz.add_quizzes 保存。
+- 答题卡：每行是一道题的作答，student_id、paper_id 必填，题目用 quiz_id 或 question_order 指定。
+  带 is_correct 或 score 的行按已判分导入，否则按试卷答案批量判分（与在线提交的判分规则相同）。
+  同一学生同一试卷的行组成一份答题卡，每块新写入的作答累加到导入生成的考试记录上（没有时新增），
+  在线考试生成的考试记录不受影响；答案为空的行视为未作答。
+  已存在的作答（同一学生、试卷、题目）跳过，中断后重新导入同一文件不会重复写入。
+  同一份答题卡的行应连续排列，分散在文件各处时每出现一段都要多查询和更新一次考试记录。
+
+有问题的行跳过并记录行号和原因，不影响其他行。
+"""
+
+import io
+import os
+import csv
+import json
+import uuid
+import shutil
+from datetime import datetime
+from itertools import islice
+import click
+from flask import current_app, Request
+from models import db
+from models.quiz import Quiz
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from models.paper_quiz import PaperQuiz
+from services.quiz_dedupe import filter_duplicates
+from services.jobs import get_job_runner
+
+IMPORT_KINDS = ('quizzes', 'answers')
+FORMAT_EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't', '是', '对', '正确', '√'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', '否', '错', '错误', '×'}
+
+class ImportFormatError(Exception):
+    """导入文件的格式或类型不支持"""
+
+class ImportRequest(Request):
+    """导入接口允许更大的请求体（IMPORT_MAX_CONTENT_LENGTH），其余请求仍受 MAX_CONTENT_LENGTH 限制"""
+
+    @property
+    def max_content_length(self):
+        if current_app and self.endpoint == 'teacher.submit_import':
+            return current_app.config['IMPORT_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
+def detect_format(filename, fmt=None):
+    """根据指定格式或文件扩展名确定格式（csv 或 jsonl）"""
+    if fmt:
+        fmt = fmt.lower()
+    elif filename and '.' in filename:
+        fmt = filename.rsplit('.', 1)[1].lower()
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ImportFormatError('只支持CSV和JSONL文件')
+    return FORMAT_EXTENSIONS[fmt]
+
+def read_records(stream, fmt):
+    """逐行读取二进制流，生成 (行号, 字段字典, 错误信息)"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, {key.strip(): value for key, value in row.items() if key}, None
+            return
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'JSON格式错误: {e}'
+                continue
+            if isinstance(record, dict):
+                yield line_number, record, None
+            else:
+                yield line_number, None, '每行必须是一个JSON对象'
+    finally:
+        # 不随包装对象一起关闭调用方的流
+        text.detach()
+
+def text_field(record, name):
+    """取文本字段，去掉首尾空白，缺失时为空字符串"""
+    value = record.get(name)
+    return '' if value is None else str(value).strip()
+
+def validate_quiz_records(records):
+    """校验题目行，生成 (行号, 题目字典, 错误信息)"""
+    for line_number, record, error in records:
+        if error:
+            yield line_number, None, error
+            continue
+        content = text_field(record, 'content')
+        answer = text_field(record, 'answer')
+        if not content or not answer:
+            yield line_number, None, '题目内容content和答案answer不能为空'
+            continue
+        yield line_number, {
+            'content': content,
+            'answer': answer,
+            'analysis': text_field(record, 'analysis') or None,
+            'tags': record.get('tags')
+        }, None
+
+def parse_optional_bool(value):
+    """解析是否正确：缺失时为None，无法识别时抛出 ValueError"""
+    if value is None or isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+def parse_optional_datetime(value):
+    """解析ISO格式的时间，缺失时为None"""
+    if value in (None, ''):
+        return None
+    return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00')).replace(tzinfo=None)
+
+def validate_answer_records(records):
+    """校验答题行并规范字段类型，生成 (行号, 答题字典, 错误信息)"""
+    for line_number, record, error in records:
+        if error:
+            yield line_number, None, error
+            continue
+        student_id = text_field(record, 'student_id')
+        if not student_id or len(student_id) > 50:
+            yield line_number, None, '学生ID student_id不能为空且不超过50个字符'
+            continue
+        try:
+            paper_id = int(record.get('paper_id'))
+            quiz_id = int(record['quiz_id']) if text_field(record, 'quiz_id') else None
+            question_order = int(record['question_order']) if text_field(record, 'question_order') else None
+            is_correct = parse_optional_bool(record.get('is_correct'))
+            score = float(record['score']) if text_field(record, 'score') else None
+            submitted_at = parse_optional_datetime(record.get('submitted_at'))
+        except (TypeError, ValueError):
+            yield line_number, None, 'paper_id、quiz_id、question_order、score、is_correct或submitted_at格式不正确'
+            continue
+        if quiz_id is None and question_order is None:
+            yield line_number, None, '需要quiz_id或question_order指定题目'
+            continue
+        yield line_number, {
+            'student_id': student_id,
+            'paper_id': paper_id,
+            'quiz_id': quiz_id,
+            'question_order': question_order,
+            'student_answer': text_field(record, 'student_answer'),
+            'is_correct': is_correct,
+            'score': score,
+            'submitted_at': submitted_at
+        }, None
+
+def chunked(iterable, size):
+    """把生成器按固定大小分块"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class ImportSummary:
+    """导入结果统计，错误明细最多保留 max_errors 条"""
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.counts = {'rows': 0, 'imported': 0, 'skipped': 0}
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line_number, error):
+        self.error_count += 1
+        self.counts['skipped'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'error': error})
+
+    def to_dict(self):
+        return dict(self.counts, error_count=self.error_count, errors=self.errors)
+
+def import_quizzes(stream, fmt, chunk_size, max_errors=100, progress=None):
+    """流式导入题目，返回统计结果；progress(summary) 在每块写入后调用"""
+    summary = ImportSummary(max_errors)
+    summary.counts['duplicates'] = 0
+    for chunk in chunked(validate_quiz_records(read_records(stream, fmt)), chunk_size):
+        items = []
+        for line_number, item, error in chunk:
+            summary.counts['rows'] += 1
+            if error:
+                summary.add_error(line_number, error)
+            else:
+                items.append(item)
+        accepted, duplicates = filter_duplicates(items)
+        summary.counts['duplicates'] += len(duplicates)
+        summary.counts['skipped'] += len(items) - len(accepted)
+        if accepted:
+            Quiz.add_quizzes(accepted)
+            summary.counts['imported'] += len(accepted)
+        if progress:
+            progress(summary)
+    return summary.to_dict()
+
+class AnswerKeys:
+    """各试卷的答案和分值，每份试卷只查询一次"""
+
+    def __init__(self):
+        self._papers = {}
+
+    def get(self, paper_id):
+        """返回 {'by_quiz': {题目ID: (正确答案, 分值)}, 'by_order': {顺序: 题目ID}, 'total_questions', 'max_score'}，
+        试卷没有题目时返回None"""
+        if paper_id not in self._papers:
+            rows = db.session.query(PaperQuiz.quiz_id, PaperQuiz.question_order, PaperQuiz.score, Quiz.answer).join(
+                Quiz, Quiz.id == PaperQuiz.quiz_id
+            ).filter(PaperQuiz.paper_id == paper_id).all()
+            self._papers[paper_id] = {
+                'by_quiz': {quiz_id: (answer, score or 0.0) for quiz_id, _, score, answer in rows},
+                'by_order': {order: quiz_id for quiz_id, order, _, _ in rows},
+                'total_questions': len(rows),
+                'max_score': sum(score or 0.0 for _, _, score, _ in rows)
+            } if rows else None
+        return self._papers[paper_id]
+
+class AnswerSheet:
+    """一份答题卡（同一学生同一试卷）在当前块中新写入的作答"""
+
+    def __init__(self, student_id, paper_id, key, submit_time, existing_quiz_ids):
+        self.student_id = student_id
+        self.paper_id = paper_id
+        self.key = key
+        self.submit_time = submit_time
+        # 之前已导入或在线提交过的题目，本次跳过
+        self.existing_quiz_ids = existing_quiz_ids
+        self.quiz_ids = set()
+        self.answered = 0
+        self.correct = 0
+        self.score = 0.0
+
+    @property
+    def pair(self):
+        return self.student_id, self.paper_id
+
+    def add(self, quiz_id, is_correct, score):
+        self.quiz_ids.add(quiz_id)
+        self.answered += 1
+        self.correct += 1 if is_correct else 0
+        self.score += score
+
+def load_existing_quiz_ids(pairs):
+    """一次查询出各 (学生, 试卷) 已有答题记录的题目，返回 {(学生, 试卷): 题目ID集合}
+
+    学生和试卷分别用IN筛选（可以使用 (student_id, paper_id) 索引），多查出的组合在Python中忽略。
+    """
+    existing = {pair: set() for pair in pairs}
+    if not pairs:
+        return existing
+    rows = db.session.execute(
+        db.select(Answer.student_id, Answer.paper_id, Answer.quiz_id).where(
+            Answer.student_id.in_({student_id for student_id, _ in pairs}),
+            Answer.paper_id.in_({paper_id for _, paper_id in pairs})
+        )
+    )
+    for student_id, paper_id, quiz_id in rows:
+        if (student_id, paper_id) in existing:
+            existing[(student_id, paper_id)].add(quiz_id)
+    return existing
+
+def save_exam_records(sheets):
+    """把答题卡本块新写入的作答累加到导入生成的考试记录上，没有时新增；返回 (新增数, 更新数)
+
+    与答题记录在同一事务中写入，导入生成的考试记录始终等于已提交的导入作答的汇总，中断后重新导入仍然准确。
+    在线考试生成的考试记录不会被修改；没有新写入作答的答题卡跳过。
+    """
+    sheets = [sheet for sheet in sheets if sheet.answered]
+    if not sheets:
+        return 0, 0
+    records = {}
+    for record in ExamRecord.query.filter(
+        ExamRecord.student_id.in_({sheet.student_id for sheet in sheets}),
+        ExamRecord.paper_id.in_({sheet.paper_id for sheet in sheets}),
+        ExamRecord.source == ExamRecord.SOURCE_IMPORT
+    ).order_by(ExamRecord.id.desc()):
+        records[(record.student_id, record.paper_id)] = record
+    inserts = []
+    for sheet in sheets:
+        record = records.get(sheet.pair)
+        if record is None:
+            inserts.append({
+                'student_id': sheet.student_id,
+                'paper_id': sheet.paper_id,
+                'start_time': sheet.submit_time,
+                'submit_time': sheet.submit_time,
+                'total_questions': sheet.key['total_questions'],
+                'answered_questions': sheet.answered,
+                'correct_answers': sheet.correct,
+                'total_score': sheet.score,
+                'max_score': sheet.key['max_score'],
+                'accuracy_rate': sheet.correct / sheet.answered * 100,
+                'status': 'completed',
+                'source': ExamRecord.SOURCE_IMPORT
+            })
+            continue
+        record.answered_questions += sheet.answered
+        record.correct_answers += sheet.correct
+        record.total_score += sheet.score
+        record.total_questions = sheet.key['total_questions']
+        record.max_score = sheet.key['max_score']
+        record.accuracy_rate = record.correct_answers / record.answered_questions * 100
+    if inserts:
+        db.session.execute(db.insert(ExamRecord), inserts)
+    return len(inserts), len(sheets) - len(inserts)
+
+def grade_answer(item, key):
+    """按试卷答案判分（已判分的行沿用给定结果），返回 (题目ID, 是否正确, 得分) 或错误信息"""
+    quiz_id = item['quiz_id']
+    if quiz_id is None:
+        quiz_id = key['by_order'].get(item['question_order'])
+    if quiz_id not in key['by_quiz']:
+        return None, '题目不在该试卷中'
+    correct_answer, full_score = key['by_quiz'][quiz_id]
+    if item['is_correct'] is None and item['score'] is None:
+        is_correct = Answer.is_correct_answer(item['student_answer'], correct_answer)
+        return (quiz_id, is_correct, full_score if is_correct else 0.0), None
+    is_correct = item['is_correct'] if item['is_correct'] is not None else item['score'] > 0
+    score = item['score'] if item['score'] is not None else (full_score if is_correct else 0.0)
+    return (quiz_id, is_correct, score), None
+
+def import_answer_sheets(stream, fmt, chunk_size, max_errors=100, progress=None):
+    """流式导入答题卡并批量判分，每块的答题记录和对应考试记录的累加在一个事务中写入
+
+    已存在的作答跳过并计入 existing，重复导入同一文件不会产生重复的答题记录和考试记录。
+    """
+    summary = ImportSummary(max_errors)
+    summary.counts.update(exam_records=0, exam_records_updated=0, existing=0)
+    keys = AnswerKeys()
+    now = datetime.utcnow()
+
+    def write(answer_rows, sheets):
+        try:
+            if answer_rows:
+                db.session.execute(db.insert(Answer), answer_rows)
+            created, updated = save_exam_records(sheets) if sheets else (0, 0)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        summary.counts['imported'] += len(answer_rows)
+        summary.counts['exam_records'] += created
+        summary.counts['exam_records_updated'] += updated
+
+    for chunk in chunked(validate_answer_records(read_records(stream, fmt)), chunk_size):
+        answer_rows = []
+        # 本块中出现过的答题卡：同一答题卡在块内再次出现时继续使用，避免漏掉尚未提交的题目；
+        # 之前的块写入的作答已经提交，会出现在已有题目中
+        sheets = {}
+        existing = load_existing_quiz_ids({(item['student_id'], item['paper_id']) for _, item, _ in chunk if item})
+        for line_number, item, error in chunk:
+            summary.counts['rows'] += 1
+            if error:
+                summary.add_error(line_number, error)
+                continue
+            pair = (item['student_id'], item['paper_id'])
+            sheet = sheets.get(pair)
+            if sheet is None:
+                key = keys.get(item['paper_id'])
+                if key is None:
+                    summary.add_error(line_number, f'试卷{item["paper_id"]}不存在或没有题目')
+                    continue
+                sheet = sheets[pair] = AnswerSheet(item['student_id'], item['paper_id'], key,
+                                                   item['submitted_at'] or now, existing[pair])
+            if not item['student_answer']:
+                summary.counts['skipped'] += 1
+                continue
+            graded, error = grade_answer(item, sheet.key)
+            if error:
+                summary.add_error(line_number, error)
+                continue
+            quiz_id, is_correct, score = graded
+            if quiz_id in sheet.existing_quiz_ids:
+                summary.counts['skipped'] += 1
+                summary.counts['existing'] += 1
+                continue
+            if quiz_id in sheet.quiz_ids:
+                summary.add_error(line_number, '同一份答题卡中题目重复')
+                continue
+            sheet.add(quiz_id, is_correct, score)
+            answer_rows.append({
+                'student_id': sheet.student_id,
+                'paper_id': sheet.paper_id,
+                'quiz_id': quiz_id,
+                'student_answer': item['student_answer'],
+                'is_correct': is_correct,
+                'score': score,
+                'answered_at': sheet.submit_time
+            })
+        write(answer_rows, list(sheets.values()))
+        if progress:
+            progress(summary)
+    return summary.to_dict()
+
+def run_import(kind, stream, fmt, progress=None):
+    """按类型导入，分块大小和错误明细条数取自配置"""
+    importer = import_quizzes if kind == 'quizzes' else import_answer_sheets
+    return importer(stream, fmt, current_app.config['IMPORT_CHUNK_SIZE'],
+                    current_app.config['IMPORT_MAX_ERRORS'], progress)
+
+def run_import_job(job, kind, path, fmt):
+    """导入上传文件的后台任务，进度按已读取的字节数计算，结束后删除上传文件"""
+    try:
+        with open(path, 'rb') as f:
+            def progress(summary):
+                job.update(completed=f.tell(), message=f"已读取 {summary.counts['rows']} 行，"
+                                                        f"导入 {summary.counts['imported']} 行", result=summary.to_dict())
+            result = run_import(kind, f, fmt, progress)
+        job.update(completed=job.total, message='导入完成', result=result)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def submit_import(kind, file_storage, fmt=None, created_by=None):
+    """保存上传的文件并提交后台导入任务，返回任务
+
+    类型或格式不支持时抛出 ImportFormatError，后台任务过多时抛出 JobQueueFullError。
+    """
+    if kind not in IMPORT_KINDS:
+        raise ImportFormatError('导入类型必须是quizzes或answers')
+    fmt = detect_format(file_storage.filename, fmt)
+    folder = current_app.config['IMPORT_UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{uuid.uuid4().hex}.{fmt}')
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(file_storage.stream, out, current_app.config['TOOL_UPLOAD_CHUNK_SIZE'])
+    try:
+        return get_job_runner().submit(
+            f'import_{kind}', run_import_job, kind, path, fmt,
+            total=os.path.getsize(path), created_by=created_by
+        )
+    except Exception:
+        os.remove(path)
+        raise
+
+def register_import_command(app, kind, name, help_text):
+    @app.cli.command(name, help=help_text)
+    @click.argument('file', type=click.File('rb'))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='文件格式，默认按扩展名判断')
+    def command(file, fmt):
+        fmt = detect_format(getattr(file, 'name', ''), fmt)
+
+        def progress(summary):
+            click.echo(f"已读取 {summary.counts['rows']} 行，导入 {summary.counts['imported']} 行", err=True)
+
+        result = run_import(kind, file, fmt, progress)
+        for error in result.pop('errors'):
+            click.echo(f"第 {error['line']} 行: {error['error']}", err=True)
+        click.echo(json.dumps(result, ensure_ascii=False))
+
+def init_bulk_import(app):
+    """注册导入命令（flask import-quizzes / flask import-answers），导入接口使用更大的请求体上限"""
+    app.request_class = ImportRequest
+    register_import_command(app, 'quizzes', 'import-quizzes', '从CSV/JSONL文件导入题目')
+    register_import_command(app, 'answers', 'import-answers',
+                            '从CSV/JSONL文件导入线下答题卡并判分。同一学生同一试卷的行应连续排列（分散时每段都要多更新一次考试记录）；'
+                            '已存在的作答会跳过，中断后可重新导入同一文件')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按token预算组装对话历史
+
+从最新的消息开始往前取，直到用完预算；放不下的早期消息会被压缩进对话摘要
+（每轮只保留学生问题的开头），摘要本身也有token上限。这样无论对话多长，
+发送给大模型的提示长度都有上界。
+"""
+
+import re
+from models import db
+
+# 中日韩字符大约1个token一个字，其余文本大约4个字符一个token
+CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+# 每条消息的固定开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 摘要中每个问题保留的字符数
+SUMMARY_QUESTION_CHARS = 40
+
+def estimate_tokens(text):
+    """粗略估算文本的token数"""
+    if not text:
+        return 0
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+def trim_summary(summary, max_tokens):
+    """摘要超过上限时从最早的内容开始丢弃"""
+    lines = summary.splitlines()
+    while lines and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+def assemble_history(conversation, token_budget, summary_max_tokens, max_messages):
+    """组装发送给大模型的历史消息列表（不含系统提示和本轮问题）
+
+    超出预算的消息会并入 conversation.summary，并推进 summarized_until_id，
+    之后不再从数据库加载这些消息。
+    """
+    # 上一轮组装后未折叠的消息不超过 max_messages 条，加上上一轮新增的一问一答
+    recent = conversation.get_recent_messages(max_messages + 2)
+    kept = []
+    used = 0
+    overflow = []
+    for message in recent:
+        cost = (message.token_count or estimate_tokens(message.content)) + MESSAGE_OVERHEAD_TOKENS
+        if overflow or used + cost > token_budget or len(kept) >= max_messages:
+            overflow.append(message)
+            continue
+        kept.append(message)
+        used += cost
+
+    # 保证历史以用户消息开头，避免出现孤立的助手回复
+    while kept and kept[-1].role != 'user':
+        overflow.insert(0, kept.pop())
+
+    if overflow:
+        folded = sorted(overflow, key=lambda m: m.id)
+        questions = [
+            f"- 学生问：{m.content[:SUMMARY_QUESTION_CHARS]}" for m in folded if m.role == 'user'
+        ]
+        summary = '\n'.join(filter(None, [conversation.summary] + questions))
+        conversation.summary = trim_summary(summary, summary_max_tokens)
+        conversation.summarized_until_id = folded[-1].id
+        db.session.commit()
+
+    history = []
+    if conversation.summary:
+        history.append({"role": "system", "content": f"此前对话摘要：\n{conversation.summary}"})
+    for message in reversed(kept):
+        history.append({"role": message.role, "content": message.content})
+    return history
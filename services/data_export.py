@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+答题记录和考试记录的流式导出
+
+按试卷、学生或时间范围筛选，查询用 yield_per 分批从数据库游标读取（不经过ORM对象），
+每读一批就编码为CSV或JSONL发送给客户端或写入文件，内存占用与导出的行数无关，
+响应头和CSV表头在查询开始前就发出。
+"""
+
+import io
+import csv
+import json
+import click
+from urllib.parse import quote
+from datetime import datetime, date, timedelta
+from flask import Response, stream_with_context, current_app
+from werkzeug.utils import secure_filename
+from models import db
+from models.answer import Answer
+from models.exam_record import ExamRecord
+
+# 可导出的数据：类型 -> (模型, 时间筛选字段, 导出的列)
+EXPORT_KINDS = {
+    'answers': (Answer, 'answered_at', [
+        'id', 'student_id', 'paper_id', 'quiz_id', 'student_answer', 'is_correct', 'score', 'answered_at'
+    ]),
+    'exam_records': (ExamRecord, 'submit_time', [
+        'id', 'student_id', 'paper_id', 'start_time', 'submit_time', 'total_questions', 'answered_questions',
+        'correct_answers', 'total_score', 'max_score', 'accuracy_rate', 'status'
+    ]),
+}
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+class ExportError(Exception):
+    """导出参数不合法"""
+
+def parse_time(value, end=False):
+    """解析 YYYY-MM-DD 或ISO时间；只有日期的结束时间包含当天"""
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ExportError(f'时间格式不正确: {value}')
+
+def parse_filters(args):
+    """从请求参数或命令行选项中取出筛选条件：paper_id、student_id、start、end"""
+    filters = {}
+    if args.get('paper_id') not in (None, ''):
+        try:
+            filters['paper_id'] = int(args['paper_id'])
+        except (TypeError, ValueError):
+            raise ExportError('试卷ID必须是整数')
+    if args.get('student_id'):
+        filters['student_id'] = str(args['student_id']).strip()
+    if args.get('start'):
+        filters['start'] = parse_time(str(args['start']).strip())
+    if args.get('end'):
+        filters['end'] = parse_time(str(args['end']).strip(), end=True)
+    return filters
+
+def export_query(kind, filters):
+    """构造导出查询，按ID顺序输出"""
+    model, time_column, columns = EXPORT_KINDS[kind]
+    query = db.select(*(getattr(model, column) for column in columns)).order_by(model.id)
+    if 'paper_id' in filters:
+        query = query.where(model.paper_id == filters['paper_id'])
+    if 'student_id' in filters:
+        query = query.where(model.student_id == filters['student_id'])
+    if 'start' in filters:
+        query = query.where(getattr(model, time_column) >= filters['start'])
+    if 'end' in filters:
+        query = query.where(getattr(model, time_column) < filters['end'])
+    return query
+
+def iter_rows(kind, filters, batch_size):
+    """用服务端游标分批读取，逐行产出元组"""
+    result = db.session.execute(export_query(kind, filters).execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def export_chunks(kind, fmt, filters, batch_size):
+    """按批产出编码好的文本块（CSV带BOM和表头，便于Excel直接打开）"""
+    columns = EXPORT_KINDS[kind][2]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        buffer.write('\ufeff')
+        writer.writerow(columns)
+        yield buffer.getvalue()
+    rows = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in iter_rows(kind, filters, batch_size):
+        if fmt == 'csv':
+            writer.writerow([csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, map(json_value, row))), ensure_ascii=False))
+            buffer.write('\n')
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_filename(kind, fmt, filters):
+    """下载文件名，包含筛选条件"""
+    parts = [kind]
+    if 'paper_id' in filters:
+        parts.append(f"paper{filters['paper_id']}")
+    if 'student_id' in filters:
+        parts.append(filters['student_id'])
+    parts.append(datetime.now().strftime('%Y%m%d%H%M%S'))
+    return '-'.join(parts) + f'.{fmt}'
+
+def content_disposition(filename):
+    """附件下载头：学生ID可能含中文或引号，filename 为ASCII安全名称，filename* 按RFC 5987携带原名"""
+    fallback = secure_filename(filename) or 'export'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def export_response(kind, fmt, filters):
+    """流式下载响应（分块传输，不设置Content-Length）"""
+    chunks = export_chunks(kind, fmt, filters, current_app.config['EXPORT_BATCH_SIZE'])
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = content_disposition(export_filename(kind, fmt, filters))
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def register_export_command(app, kind, name, help_text):
+    @app.cli.command(name, help=help_text)
+    @click.option('--paper-id', type=int, help='只导出该试卷')
+    @click.option('--student-id', help='只导出该学生')
+    @click.option('--start', help='开始时间（YYYY-MM-DD或ISO时间）')
+    @click.option('--end', help='结束时间（只写日期时包含当天）')
+    @click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', help='导出格式')
+    @click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='输出文件，默认标准输出')
+    def command(paper_id, student_id, start, end, fmt, output):
+        try:
+            filters = parse_filters({'paper_id': paper_id, 'student_id': student_id, 'start': start, 'end': end})
+        except ExportError as e:
+            raise click.BadParameter(str(e))
+        for chunk in export_chunks(kind, fmt, filters, app.config['EXPORT_BATCH_SIZE']):
+            output.write(chunk)
+
+def init_data_export(app):
+    """注册导出命令（flask export-answers / flask export-exam-records）"""
+    register_export_command(app, 'answers', 'export-answers', '导出答题记录')
+    register_export_command(app, 'exam_records', 'export-exam-records', '导出考试记录')
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+HTTP条件缓存与响应压缩
+"""
+
+import gzip
+import hashlib
+from flask import request, make_response, current_app
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时只使用gzip
+    brotli = None
+
+# 可压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/javascript', 'text/csv',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml'
+}
+
+# 压缩后ETag的后缀，保证不同编码的实体拥有不同的强ETag
+ENCODING_ETAG_SUFFIX = {'br': '-br', 'gzip': '-gz'}
+
+def build_etag(*parts):
+    """根据版本信息和数据变更信息计算强ETag"""
+    raw = '|'.join(str(part) for part in (current_app.config.get('APP_VERSION'),) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def etag_matches(etag):
+    """判断请求的If-None-Match是否命中该ETag（包括压缩后的变体）"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    candidates = [etag] + [etag + suffix for suffix in ENCODING_ETAG_SUFFIX.values()]
+    return any(if_none_match.contains(candidate) for candidate in candidates)
+
+def paper_validators(tag, papers):
+    """计算试卷相关页面的 (ETag, Last-Modified)
+
+    试卷的 updated_at 在修改名称/状态和增删、调整题目时都会更新，但题目内容的修改
+    不会更新它，因此再结合试卷题目的变更指纹（含题目最后更新时间）一起计算。
+    """
+    from models.paper_quiz import PaperQuiz
+    fingerprint = PaperQuiz.get_papers_fingerprint([paper.id for paper in papers])
+    stamps = [paper.updated_at for paper in papers if paper.updated_at] + [fingerprint[-1]]
+    last_modified = max((stamp for stamp in stamps if stamp), default=None)
+    etag = build_etag(tag, *[(paper.id, paper.status, paper.updated_at) for paper in papers], *fingerprint)
+    return etag, last_modified
+
+def conditional_response(etag, last_modified, render):
+    """条件响应：缓存仍有效时直接返回304，否则调用render生成页面
+
+    render 只有在需要返回完整页面时才会被调用，因此命中缓存时可以省去查询和模板渲染。
+    """
+    # 只依据ETag判断：题目被移除时最后修改时间可能不变，If-Modified-Since 无法感知
+    if etag_matches(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+        if last_modified:
+            response.last_modified = last_modified
+    response.set_etag(etag)
+    # 页面需要登录访问，只允许浏览器私有缓存，且每次使用前都要重新验证
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def choose_encoding():
+    """根据Accept-Encoding选择压缩算法"""
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    """对较大的文本响应进行gzip/brotli压缩"""
+    if (request.method == 'HEAD'
+            or response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config['HTTP_COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = choose_encoding()
+    if not encoding:
+        return response
+
+    level = current_app.config['HTTP_COMPRESS_LEVEL']
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=min(level, 11))
+    else:
+        compressed = gzip.compress(data, compresslevel=level)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, is_weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ENCODING_ETAG_SUFFIX[encoding], weak=is_weak)
+    return response
+
+def init_http_cache(app):
+    """注册压缩中间件（静态资源的缓存时间由 SEND_FILE_MAX_AGE_DEFAULT 控制）"""
+    app.after_request(compress_response)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台任务执行
+
+耗时操作（如智能出题）提交为后台任务，由固定大小的线程池执行，请求线程立即返回任务ID。
+任务状态和进度保存在 background_jobs 表中，页面通过状态接口轮询。
+排队任务数有上限，超过时拒绝提交，避免积压的任务占满资源。
+
+多进程部署时各进程共用任务表：任务记录执行进程（主机名:进程号），执行进程定期续租，
+进程启动和续租时只把执行进程已退出（同一主机上进程不存在）或租约过期的任务标记为失败。
+"""
+
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models import db
+from models.background_job import BackgroundJob
+
+class JobQueueFullError(Exception):
+    """等待执行的任务过多"""
+
+class JobRunner:
+    """有界线程池任务执行器"""
+
+    def __init__(self, app, max_workers, max_queued, heartbeat_interval=15, lease_seconds=60):
+        self.app = app
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        self._active = 0
+        self._lock = threading.Lock()
+        self._heartbeat_pid = None
+
+    @property
+    def owner(self):
+        """当前进程的标识（预加载应用后fork出的工作进程各不相同）"""
+        return process_owner()
+
+    def submit(self, kind, func, *args, total=0, created_by=None):
+        """提交任务，返回 BackgroundJob
+
+        func(job, *args) 在应用上下文中执行，可通过 job.update() 汇报进度，
+        抛出异常时任务标记为失败，正常返回后标记为完成。
+        """
+        with self._lock:
+            if self._active >= self.max_workers + self.max_queued:
+                raise JobQueueFullError('后台任务较多，请稍后再试')
+            self._active += 1
+        try:
+            job = BackgroundJob.add_job(kind, total=total, created_by=created_by, owner=self.owner)
+            self._ensure_heartbeat()
+            self._executor.submit(self._run, job.id, func, args)
+            return job
+        except Exception:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+
+    def _run(self, job_id, func, args):
+        try:
+            with self.app.app_context():
+                job = BackgroundJob.get_job(job_id)
+                job.update(status=BackgroundJob.STATUS_RUNNING)
+                try:
+                    func(job, *args)
+                    job.update(status=BackgroundJob.STATUS_DONE)
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception(f"后台任务 {job_id} ({job.kind}) 失败")
+                    job.update(status=BackgroundJob.STATUS_FAILED, error=str(e))
+        finally:
+            self._release()
+
+    def _ensure_heartbeat(self):
+        """第一次提交任务时在当前进程中启动续租线程"""
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='background-job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        """为本进程的任务续租，同时把其他已退出进程遗留的任务标记为失败"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                with self.app.app_context():
+                    if self.stats()['active']:
+                        BackgroundJob.renew_leases(self.owner)
+                    interrupted = BackgroundJob.fail_interrupted_jobs(self.lease_seconds, owner_alive)
+                    if interrupted:
+                        self.app.logger.warning(f"{interrupted} 个后台任务的执行进程已退出，已标记为失败")
+            except Exception:
+                self.app.logger.exception("后台任务续租失败")
+
+    def stats(self):
+        """执行中和排队中的任务数"""
+        with self._lock:
+            return {'active': self._active, 'max_workers': self.max_workers, 'max_queued': self.max_queued}
+
+def process_owner():
+    """任务执行进程的标识：主机名:进程号"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def owner_alive(owner):
+    """任务的执行进程是否可能仍在运行
+
+    同一主机上的进程可以直接检查是否存在；其他主机上的进程无法判断，只按租约是否过期处理。
+    """
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def get_job_runner():
+    """获取当前应用的后台任务执行器"""
+    return current_app.extensions['job_runner']
+
+def init_job_runner(app):
+    """根据配置创建任务执行器，并把已退出进程遗留的未完成任务标记为失败"""
+    runner = JobRunner(
+        app,
+        max_workers=app.config['JOB_MAX_WORKERS'],
+        max_queued=app.config['JOB_MAX_QUEUED'],
+        heartbeat_interval=app.config['JOB_HEARTBEAT_SECONDS'],
+        lease_seconds=app.config['JOB_LEASE_SECONDS']
+    )
+    app.extensions['job_runner'] = runner
+    with app.app_context():
+        # 本进程还没有提交任何任务，记录为当前进程号的任务属于之前复用了同一进程号的进程（如容器重启）
+        current = runner.owner
+        interrupted = BackgroundJob.fail_interrupted_jobs(
+            app.config['JOB_LEASE_SECONDS'], lambda owner: owner != current and owner_alive(owner)
+        )
+        if interrupted:
+            app.logger.warning(f"{interrupted} 个后台任务因服务重启被中断")
+    return runner
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+大模型调用网关
+
+每个进程共享一个长连接复用的OpenAI兼容客户端，统一处理超时、带抖动的有限重试、
+熔断以及每次调用的耗时和token统计。所有调用DeepSeek的地方都应通过 get_llm_gateway()。
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+import httpx
+import openai
+from openai import OpenAI
+from config import Config
+
+# 可以重试的错误：网络问题、超时、限流和服务端错误
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+class LLMUnavailableError(Exception):
+    """熔断器打开，暂时不再调用大模型"""
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断，冷却期过后只放行一个试探请求，试探有结果之前其他调用仍然拒绝"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probe = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def acquire(self):
+        """调用前检查，返回 (是否放行, 试探编号)；只有半开状态下被选为试探请求时试探编号不为None"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True, None
+            if state == 'open' or self._probe is not None:
+                return False, None
+            self._probes += 1
+            self._probe = self._probes
+            return True, self._probe
+
+    def allow(self):
+        """是否允许发起调用（半开状态下会占用试探名额）"""
+        return self.acquire()[0]
+
+    def release_probe(self, probe):
+        """试探请求没有得出结果（被取消或遇到不可重试的错误）时归还试探名额"""
+        with self._lock:
+            if probe is not None and self._probe == probe:
+                self._probe = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                # 半开状态下试探失败会重新计时
+                self.opened_at = time.monotonic()
+                self._probe = None
+
+class LLMMetrics:
+    """按调用名称统计次数、耗时和token用量"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, success, prompt_tokens=0, completion_tokens=0, retries=0,
+               ttft=None, cancelled=False):
+        with self._lock:
+            stat = self._stats.setdefault(name, {
+                'calls': 0,
+                'errors': 0,
+                'cancelled': 0,
+                'retries': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'latencies': deque(maxlen=self.window),
+                'ttfts': deque(maxlen=self.window)
+            })
+            stat['calls'] += 1
+            stat['retries'] += retries
+            if cancelled:
+                stat['cancelled'] += 1
+            elif not success:
+                stat['errors'] += 1
+            stat['prompt_tokens'] += prompt_tokens or 0
+            stat['completion_tokens'] += completion_tokens or 0
+            stat['latencies'].append(latency)
+            if ttft is not None:
+                stat['ttfts'].append(ttft)
+
+    def snapshot(self):
+        """返回可序列化的统计结果（耗时为最近 window 次调用的分位数，单位毫秒）"""
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                result[name] = {
+                    key: value for key, value in stat.items() if key not in ('latencies', 'ttfts')
+                }
+                result[name]['latency_ms'] = summarize_ms(stat['latencies'])
+                # 流式调用的首token耗时
+                if stat['ttfts']:
+                    result[name]['ttft_ms'] = summarize_ms(stat['ttfts'])
+            return result
+
+def summarize_ms(values):
+    """耗时数据的分位数摘要（毫秒）"""
+    values = sorted(values)
+    return {
+        'p50': round(percentile(values, 50) * 1000, 1),
+        'p95': round(percentile(values, 95) * 1000, 1),
+        'max': round((values[-1] if values else 0) * 1000, 1)
+    }
+
+def percentile(sorted_values, pct):
+    """计算已排序数据的分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class LLMGateway:
+    """OpenAI兼容接口的调用网关"""
+
+    def __init__(self, api_key, base_url, model='deepseek-chat', timeout=60.0, connect_timeout=5.0,
+                 max_retries=2, retry_base_delay=0.5, pool_size=20,
+                 breaker_threshold=5, breaker_cooldown=30.0):
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        # 重试由网关自己负责，关闭SDK内置重试以免次数叠加
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.metrics = LLMMetrics()
+
+    def _backoff(self, attempt):
+        """指数退避 + 全抖动"""
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+
+    def _create_with_retry(self, name, started, messages, **kwargs):
+        """发起调用，遇到可重试错误时退避重试，返回 (响应, 重试次数, 试探编号)
+
+        只在熔断器关闭时重试；半开状态下的试探请求失败后熔断器重新打开，不再重试。
+        """
+        allowed, probe = self.breaker.acquire()
+        if not allowed:
+            raise LLMUnavailableError('AI服务连续调用失败，已暂停调用，请稍后重试')
+
+        kwargs.setdefault('model', self.model)
+        attempt = 0
+        while True:
+            try:
+                return self.client.chat.completions.create(messages=messages, **kwargs), attempt, probe
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or self.breaker.state != 'closed':
+                    self.metrics.record(name, time.monotonic() - started, False, retries=attempt)
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+            except Exception:
+                self.breaker.release_probe(probe)
+                self.metrics.record(name, time.monotonic() - started, False, retries=attempt)
+                raise
+
+    def create_completion(self, messages, name='default', **kwargs):
+        """调用 chat.completions.create，返回完整响应对象"""
+        started = time.monotonic()
+        response, attempt, _ = self._create_with_retry(name, started, messages, **kwargs)
+        self.breaker.record_success()
+        usage = getattr(response, 'usage', None)
+        self.metrics.record(
+            name, time.monotonic() - started, True,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0),
+            completion_tokens=getattr(usage, 'completion_tokens', 0),
+            retries=attempt
+        )
+        return response
+
+    def stream_chat(self, messages, name='default', **kwargs):
+        """流式调用大模型，逐段产出回复文本
+
+        只在收到第一个数据块之前重试；调用方提前关闭生成器（如客户端断开）时会关闭上游连接。
+        """
+        started = time.monotonic()
+        kwargs.setdefault('stream_options', {'include_usage': True})
+        stream, attempt, probe = self._create_with_retry(name, started, messages, stream=True, **kwargs)
+        usage = None
+        ttft = None
+        success = False
+        cancelled = False
+        try:
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttft is None:
+                        ttft = time.monotonic() - started
+                    yield delta
+            success = True
+            self.breaker.record_success()
+        except GeneratorExit:
+            cancelled = True
+            raise
+        except RETRYABLE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        finally:
+            stream.close()
+            if not success:
+                self.breaker.release_probe(probe)
+            self.metrics.record(
+                name, time.monotonic() - started, success,
+                prompt_tokens=getattr(usage, 'prompt_tokens', 0),
+                completion_tokens=getattr(usage, 'completion_tokens', 0),
+                retries=attempt, ttft=ttft, cancelled=cancelled
+            )
+
+    def chat(self, messages, name='default', **kwargs):
+        """调用大模型并返回回复文本"""
+        response = self.create_completion(messages, name=name, **kwargs)
+        return response.choices[0].message.content if getattr(response, 'choices', None) else ''
+
+    def close(self):
+        self.http_client.close()
+
+_gateway = None
+_gateway_pid = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway():
+    """获取当前进程共享的网关（多进程部署时每个进程各自创建）"""
+    global _gateway, _gateway_pid
+    if _gateway is None or _gateway_pid != os.getpid():
+        with _gateway_lock:
+            if _gateway is None or _gateway_pid != os.getpid():
+                _gateway = LLMGateway(
+                    # 未配置密钥时各调用点会先走演示模式，这里用占位值保证客户端可以创建
+                    api_key=Config.DEEPSEEK_API_KEY or 'not-configured',
+                    base_url=Config.DEEPSEEK_BASE_URL,
+                    model=Config.DEEPSEEK_MODEL,
+                    timeout=Config.LLM_TIMEOUT,
+                    connect_timeout=Config.LLM_CONNECT_TIMEOUT,
+                    max_retries=Config.LLM_MAX_RETRIES,
+                    retry_base_delay=Config.LLM_RETRY_BASE_DELAY,
+                    pool_size=Config.LLM_POOL_SIZE,
+                    breaker_threshold=Config.LLM_BREAKER_THRESHOLD,
+                    breaker_cooldown=Config.LLM_BREAKER_COOLDOWN
+                )
+                _gateway_pid = os.getpid()
+    return _gateway
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+自动组卷
+
+按约束条件从题库中抽题：题目数量、目标总分、每个知识点（标签）至少几道、
+只从带有指定标签的题目中选，以及排除最近一段时间内学生做过的题目。
+抽题全部在数据库中完成（标签表有 (tag, quiz_id) 索引，答题记录有答题时间索引），
+每个知识点一条随机抽样查询，不把题库加载到内存；选好的题目在一个事务中写入试卷。
+"""
+
+from datetime import datetime, timedelta
+from models import db
+from models.quiz import Quiz
+from models.quiz_tag import QuizTag
+from models.answer import Answer
+from models.paper_quiz import PaperQuiz
+
+class PaperAssemblyError(Exception):
+    """组卷条件不合法或题库中没有足够的题目"""
+
+def parse_constraints(data, max_questions):
+    """校验组卷条件，返回规范化的条件字典
+
+    data 字段：count 题目数，total_score 总分（默认每题1分），
+    tags 为 {知识点: 至少题数}（也可以是“知识点:题数”的列表或字符串，省略题数时为1），
+    pool_tags 为题目必须同时带有的标签列表，exclude_recent_days 排除最近N天内做过的题目，
+    student_ids 限定“做过”的学生范围（如一个班级），为空时为所有学生。
+    """
+    try:
+        count = int(data.get('count') or 0)
+        total_score = float(data.get('total_score') or count)
+        exclude_recent_days = int(data.get('exclude_recent_days') or 0)
+    except (TypeError, ValueError):
+        raise PaperAssemblyError('题目数、总分和排除天数必须是数字')
+    if not 1 <= count <= max_questions:
+        raise PaperAssemblyError(f'题目数必须在1到{max_questions}之间')
+    if total_score <= 0:
+        raise PaperAssemblyError('总分必须大于0')
+    if exclude_recent_days < 0:
+        raise PaperAssemblyError('排除天数不能为负数')
+
+    tags = data.get('tags') or {}
+    if not isinstance(tags, dict):
+        # 表单中写作“知识点:题数”，省略题数时为1
+        parsed = {}
+        for entry in QuizTag.normalize_tags(tags):
+            tag, _, need = entry.replace('：', ':').partition(':')
+            parsed[tag] = need or 1
+        tags = parsed
+    try:
+        tags = {tag: int(need) for tag, need in tags.items() if str(tag).strip() and int(need) > 0}
+    except (TypeError, ValueError):
+        raise PaperAssemblyError('知识点的题数必须是整数')
+    if sum(tags.values()) > count:
+        raise PaperAssemblyError('各知识点要求的题数之和超过了题目总数')
+
+    return {
+        'count': count,
+        'total_score': total_score,
+        'tags': tags,
+        'pool_tags': QuizTag.normalize_tags(data.get('pool_tags')),
+        'exclude_recent_days': exclude_recent_days,
+        'student_ids': QuizTag.normalize_tags(data.get('student_ids')),
+    }
+
+def distribute_scores(total_score, count):
+    """把总分平均分配到每道题（按0.01分取整，余数分给前面的题目）"""
+    base, remainder = divmod(round(total_score * 100), count)
+    return [(base + (1 if index < remainder else 0)) / 100 for index in range(count)]
+
+def build_exclusions(paper_id, constraints):
+    """不能入选的题目：已在试卷中的，以及最近做过的"""
+    exclusions = [db.select(PaperQuiz.quiz_id).where(PaperQuiz.paper_id == paper_id)]
+    if constraints['exclude_recent_days']:
+        since = datetime.utcnow() - timedelta(days=constraints['exclude_recent_days'])
+        recent = db.select(Answer.quiz_id).where(Answer.answered_at >= since)
+        if constraints['student_ids']:
+            recent = recent.where(Answer.student_id.in_(constraints['student_ids']))
+        exclusions.append(recent)
+    return exclusions
+
+def sample_quizzes(limit, exclusions, chosen, pool_tags, tag=None):
+    """随机抽取不超过 limit 道满足条件的题目ID"""
+    query = db.select(Quiz.id)
+    if tag is not None:
+        query = query.join(QuizTag, QuizTag.quiz_id == Quiz.id).where(QuizTag.tag == tag)
+    if pool_tags:
+        pool = db.select(QuizTag.quiz_id).where(QuizTag.tag.in_(pool_tags)).group_by(QuizTag.quiz_id).having(
+            db.func.count() == len(pool_tags)
+        )
+        query = query.where(Quiz.id.in_(pool))
+    for exclusion in exclusions:
+        query = query.where(Quiz.id.not_in(exclusion))
+    if chosen:
+        query = query.where(Quiz.id.not_in(chosen))
+    return db.session.execute(query.order_by(db.func.random()).limit(limit)).scalars().all()
+
+def select_quizzes(paper_id, constraints):
+    """按约束抽题，返回题目ID列表；题目不足时抛出 PaperAssemblyError
+
+    先按知识点逐个抽题（已选题目如果也带有该知识点则计入），再从题库中随机补足数量。
+    """
+    exclusions = build_exclusions(paper_id, constraints)
+    pool_tags = constraints['pool_tags']
+    required = dict(constraints['tags'])
+    chosen = []
+    for tag in list(required):
+        need = required[tag]
+        if need <= 0:
+            continue
+        picked = sample_quizzes(need, exclusions, chosen, pool_tags, tag=tag)
+        if len(picked) < need:
+            raise PaperAssemblyError(f'知识点“{tag}”的可用题目不足{need}道（仅有{len(picked)}道）')
+        chosen.extend(picked)
+        # 新选的题目可能同时覆盖其他知识点
+        for other_tag, count in db.session.query(QuizTag.tag, db.func.count()).filter(
+            QuizTag.quiz_id.in_(picked), QuizTag.tag.in_(list(required))
+        ).group_by(QuizTag.tag):
+            required[other_tag] -= count
+
+    remaining = constraints['count'] - len(chosen)
+    if remaining > 0:
+        picked = sample_quizzes(remaining, exclusions, chosen, pool_tags)
+        if len(picked) < remaining:
+            raise PaperAssemblyError(f'符合条件的题目不足{constraints["count"]}道（仅有{len(chosen) + len(picked)}道）')
+        chosen.extend(picked)
+    return chosen
+
+def assemble_paper(paper_id, constraints):
+    """按约束抽题并追加到试卷末尾，所有题目在一个事务中写入，返回 (题目ID列表, 分值列表)"""
+    try:
+        quiz_ids = select_quizzes(paper_id, constraints)
+        scores = distribute_scores(constraints['total_score'], len(quiz_ids))
+        start = db.session.query(db.func.coalesce(db.func.max(PaperQuiz.question_order), 0)).filter(
+            PaperQuiz.paper_id == paper_id
+        ).scalar()
+        now = datetime.utcnow()
+        db.session.execute(db.insert(PaperQuiz), [
+            {'paper_id': paper_id, 'quiz_id': quiz_id, 'question_order': start + index + 1,
+             'score': score, 'created_at': now}
+            for index, (quiz_id, score) in enumerate(zip(quiz_ids, scores))
+        ])
+        db.session.commit()
+        return quiz_ids, scores
+    except Exception:
+        db.session.rollback()
+        raise
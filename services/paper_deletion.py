@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台删除试卷
+
+一份试卷的答题记录可能有几十万行，在请求中一次删除会长时间占用SQLite的写锁，
+阻塞正在提交的考试。删除改为后台任务：先把试卷标记为删除中（学生端不再显示），
+再按批删除答题记录、考试记录和题目关联，每批一个短事务并汇报进度，批与批之间让出写锁；
+最后删除受影响学生的AI分析报告和试卷本身。任务中断后可重新提交，已删除的部分不会重复处理。
+"""
+
+import time
+from flask import current_app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from models.student_analysis_report import StudentAnalysisReport
+from services.jobs import get_job_runner
+
+# 按顺序删除的关联数据：(结果字段, 模型, 说明)
+DELETION_STEPS = [
+    ('answers', Answer, '答题记录'),
+    ('exam_records', ExamRecord, '考试记录'),
+    ('paper_quizzes', PaperQuiz, '题目关联'),
+]
+
+# 按学生ID批量删除报告时每条语句的学生数（SQLite绑定参数个数有限制）
+STUDENT_CHUNK_SIZE = 500
+
+def delete_batch(model, paper_id, batch_size):
+    """删除一批试卷的关联数据并提交，返回删除的行数"""
+    batch = db.select(model.id).where(model.paper_id == paper_id).limit(batch_size)
+    try:
+        count = model.query.filter(model.id.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    except Exception:
+        db.session.rollback()
+        raise
+
+def delete_paper_row(paper_id):
+    """删除试卷本身，返回 (各类遗留数据的删除行数, 试卷是否已删除)
+
+    删除中的试卷拒绝修改，但检查和写入之间仍可能有并发请求写入新的关联数据，
+    所以删除试卷前在同一事务中再清理一遍。
+    """
+    try:
+        leftovers = {
+            name: model.query.filter_by(paper_id=paper_id).delete(synchronize_session=False)
+            for name, model, _ in DELETION_STEPS
+        }
+        deleted = Paper.query.filter_by(id=paper_id).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return leftovers, bool(deleted)
+
+def affected_student_ids(paper_id):
+    """考过或答过这份试卷的学生"""
+    query = db.select(ExamRecord.student_id).where(ExamRecord.paper_id == paper_id).union(
+        db.select(Answer.student_id).where(Answer.paper_id == paper_id)
+    )
+    return db.session.execute(query).scalars().all()
+
+def delete_analysis_reports(student_ids):
+    """删除学生的AI分析报告（报告包含已删除试卷的成绩，需要重新生成），返回删除的份数"""
+    count = 0
+    try:
+        for start in range(0, len(student_ids), STUDENT_CHUNK_SIZE):
+            chunk = student_ids[start:start + STUDENT_CHUNK_SIZE]
+            count += StudentAnalysisReport.query.filter(
+                StudentAnalysisReport.student_id.in_(chunk)
+            ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return count
+
+def run_paper_deletion_job(job, paper_id, batch_size, pause):
+    """删除试卷的后台任务，进度按已删除的行数计算"""
+    student_ids = affected_student_ids(paper_id)
+    totals = {name: model.query.filter_by(paper_id=paper_id).count() for name, model, _ in DELETION_STEPS}
+    total = sum(totals.values())
+    result = {name: 0 for name in totals}
+    completed = 0
+    job.update(total=total, message=f'共 {total} 条记录待删除', result=result)
+
+    for name, model, label in DELETION_STEPS:
+        while True:
+            count = delete_batch(model, paper_id, batch_size)
+            if not count:
+                break
+            result[name] += count
+            completed += count
+            job.update(completed=completed, message=f'正在删除{label}：已删除 {completed}/{total} 条', result=result)
+            if pause:
+                time.sleep(pause)
+
+    leftovers, result['paper_deleted'] = delete_paper_row(paper_id)
+    for name, count in leftovers.items():
+        result[name] += count
+        completed += count
+    result['analysis_reports'] = delete_analysis_reports(student_ids)
+    job.update(total=max(total, completed), completed=completed, message='试卷已删除', result=result)
+
+def submit_paper_deletion(paper_id, created_by=None):
+    """把试卷标记为删除中并提交后台删除任务，返回任务；试卷不存在时返回None
+
+    后台任务过多时抛出 JobQueueFullError，试卷恢复原来的状态。
+    """
+    paper = Paper.get_paper_by_id(paper_id)
+    if not paper:
+        return None
+    previous_status = paper.status
+    paper.status = Paper.STATUS_DELETING
+    db.session.commit()
+    try:
+        return get_job_runner().submit(
+            'paper_deletion', run_paper_deletion_job, paper_id,
+            current_app.config['PAPER_DELETE_BATCH_SIZE'], current_app.config['PAPER_DELETE_BATCH_PAUSE'],
+            created_by=created_by
+        )
+    except Exception:
+        paper.status = previous_status
+        db.session.commit()
+        raise
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+题库近似重复检测
+
+题目内容规范化后切成字符3-gram，计算MinHash签名（保存在 quizzes.content_signature 列中）。
+内存中按LSH分段建立倒排桶，新题目只与落入相同桶的候选题比较签名，
+不需要和整个题库逐一比对。索引在第一次使用时从数据库加载签名，之后随题目增删同步维护；
+多进程部署时每个进程各有一份索引，使用时按 QUIZ_INDEX_SYNC_INTERVAL 检查题库版本，
+同步其他进程增删的题目。
+"""
+
+import re
+import sys
+import time
+import zlib
+import random
+import functools
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from flask import current_app
+from models import db
+
+# 签名长度，以及LSH的分段数和每段行数（NUM_PERM = BANDS * ROWS）
+NUM_PERM = 64
+BANDS = 16
+ROWS = 4
+
+SHINGLE_SIZE = 3
+
+# 去掉空白和标点后再计算相似度
+NORMALIZE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+
+# 用固定种子生成哈希参数，保证保存在数据库中的签名在重启后仍然可比
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+# 缓存的3-gram取值向量个数（每个约0.6KB），常见的3-gram不必重复计算
+SHINGLE_CACHE_SIZE = 16384
+
+def _pack(values, width):
+    """把一组整数按固定字节宽度打包成一个大整数（小端，第一个值在最低位）"""
+    return int.from_bytes(b''.join(value.to_bytes(width, 'little') for value in values), 'little')
+
+# 全部排列的参数按16字节一格打包，一次大整数运算同时算出一个3-gram在所有排列下的取值
+_PACKED_A = _pack([a for a, _ in PERMUTATIONS], 16)
+_PACKED_B = _pack([b for _, b in PERMUTATIONS], 16)
+_WIDE_ONES = _pack([1] * NUM_PERM, 16)
+_WIDE_LOW = _WIDE_ONES * MERSENNE_PRIME
+
+# 取值向量每格8字节，求最小值时按向量两两比较
+VECTOR_BITS = NUM_PERM * 64
+_VECTOR_MASK = (1 << VECTOR_BITS) - 1
+_LANE_MASK = (1 << 64) - 1
+
+# 同步其他进程新增的题目时每次按ID读取的题目数
+SYNC_BATCH_SIZE = 500
+
+def normalize_content(text):
+    """规范化题目文本：全半角统一、转小写、去掉空白和标点"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return NORMALIZE_PATTERN.sub('', text)
+
+def shingle_hashes(text):
+    """题目文本的字符 n-gram 哈希集合"""
+    normalized = normalize_content(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode('utf-8'))} if normalized else set()
+    return {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+@functools.lru_cache(maxsize=SHINGLE_CACHE_SIZE)
+def _permuted(h):
+    """一个3-gram哈希在所有排列下的取值 (a*h+b) mod P，按8字节一格打包
+
+    每格的 a*h+b 小于2^94，不会进位到相邻格；按梅森素数折叠一次后小于2P，
+    再把不小于P的格减去P，结果与逐个取模完全相同。
+    """
+    x = _PACKED_A * h + _PACKED_B
+    x = (x & _WIDE_LOW) + ((x >> 61) & _WIDE_LOW)
+    x -= (((x + _WIDE_ONES) >> 61) & _WIDE_ONES) * MERSENNE_PRIME
+    return bytes(memoryview(x.to_bytes(NUM_PERM * 16, 'little')).cast('Q')[::2])
+
+@functools.lru_cache(maxsize=256)
+def _lane_ones(lanes):
+    """每格最低位为1的大整数"""
+    return int.from_bytes(b'\x01\x00\x00\x00\x00\x00\x00\x00' * lanes, 'little')
+
+def compute_signature(text):
+    """计算题目内容的MinHash签名（bytes），内容为空时返回None
+
+    各3-gram的取值向量拼成一个大整数后两两取较小值，每轮比较一半向量；
+    每格的值小于2^61，在第61位放一个哨兵位再相减，哨兵位保留说明前一半的值不小于后一半。
+    """
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return None
+    count = len(hashes)
+    x = int.from_bytes(b''.join(map(_permuted, hashes)), 'little')
+    while count > 1:
+        if count % 2:
+            # 奇数个向量时补一份第一个向量，不影响最小值
+            x |= (x & _VECTOR_MASK) << (count * VECTOR_BITS)
+            count += 1
+        count //= 2
+        shift = count * VECTOR_BITS
+        low = x & ((1 << shift) - 1)
+        high = x >> shift
+        ones = _lane_ones(count * NUM_PERM)
+        take_high = ((((ones << 61) | low) - high) >> 61) & ones
+        x = low ^ ((low ^ high) & (take_high * _LANE_MASK))
+    values = array('Q', x.to_bytes(NUM_PERM * 8, 'little'))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return array('I', [value & 0xFFFFFFFF for value in values]).tobytes()
+
+def signature_similarity(sig1, sig2):
+    """两个签名相同位置取值相等的比例，即Jaccard相似度的估计值"""
+    values1 = array('I', sig1)
+    values2 = array('I', sig2)
+    return sum(1 for x, y in zip(values1, values2) if x == y) / NUM_PERM
+
+def band_keys(signature):
+    """签名按段切分后的桶键"""
+    width = ROWS * 4
+    return [(band, signature[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+class QuizSimilarityIndex:
+    """题目MinHash签名的LSH索引"""
+
+    def __init__(self, threshold, sync_interval=0):
+        self.threshold = threshold
+        self.sync_interval = sync_interval
+        self._signatures = {}
+        self._buckets = defaultdict(set)
+        self._quiz_ids = set()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None
+        self._next_sync = 0
+
+    def ensure_loaded(self):
+        """首次使用时从数据库加载所有题目的签名，之后检查是否需要同步"""
+        if self._loaded:
+            self.sync()
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            from models.quiz import Quiz
+            # 先取版本再读签名，读取期间的增删在下次同步时处理
+            self._version = Quiz.get_bank_version()
+            self._next_sync = time.monotonic() + self.sync_interval
+            rows = db.session.query(Quiz.id, Quiz.content_signature).execution_options(yield_per=1000)
+            self.load_signatures(rows)
+
+    def sync(self):
+        """同步其他进程增删的题目（最多每 sync_interval 秒查询一次题库版本）
+
+        只对从数据库加载的索引生效。题目保存后内容不再修改，只需要处理增删。
+        """
+        if self._version is None or time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            from models.quiz import Quiz
+            self._next_sync = time.monotonic() + self.sync_interval
+            version = Quiz.get_bank_version()
+            if version == self._version:
+                return
+            removed, changed = Quiz.get_index_changes(self._quiz_ids, self._version[1])
+            for quiz_id in removed:
+                self.remove(quiz_id)
+            for start in range(0, len(changed), SYNC_BATCH_SIZE):
+                rows = db.session.query(Quiz.id, Quiz.content_signature).filter(
+                    Quiz.id.in_(changed[start:start + SYNC_BATCH_SIZE])
+                )
+                for quiz_id, signature in rows:
+                    self.remove(quiz_id)
+                    self._add(quiz_id, signature)
+            self._version = version
+
+    def load_signatures(self, rows):
+        """用 (题目ID, 签名) 序列初始化索引"""
+        with self._lock:
+            for quiz_id, signature in rows:
+                self._add(quiz_id, signature)
+            self._loaded = True
+
+    def _add(self, quiz_id, signature):
+        self._quiz_ids.add(quiz_id)
+        if not signature:
+            return
+        self._signatures[quiz_id] = signature
+        for key in band_keys(signature):
+            self._buckets[key].add(quiz_id)
+
+    def add(self, quiz_id, signature):
+        """登记新题目"""
+        with self._lock:
+            if self._loaded:
+                self._add(quiz_id, signature)
+
+    def remove(self, quiz_id):
+        """移除已删除的题目"""
+        with self._lock:
+            self._quiz_ids.discard(quiz_id)
+            signature = self._signatures.pop(quiz_id, None)
+            if signature:
+                for key in band_keys(signature):
+                    bucket = self._buckets.get(key)
+                    if bucket:
+                        bucket.discard(quiz_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def find_duplicate(self, signature):
+        """查找与签名最相似且达到阈值的已有题目，返回 (题目ID, 相似度) 或 None"""
+        self.ensure_loaded()
+        with self._lock:
+            candidates = set()
+            for key in band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            best = None
+            for quiz_id in candidates:
+                similarity = signature_similarity(signature, self._signatures[quiz_id])
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (quiz_id, similarity)
+            return best
+
+    def duplicate_groups(self):
+        """对整个题库做近似重复分组，返回 [(题目ID列表, 组内最高相似度)]，按组大小降序"""
+        self.ensure_loaded()
+        with self._lock:
+            parent = {}
+
+            def find(quiz_id):
+                while parent.get(quiz_id, quiz_id) != quiz_id:
+                    quiz_id = parent[quiz_id]
+                return quiz_id
+
+            best_similarity = {}
+            checked = set()
+            for bucket in self._buckets.values():
+                if len(bucket) < 2:
+                    continue
+                members = sorted(bucket)
+                for i, first in enumerate(members):
+                    for second in members[i + 1:]:
+                        if (first, second) in checked:
+                            continue
+                        checked.add((first, second))
+                        similarity = signature_similarity(self._signatures[first], self._signatures[second])
+                        if similarity < self.threshold:
+                            continue
+                        root1, root2 = find(first), find(second)
+                        if root1 != root2:
+                            parent[max(root1, root2)] = min(root1, root2)
+                        for quiz_id in (first, second):
+                            best_similarity[quiz_id] = max(best_similarity.get(quiz_id, 0), similarity)
+
+            groups = defaultdict(list)
+            for quiz_id in best_similarity:
+                groups[find(quiz_id)].append(quiz_id)
+            result = [
+                (sorted(ids), max(best_similarity[quiz_id] for quiz_id in ids))
+                for ids in groups.values()
+            ]
+            result.sort(key=lambda group: (-len(group[0]), group[0][0]))
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': self._loaded, 'quizzes': len(self._signatures), 'buckets': len(self._buckets)}
+
+def get_quiz_index():
+    """获取当前应用的题目相似度索引"""
+    return current_app.extensions['quiz_index']
+
+def filter_duplicates(items):
+    """检查待保存的题目是否与题库或同一批中的其他题目近似重复
+
+    为每道题写入 content_signature，返回 (待保存的题目列表, 重复题目列表)。
+    QUIZ_DEDUPE_SKIP 为真时重复题目不保存，否则照常保存，只在结果中标记。
+    重复题目列表的元素为 {'content', 'duplicate_of', 'similarity'}，
+    duplicate_of 为题库中相似题目的ID，与同一批题目重复时为None。
+    """
+    index = get_quiz_index()
+    skip = current_app.config['QUIZ_DEDUPE_SKIP']
+    accepted = []
+    duplicates = []
+    # 同一批题目也按LSH分桶，只与桶中的候选比较（批量导入时一批可能有上千道题）
+    batch_buckets = defaultdict(list)
+    for item in items:
+        signature = compute_signature(item['content'])
+        item['content_signature'] = signature
+        match = index.find_duplicate(signature) if signature else None
+        duplicate_of = match[0] if match else None
+        similarity = match[1] if match else 0
+        keys = band_keys(signature) if signature else []
+        if match is None and signature:
+            candidates = {id(other): other for key in keys for other in batch_buckets.get(key, ())}
+            for other in candidates.values():
+                batch_similarity = signature_similarity(signature, other)
+                if batch_similarity >= index.threshold and batch_similarity > similarity:
+                    similarity = batch_similarity
+        if similarity:
+            duplicates.append({'content': item['content'], 'duplicate_of': duplicate_of, 'similarity': round(similarity, 2)})
+            if skip:
+                continue
+        accepted.append(item)
+        for key in keys:
+            batch_buckets[key].append(signature)
+    return accepted, duplicates
+
+def init_quiz_index(app):
+    """根据配置创建题目相似度索引（签名在第一次查重时才从数据库加载）"""
+    app.extensions['quiz_index'] = QuizSimilarityIndex(
+        threshold=app.config['QUIZ_DEDUPE_THRESHOLD'],
+        sync_interval=app.config['QUIZ_INDEX_SYNC_INTERVAL']
+    )
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+智能出题
+
+题目较多时按组拆分，多个分组在有限并发下同时请求大模型；每组独立解析和校验，
+只有失败的分组会重新请求，成功分组的题目不会因为其他分组出错而丢失。
+每组以流式方式请求，题目对象一闭合就解析校验，后台任务模式下随即保存，
+页面通过任务进度逐步显示已生成的题目。
+"""
+
+import queue
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from models.quiz import Quiz
+from models.quiz_tag import QuizTag
+from services.llm_gateway import get_llm_gateway, LLMUnavailableError
+from services.quiz_stream_parser import QuizStreamParser
+from services.quiz_dedupe import filter_duplicates
+from services.rate_limit import background_llm_slot
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "你是一位专业的教师，擅长出题。请严格按照用户要求生成题目，并以JSON格式返回。"
+
+# 每道题预留的输出token数，以及每次调用额外预留的token数
+TOKENS_PER_QUESTION = 400
+BASE_MAX_TOKENS = 200
+MAX_COMPLETION_TOKENS = 4000
+
+class QuizGenerationError(Exception):
+    """某一组题目没有得到任何格式正确的题目"""
+
+def build_quiz_prompt(subject, grade, question_type, knowledge_points, count, part=1, parts=1):
+    """构造出题提示词，part/parts 表示当前是第几组"""
+    # 注意：避免在 f-string 中直接包含未转义的大括号，采用首段 f-string + 后续普通字符串拼接
+    prompt = (
+        f"请生成{count}道关于{subject}{grade}的{question_type}，主要考察{knowledge_points}知识点。\n"
+        "每道题目需包含：题目内容(content)、题目答案(answer)、题目分析(analysis)。\n"
+        "请严格按照以下JSON格式返回（不要添加任何其他文字）：\n"
+        "{\n"
+        "  \"quizzes\": [\n"
+        "    {\"id\": 1, \"content\": \"题目内容描述。A. 选项1, B. 选项2, C. 选项3, D. 选项4\", \"answer\": \"B\", \"analysis\": \"答案解析\"},\n"
+        "    {\"id\": 2, \"content\": \"题目内容描述。A. 选项1, B. 选项2, C. 选项3, D. 选项4\", \"answer\": \"D\", \"analysis\": \"答案解析\"}\n"
+        "  ]\n"
+        "}\n"
+        "请确保JSON格式严格正确，并且所有键都必须是英文小写。\n"
+        "确保题型正确，如选择题，填空题，判断题，简答题，计算题，应用题，证明题，论述题，分析题，综合题，开放题，讨论题，辩论题，演讲题，写作题，翻译题，阅读理解题，听力理解题，口语交际题，作文题，其他题型。\n"
+        "选择题的题目和选项作为content的值，答案作为answer的值，分析作为analysis的值。"
+        "注意：选择题的正确答案要随机一点，不要每次都是A，也不要有规律。"
+    )
+    if parts > 1:
+        # 分组生成时提示模型各组侧重不同方面，减少组间重复
+        prompt += f"\n本次是同一套题目的第{part}组（共{parts}组），请侧重知识点的不同方面，避免与其他组出现相同或相似的题目。"
+    return prompt
+
+def validate_quiz_item(item):
+    """校验单道题目，合格时返回只包含题目字段的字典，否则返回None"""
+    if not isinstance(item, dict):
+        return None
+    content = item.get('content')
+    answer = item.get('answer')
+    analysis = item.get('analysis')
+    if not isinstance(content, str) or not content.strip():
+        return None
+    if answer is None or not str(answer).strip():
+        return None
+    return {
+        'content': content.strip(),
+        'answer': str(answer).strip(),
+        'analysis': str(analysis).strip() if analysis else None
+    }
+
+def split_into_chunks(total, chunk_size):
+    """把题目总数拆成每组的题目数，例如 12 道、每组 5 道 -> [5, 5, 2]"""
+    chunk_size = max(1, chunk_size)
+    return [min(chunk_size, total - start) for start in range(0, total, chunk_size)]
+
+def stream_quiz_items(prompt, count, max_tokens):
+    """流式请求一组题目，每道题目闭合并通过校验后立即产出，最多产出 count 道"""
+    parser = QuizStreamParser()
+    emitted = 0
+    stream = get_llm_gateway().stream_chat(
+        name='smart_quiz',
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens
+    )
+    try:
+        for delta in stream:
+            for item in parser.feed(delta):
+                quiz = validate_quiz_item(item)
+                if quiz is None:
+                    parser.invalid += 1
+                elif emitted < count:
+                    # 多出的题目丢弃，但继续读完回复，让网关正常记录用量
+                    emitted += 1
+                    yield quiz
+    finally:
+        stream.close()
+        if parser.invalid:
+            logger.warning("[smart_quiz] dropped %s invalid quiz objects", parser.invalid)
+
+def generate_quiz_chunk(params, count, part, parts, retries, emit=None):
+    """流式生成一组题目，返回该组的题目列表
+
+    每道题解析出来后立即调用 emit(quiz)。一次请求得到的题目不足时（输出被截断、格式错误或中途断开），
+    只为缺少的数量重新请求；重试后仍一道都没有得到时抛出 QuizGenerationError。
+    """
+    quizzes = []
+    attempt = 0
+    while True:
+        remaining = count - len(quizzes)
+        prompt = build_quiz_prompt(
+            params['subject'], params['grade'], params['question_type'], params['knowledge_points'],
+            remaining, part, parts
+        )
+        max_tokens = min(MAX_COMPLETION_TOKENS, BASE_MAX_TOKENS + TOKENS_PER_QUESTION * remaining)
+        error = None
+        try:
+            for quiz in stream_quiz_items(prompt, remaining, max_tokens):
+                quizzes.append(quiz)
+                if emit:
+                    emit(quiz)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            # 流式输出中途出错时，已经解析出的题目保留，缺少的部分按不足处理
+            error = e
+
+        if len(quizzes) >= count:
+            return quizzes
+        if attempt >= retries:
+            if error is not None and not quizzes:
+                raise error
+            if not quizzes:
+                raise QuizGenerationError('返回内容中没有格式正确的题目')
+            logger.warning("[smart_quiz] part %s/%s incomplete, kept %s/%s", part, parts, len(quizzes), count)
+            return quizzes
+        attempt += 1
+        logger.warning("[smart_quiz] part %s/%s got %s/%s, retry %s", part, parts, len(quizzes), count, attempt)
+
+def generate_quizzes(params, num_questions, chunk_size, max_concurrency, retries, on_quizzes=None,
+                     slot=contextlib.nullcontext):
+    """分组并发生成题目，返回 (按分组顺序合并的题目列表, 失败分组的错误信息列表)
+
+    on_quizzes(quizzes) 在调用线程中执行，每当有题目解析完成就以批为单位调用，可用于边生成边保存。
+    每组在 slot() 内请求大模型，后台任务借此占用大模型调用名额。
+    """
+    chunks = split_into_chunks(num_questions, chunk_size)
+    parts = len(chunks)
+    workers = max(1, min(max_concurrency, parts))
+    events = queue.Queue()
+
+    def run_chunk(part, count):
+        try:
+            with slot():
+                generate_quiz_chunk(params, count, part, parts, retries,
+                                    emit=lambda quiz: events.put((part, quiz, None)))
+            events.put((part, None, None))
+        except Exception as e:
+            events.put((part, None, e))
+
+    results = {part: [] for part in range(1, parts + 1)}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smart-quiz') as executor:
+        for part, count in enumerate(chunks, start=1):
+            executor.submit(run_chunk, part, count)
+
+        unfinished = parts
+        while unfinished:
+            # 阻塞等待第一个事件，再取走已经到达的其余事件，合并成一批处理
+            batch = []
+            pending = [events.get()]
+            while True:
+                try:
+                    pending.append(events.get_nowait())
+                except queue.Empty:
+                    break
+            for part, quiz, error in pending:
+                if quiz is not None:
+                    results[part].append(quiz)
+                    batch.append(quiz)
+                    continue
+                unfinished -= 1
+                if error is None:
+                    continue
+                if not isinstance(error, (QuizGenerationError, LLMUnavailableError)):
+                    logger.error("[smart_quiz] part %s/%s failed: %r", part, parts, error)
+                errors[part] = f'第{part}组: {error}'
+            if batch and on_quizzes:
+                on_quizzes(batch)
+
+    quizzes = [quiz for part in sorted(results) for quiz in results[part]]
+    return quizzes, [errors[part] for part in sorted(errors)]
+
+def quiz_tags_for(params):
+    """生成题目的标签：学科、年级、题型和各个知识点"""
+    return QuizTag.normalize_tags(
+        [params['subject'], params['grade'], params['question_type']]
+        + QuizTag.normalize_tags(params['knowledge_points'])
+    )
+
+def save_generated_quizzes(quizzes, tags=None):
+    """查重后批量保存生成的题目（带上标签），返回 (已保存的题目列表, 近似重复的题目列表)"""
+    for quiz in quizzes:
+        quiz['tags'] = tags
+    accepted, duplicates = filter_duplicates(quizzes)
+    if duplicates:
+        logger.info("[smart_quiz] %s near-duplicate quizzes detected", len(duplicates))
+    return (Quiz.add_quizzes(accepted) if accepted else []), duplicates
+
+def run_quiz_job(job, params, num_questions, chunk_size, max_concurrency, retries):
+    """后台出题任务：题目解析出来后立即查重、保存并更新任务进度"""
+    quiz_ids = []
+    duplicates = []
+    processed = [0]
+
+    def save_quizzes(quizzes):
+        saved, found = save_generated_quizzes(quizzes, quiz_tags_for(params))
+        quiz_ids.extend(quiz.id for quiz in saved)
+        duplicates.extend(found)
+        processed[0] += len(quizzes)
+        job.update(
+            completed=processed[0],
+            message=f'已生成 {len(quiz_ids)}/{num_questions} 道题目',
+            result={'quiz_ids': quiz_ids, 'duplicates': duplicates, 'errors': []}
+        )
+
+    job.update(message=f'正在生成 {num_questions} 道题目')
+    _, errors = generate_quizzes(params, num_questions, chunk_size, max_concurrency, retries,
+                                 on_quizzes=save_quizzes, slot=background_llm_slot())
+    if not quiz_ids and not duplicates:
+        raise QuizGenerationError('AI返回的数据格式不正确，请重试。' + ('；'.join(errors)))
+    message = f'成功生成并保存 {len(quiz_ids)} 道题目'
+    if duplicates:
+        message += f'，{len(duplicates)} 道与题库中的题目近似重复'
+        if current_app.config['QUIZ_DEDUPE_SKIP']:
+            message += '（已跳过）'
+    if errors:
+        message += f'，{len(errors)} 组生成失败'
+    job.update(message=message, result={'quiz_ids': quiz_ids, 'duplicates': duplicates, 'errors': errors})
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+题库检索（AI助手的本地知识来源）
+
+对题目内容和解析建立BM25倒排索引。中文按连续汉字切成字符二元组（单独的汉字保留为单字），
+英文单词和数字整体作为一个词，不依赖分词词典。
+索引在第一次检索时从数据库加载，之后随题目增删同步维护；多进程部署时每个进程各有一份索引，
+检索时按 QUIZ_INDEX_SYNC_INTERVAL 检查题库版本，同步其他进程增删的题目。
+
+AI聊天时先在题库中检索：问题与某道题高度吻合时直接返回该题的答案和解析，不调用大模型；
+否则把最相关的几道题作为简短的参考资料附在请求中。
+"""
+
+import re
+import math
+import time
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from flask import current_app
+from models import db
+from services.answer_cache import is_context_dependent
+
+# 连续的汉字，或连续的字母数字
+TOKEN_PATTERN = re.compile(r'[一-鿿]+|[a-z0-9]+')
+
+# BM25参数
+K1 = 1.5
+B = 0.75
+
+# 同步其他进程新增的题目时每次按ID读取的题目数
+SYNC_BATCH_SIZE = 500
+
+REFERENCE_PROMPT = '以下是题库中与学生问题相关的题目，回答时可以参考（与问题无关时忽略）：'
+
+def tokenize(text):
+    """把文本切成检索用的词：汉字二元组、单独的汉字、英文单词和数字"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        if run[0] < '一':
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def quiz_document(content, analysis):
+    """参与检索的题目文本"""
+    return f'{content or ""}\n{analysis or ""}'
+
+class BM25Index:
+    """支持增量增删的BM25倒排索引"""
+
+    def __init__(self, sync_interval=0):
+        self.sync_interval = sync_interval
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None
+        self._next_sync = 0
+
+    def ensure_loaded(self):
+        """首次使用时从数据库加载所有题目，之后检查是否需要同步"""
+        if self._loaded:
+            self.sync()
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            from models.quiz import Quiz
+            # 先取版本再读题目，读取期间的增删在下次同步时处理
+            self._version = Quiz.get_bank_version()
+            self._next_sync = time.monotonic() + self.sync_interval
+            rows = db.session.query(Quiz.id, Quiz.content, Quiz.analysis).execution_options(yield_per=1000)
+            self.load_documents((quiz_id, quiz_document(content, analysis)) for quiz_id, content, analysis in rows)
+
+    def sync(self):
+        """同步其他进程增删的题目（最多每 sync_interval 秒查询一次题库版本）
+
+        只对从数据库加载的索引生效。题目保存后内容不再修改，只需要处理增删。
+        """
+        if self._version is None or time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            from models.quiz import Quiz
+            self._next_sync = time.monotonic() + self.sync_interval
+            version = Quiz.get_bank_version()
+            if version == self._version:
+                return
+            removed, changed = Quiz.get_index_changes(set(self._doc_terms), self._version[1])
+            for doc_id in removed:
+                self._remove(doc_id)
+            for start in range(0, len(changed), SYNC_BATCH_SIZE):
+                rows = db.session.query(Quiz.id, Quiz.content, Quiz.analysis).filter(
+                    Quiz.id.in_(changed[start:start + SYNC_BATCH_SIZE])
+                )
+                for quiz_id, content, analysis in rows:
+                    self._add(quiz_id, quiz_document(content, analysis))
+            self._version = version
+
+    def load_documents(self, rows):
+        """用 (题目ID, 文本) 序列初始化索引"""
+        with self._lock:
+            for doc_id, text in rows:
+                self._add(doc_id, text)
+            self._loaded = True
+
+    def _add(self, doc_id, text):
+        if doc_id in self._doc_terms:
+            self._remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            self._postings[term][doc_id] = frequency
+        self._doc_terms[doc_id] = tuple(counts)
+        length = sum(counts.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def add(self, doc_id, text):
+        """登记新题目（索引尚未加载时跳过，加载时会一并读入）"""
+        with self._lock:
+            if self._loaded:
+                self._add(doc_id, text)
+
+    def remove(self, doc_id):
+        """移除已删除的题目"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def search(self, query, limit=5):
+        """检索与问题最相关的题目
+
+        返回 [(题目ID, BM25得分, 覆盖率)]，按得分降序。覆盖率为题目包含的查询词
+        按IDF加权占全部查询词的比例，用于判断匹配是否足够可信。
+        """
+        self.ensure_loaded()
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._doc_lengths)
+            if not terms or not count:
+                return []
+            average_length = self._total_length / count
+            scores = defaultdict(float)
+            matched = defaultdict(float)
+            total_idf = 0.0
+            for term in terms:
+                posting = self._postings.get(term, {})
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                total_idf += idf
+                for doc_id, frequency in posting.items():
+                    norm = K1 * (1 - B + B * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+                    matched[doc_id] += idf
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [(doc_id, score, matched[doc_id] / total_idf) for doc_id, score in ranked]
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': self._loaded, 'documents': len(self._doc_lengths), 'terms': len(self._postings)}
+
+def get_quiz_retriever():
+    """获取当前应用的题库检索索引"""
+    return current_app.extensions['quiz_retriever']
+
+def truncate(text, limit):
+    text = (text or '').strip()
+    return text if len(text) <= limit else text[:limit] + '…'
+
+def withheld_quiz_ids(student_id, quiz_ids):
+    """在 quiz_ids 中找出答案不能透露给该学生的题目：属于已发布试卷且该学生还没有交卷"""
+    from models.paper import Paper
+    from models.paper_quiz import PaperQuiz
+    from models.exam_record import ExamRecord
+    if not quiz_ids:
+        return set()
+    submitted = db.select(ExamRecord.paper_id).where(ExamRecord.student_id == student_id)
+    query = (
+        db.select(PaperQuiz.quiz_id).distinct()
+        .join(Paper, Paper.id == PaperQuiz.paper_id)
+        .where(PaperQuiz.quiz_id.in_(quiz_ids), Paper.status == 'published', PaperQuiz.paper_id.not_in(submitted))
+    )
+    return set(db.session.scalars(query))
+
+def retrieve_for_chat(question, history=(), student_id=None):
+    """为AI聊天检索题库，返回 (直接回答, 参考题目列表)
+
+    最相关的题目覆盖率达到 AI_RETRIEVAL_ANSWER_COVERAGE 时返回由该题答案和解析组成的回答
+    （依赖上下文的追问除外），否则直接回答为None。参考题目为覆盖率达到
+    AI_RETRIEVAL_CONTEXT_COVERAGE 的前几道题目，供调用大模型时附在请求中。
+    已发布试卷中该学生还没有交卷的题目既不直接回答，也不作为参考资料。
+    """
+    config = current_app.config
+    if not config['AI_RETRIEVAL_ENABLED']:
+        return None, []
+    from models.quiz import Quiz
+    terms = set(tokenize(question))
+    if len(terms) < config['AI_RETRIEVAL_MIN_TERMS']:
+        return None, []
+    hits = get_quiz_retriever().search(question, limit=config['AI_RETRIEVAL_CONTEXT_PASSAGES'])
+    hits = [hit for hit in hits if hit[2] >= config['AI_RETRIEVAL_CONTEXT_COVERAGE']]
+    if not hits:
+        return None, []
+    withheld = withheld_quiz_ids(student_id, [hit[0] for hit in hits])
+    hits = [hit for hit in hits if hit[0] not in withheld]
+    if not hits:
+        return None, []
+    quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_([hit[0] for hit in hits]))}
+    passages = [quizzes[quiz_id] for quiz_id, _, _ in hits if quiz_id in quizzes]
+    if (passages and passages[0].id == hits[0][0] and hits[0][2] >= config['AI_RETRIEVAL_ANSWER_COVERAGE']
+            and not is_context_dependent(question, history)):
+        return format_direct_answer(passages[0]), passages
+    return None, passages
+
+def format_direct_answer(quiz):
+    """用题库中的题目组成回答"""
+    parts = [f'题库中有一道相关的题目：\n\n**题目**：{quiz.content.strip()}', f'**答案**：{quiz.answer.strip()}']
+    if quiz.analysis:
+        parts.append(f'**解析**：{quiz.analysis.strip()}')
+    parts.append('如果这不是你想问的问题，可以换个说法继续提问。')
+    return '\n\n'.join(parts)
+
+def reference_cache_prompt(system_prompt, passages):
+    """参与回答缓存键计算的系统提示词：附带参考题目ID，避免不同学生之间共享参考了不同题目的回答"""
+    if not passages:
+        return system_prompt
+    return system_prompt + '\n[reference:' + ','.join(str(quiz.id) for quiz in passages) + ']'
+
+def add_reference_context(messages, passages):
+    """在最后一条用户消息前插入参考题目，返回新的消息列表"""
+    if not passages:
+        return messages
+    limit = current_app.config['AI_RETRIEVAL_PASSAGE_CHARS']
+    lines = [REFERENCE_PROMPT]
+    for number, quiz in enumerate(passages, 1):
+        line = f'[{number}] 题目：{truncate(quiz.content, limit)} 答案：{truncate(quiz.answer, limit)}'
+        if quiz.analysis:
+            line += f' 解析：{truncate(quiz.analysis, limit)}'
+        lines.append(line)
+    return messages[:-1] + [{'role': 'system', 'content': '\n'.join(lines)}, messages[-1]]
+
+def init_quiz_retriever(app):
+    """创建题库检索索引（第一次检索时才从数据库加载）"""
+    app.extensions['quiz_retriever'] = BM25Index(sync_interval=app.config['QUIZ_INDEX_SYNC_INTERVAL'])
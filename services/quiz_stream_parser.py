@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流式出题结果的增量JSON解析
+
+大模型按 {"quizzes": [{...}, {...}]} 格式流式返回题目，解析器逐段接收文本，
+quizzes 数组中的每个题目对象一闭合就单独解析并返回，不必等待整段回复结束。
+某个题目对象格式错误只会丢弃这一道题，不影响前后的题目。
+"""
+
+import json
+
+# 题目数组所在的键
+QUIZ_ARRAY_KEY = 'quizzes'
+
+class QuizStreamParser:
+    """增量提取 quizzes 数组中的题目对象
+
+    也兼容直接返回题目数组（[{...}, {...}]）的情况；数组之外的文字（如 ```json 标记）会被忽略。
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars = []
+        self._last_key = None
+        self._array_depth = None
+        self._object_chars = None
+        self.invalid = 0
+
+    def feed(self, text):
+        """接收一段文本，返回其中新闭合的题目对象列表"""
+        items = []
+        for char in text:
+            item = self._consume(char)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _consume(self, char):
+        if self._object_chars is not None:
+            self._object_chars.append(char)
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._object_chars is None and len(self._stack) == 1:
+                    self._last_key = ''.join(self._string_chars)
+            elif self._object_chars is None:
+                self._string_chars.append(char)
+            return None
+
+        if char == '"':
+            self._in_string = True
+            self._string_chars = []
+        elif char in '{[':
+            if (char == '[' and self._array_depth is None
+                    and (not self._stack or (self._stack == ['{'] and self._last_key == QUIZ_ARRAY_KEY))):
+                self._array_depth = len(self._stack) + 1
+            elif char == '{' and self._array_depth is not None and len(self._stack) == self._array_depth:
+                self._object_chars = [char]
+            self._stack.append(char)
+        elif char in '}]':
+            if self._stack:
+                self._stack.pop()
+            if self._array_depth is not None:
+                if char == '}' and self._object_chars is not None and len(self._stack) == self._array_depth:
+                    return self._finish_object()
+                if char == ']' and len(self._stack) < self._array_depth:
+                    # 题目数组结束，忽略之后的内容
+                    self._array_depth = -1
+        return None
+
+    def _finish_object(self):
+        text = ''.join(self._object_chars)
+        self._object_chars = None
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            self.invalid += 1
+            return None
+        return item
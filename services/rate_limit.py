@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+令牌桶限流
+
+令牌按固定速率补充，最多累积 capacity 个；每次调用消耗一个令牌，
+没有令牌时等待（或由调用方决定拒绝），从而把调用速率限制在 rate 以内，同时允许短时突发。
+
+AI接口的请求限流（RateLimiter / rate_limited）也基于令牌桶：超出限制的请求直接返回429，
+不在慢速的大模型调用后面排队。限流状态可保存在进程内存或SQLite文件中（多进程部署时共享）。
+"""
+
+import os
+import math
+import time
+import uuid
+import sqlite3
+import functools
+import threading
+import contextlib
+from flask import current_app, session, request, jsonify
+
+# 大模型调用名额已满时建议客户端等待的秒数
+IN_FLIGHT_RETRY_AFTER = 1
+
+# 后台任务等待大模型调用名额时的轮询间隔（秒）
+SLOT_POLL_INTERVAL = 0.2
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate, capacity):
+        """rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发数）"""
+        if rate <= 0:
+            raise ValueError('令牌桶的补充速率必须大于0')
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """尝试取令牌，返回 (是否成功, 还需等待的秒数)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True, 0.0
+            return False, (tokens - self._tokens) / self.rate
+
+    def refund(self, tokens=1):
+        """退回令牌（不超过桶容量）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def is_full(self, now=None):
+        """令牌已补满，此时与新建的桶等价"""
+        with self._lock:
+            self._refill(time.monotonic() if now is None else now)
+            return self._tokens >= self.capacity
+
+    def acquire(self, tokens=1, timeout=None):
+        """阻塞等待直到取得令牌，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ok, wait = self.try_acquire(tokens)
+            if ok:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+class RateLimitExceeded(Exception):
+    """请求超出限流，retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class MemoryLimiterStore:
+    """进程内限流状态，适用于单进程部署
+
+    已补满的令牌桶与新建的桶等价，每隔 sweep_interval 秒清理一次，内存占用只与最近活跃的用户数有关。
+    """
+
+    def __init__(self, sweep_interval=60):
+        self.sweep_interval = sweep_interval
+        self._buckets = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _sweep(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_full(now)}
+        self._next_sweep = now + self.sweep_interval
+
+    def try_acquire(self, key, rate, capacity, tokens=1):
+        """从 key 对应的令牌桶取令牌，返回 (是否成功, 还需等待的秒数)"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            # 在锁内取令牌，避免取到刚被清理掉的桶
+            return bucket.try_acquire(tokens)
+
+    def refund(self, key, rate, capacity, tokens=1):
+        """退回令牌；桶已被清理时无需处理（新建的桶是满的）"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.refund(tokens)
+
+    def acquire_slot(self, name, limit, lease_seconds):
+        """占用一个并发名额，已满时返回None，成功时返回释放用的凭据"""
+        with self._lock:
+            if self._in_flight.get(name, 0) >= limit:
+                return None
+            self._in_flight[name] = self._in_flight.get(name, 0) + 1
+            return name
+
+    def release_slot(self, name, lease):
+        with self._lock:
+            self._in_flight[name] -= 1
+
+    def in_flight(self, name):
+        with self._lock:
+            return self._in_flight.get(name, 0)
+
+class SQLiteLimiterStore:
+    """保存在SQLite文件中的限流状态，多个工作进程共享同一份令牌桶和并发名额
+
+    每次操作在 BEGIN IMMEDIATE 事务中完成读-改-写，进程间互斥由SQLite的文件锁保证。
+    并发名额以带过期时间的租约记录，进程异常退出未释放的名额在过期后自动回收。
+    每个令牌桶记录补满的时间 full_at，每隔 sweep_interval 秒删除已补满的桶（与新建的桶等价）。
+    """
+
+    def __init__(self, path, sweep_interval=60):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, '
+                         'full_at REAL NOT NULL DEFAULT 0)')
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(rate_limit_buckets)')}
+            if 'full_at' not in columns:
+                # 旧版本的文件：已有的桶视为已补满，在下一次清理时删除
+                conn.execute('ALTER TABLE rate_limit_buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limit_leases '
+                         '(id TEXT PRIMARY KEY, name TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_leases_name ON rate_limit_leases (name)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        return contextlib.closing(conn)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def try_acquire(self, key, rate, capacity, tokens=1):
+        """从 key 对应的令牌桶取令牌，返回 (是否成功, 还需等待的秒数)"""
+        now = time.time()
+        sweep = time.monotonic() >= self._next_sweep
+        if sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+        with self._transaction() as conn:
+            if sweep:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            row = conn.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            available = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            ok = available >= tokens
+            if ok:
+                available -= tokens
+            conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated, full_at) '
+                         'VALUES (?, ?, ?, ?)', (key, available, now, now + (capacity - available) / rate))
+        return (True, 0.0) if ok else (False, (tokens - available) / rate)
+
+    def refund(self, key, rate, capacity, tokens=1):
+        """退回令牌（不超过桶容量）"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + ?), '
+                         'full_at = updated + (? - MIN(?, tokens + ?)) / ? WHERE key = ?',
+                         (capacity, tokens, capacity, capacity, tokens, rate, key))
+
+    def bucket_count(self):
+        """当前保存的令牌桶数"""
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM rate_limit_buckets').fetchone()[0]
+
+    def acquire_slot(self, name, limit, lease_seconds):
+        """占用一个并发名额，已满时返回None，成功时返回租约ID"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM rate_limit_leases WHERE expires_at < ?', (now,))
+            count = conn.execute('SELECT COUNT(*) FROM rate_limit_leases WHERE name = ?', (name,)).fetchone()[0]
+            if count >= limit:
+                return None
+            lease = uuid.uuid4().hex
+            conn.execute('INSERT INTO rate_limit_leases (id, name, expires_at) VALUES (?, ?, ?)',
+                         (lease, name, now + lease_seconds))
+        return lease
+
+    def release_slot(self, name, lease):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM rate_limit_leases WHERE id = ?', (lease,))
+
+    def in_flight(self, name):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM rate_limit_leases WHERE name = ? AND expires_at >= ?',
+                                (name, time.time())).fetchone()[0]
+
+class RateLimiter:
+    """AI接口限流：每个用户一个令牌桶、每个接口一个全局令牌桶，并限制同时进行中的大模型调用数
+
+    超出限制时立即抛出 RateLimitExceeded，不排队等待。
+    """
+
+    SLOT_NAME = 'llm'
+
+    def __init__(self, store, user_rate, user_burst, endpoint_rate, endpoint_burst, max_in_flight,
+                 lease_seconds=300):
+        """速率单位为每秒令牌数，burst 为桶容量"""
+        self.store = store
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_burst = endpoint_burst
+        self.max_in_flight = max_in_flight
+        self.lease_seconds = lease_seconds
+        self._rejected = {'user': 0, 'endpoint': 0, 'in_flight': 0}
+        self._lock = threading.Lock()
+
+    def _reject(self, reason, message, retry_after):
+        with self._lock:
+            self._rejected[reason] += 1
+        raise RateLimitExceeded(message, retry_after)
+
+    def check(self, endpoint, user_key):
+        """消耗用户和接口的令牌，超出速率时抛出 RateLimitExceeded（被拒绝的请求不消耗令牌）"""
+        user_bucket = f'user:{endpoint}:{user_key}'
+        ok, wait = self.store.try_acquire(user_bucket, self.user_rate, self.user_burst)
+        if not ok:
+            self._reject('user', '请求过于频繁，请稍后再试', wait)
+        ok, wait = self.store.try_acquire(f'endpoint:{endpoint}', self.endpoint_rate, self.endpoint_burst)
+        if not ok:
+            self.store.refund(user_bucket, self.user_rate, self.user_burst)
+            self._reject('endpoint', '当前使用人数较多，请稍后再试', wait)
+
+    def refund(self, endpoint, user_key):
+        """退回 check 消耗的用户和接口令牌"""
+        self.store.refund(f'user:{endpoint}:{user_key}', self.user_rate, self.user_burst)
+        self.store.refund(f'endpoint:{endpoint}', self.endpoint_rate, self.endpoint_burst)
+
+    def admit(self, endpoint, user_key, llm=True):
+        """检查速率并占用大模型调用名额，返回释放函数（llm 为假时返回None）
+
+        名额已满被拒绝时退回已消耗的令牌，请求在名额紧张时重试不会被额外计入速率限制。
+        """
+        self.check(endpoint, user_key)
+        if not llm:
+            return None
+        try:
+            return self.acquire_slot()
+        except RateLimitExceeded:
+            self.refund(endpoint, user_key)
+            raise
+
+    def acquire_slot(self):
+        """占用一个大模型调用名额，返回释放函数；名额已满时抛出 RateLimitExceeded"""
+        lease = self.store.acquire_slot(self.SLOT_NAME, self.max_in_flight, self.lease_seconds)
+        if lease is None:
+            self._reject('in_flight', 'AI服务繁忙，请稍后再试', IN_FLIGHT_RETRY_AFTER)
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self.store.release_slot(self.SLOT_NAME, lease)
+        return release
+
+    @contextlib.contextmanager
+    def hold_slot(self, timeout=None):
+        """后台任务调用大模型时使用：等待直到占到一个名额，退出时释放
+
+        后台任务不能像接口请求那样直接返回429，因此轮询等待；超过 timeout 秒仍未占到时抛出 RateLimitExceeded。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            lease = self.store.acquire_slot(self.SLOT_NAME, self.max_in_flight, self.lease_seconds)
+            if lease is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                self._reject('in_flight', 'AI服务繁忙，请稍后再试', IN_FLIGHT_RETRY_AFTER)
+            time.sleep(SLOT_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            self.store.release_slot(self.SLOT_NAME, lease)
+
+    def stats(self):
+        """被拒绝的请求数和进行中的大模型调用数"""
+        with self._lock:
+            rejected = dict(self._rejected)
+        return {
+            'rejected': rejected,
+            'in_flight': self.store.in_flight(self.SLOT_NAME),
+            'max_in_flight': self.max_in_flight
+        }
+
+def get_rate_limiter():
+    """获取当前应用的限流器"""
+    return current_app.extensions['rate_limiter']
+
+def current_user_key():
+    """限流使用的用户标识：优先学生和老师的登录账号，未登录时使用客户端IP"""
+    if session.get('student_id'):
+        return f"student:{session['student_id']}"
+    if session.get('teacher_id'):
+        return f"teacher:{session['teacher_id']}"
+    return f'ip:{request.remote_addr}'
+
+def background_llm_slot():
+    """后台任务占用大模型调用名额的上下文管理器工厂
+
+    需要在应用上下文中调用，返回的函数可以在任务的工作线程中使用；未启用限流时不占用名额。
+    """
+    if not current_app.config['RATE_LIMIT_ENABLED']:
+        return contextlib.nullcontext
+    return get_rate_limiter().hold_slot
+
+def rate_limited(endpoint, llm=True):
+    """AI接口限流装饰器
+
+    只对POST请求生效（页面的GET请求不调用大模型）。超出限制时直接返回429和 Retry-After；
+    llm=True 时请求处理期间占用一个大模型调用名额，流式响应在输出结束（或客户端断开）后才释放。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'POST' or not current_app.config['RATE_LIMIT_ENABLED']:
+                return view(*args, **kwargs)
+            limiter = get_rate_limiter()
+            try:
+                release = limiter.admit(endpoint, current_user_key(), llm)
+            except RateLimitExceeded as e:
+                response = jsonify({'success': False, 'error': str(e), 'retry_after': math.ceil(e.retry_after)})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+                return response
+            if release is None:
+                return view(*args, **kwargs)
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                release()
+                raise
+            response.call_on_close(release)
+            return response
+        return wrapper
+    return decorator
+
+def init_rate_limiter(app):
+    """根据配置创建限流器，RATE_LIMIT_STORAGE=sqlite 时多个工作进程共享限流状态"""
+    if app.config['RATE_LIMIT_STORAGE'] == 'sqlite':
+        path = app.config['RATE_LIMIT_SQLITE_PATH'] or os.path.join(app.instance_path, 'rate_limit.db')
+        store = SQLiteLimiterStore(path)
+    else:
+        store = MemoryLimiterStore()
+    app.extensions['rate_limiter'] = RateLimiter(
+        store,
+        user_rate=app.config['AI_USER_RATE_PER_MINUTE'] / 60,
+        user_burst=app.config['AI_USER_BURST'],
+        endpoint_rate=app.config['AI_ENDPOINT_RATE_PER_MINUTE'] / 60,
+        endpoint_burst=app.config['AI_ENDPOINT_BURST'],
+        max_in_flight=app.config['AI_MAX_IN_FLIGHT'],
+        lease_seconds=app.config['AI_IN_FLIGHT_LEASE_SECONDS']
+    )
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Server-Sent Events 工具函数
+"""
+
+import json
+from flask import Response, stream_with_context
+
+def format_sse(data, event=None):
+    """将数据编码为一条SSE消息（data为可JSON序列化的对象）"""
+    message = ''
+    if event:
+        message += f'event: {event}\n'
+    message += f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    return message
+
+def sse_response(generator):
+    """把产出SSE消息的生成器包装为流式响应
+
+    客户端断开时WSGI服务器会关闭生成器，生成器中的 finally 可以借此中断上游调用。
+    """
+    response = Response(stream_with_context(generator), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止反向代理（如nginx）缓冲，保证逐条推送
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+学生学习情况AI分析
+
+单个学生的分析由老师在学生详情页触发；全班批量分析作为后台任务执行：
+一次性预取所有学生的考试和答题记录，在有限并发下调用大模型，并用令牌桶限制调用速率，
+每生成一份报告立即保存。学生数据没有变化时直接沿用已保存的报告。
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from models.exam_record import ExamRecord
+from models.answer import Answer
+from models.student_analysis_report import StudentAnalysisReport
+from services.llm_gateway import get_llm_gateway
+from services.rate_limit import TokenBucket, background_llm_slot
+
+logger = logging.getLogger(__name__)
+
+def prepare_ai_analysis_prompt(student_id, exam_records, all_answers):
+    """准备AI分析的提示词"""
+    # 统计数据
+    total_exams = len(exam_records)
+    total_score = sum(record.total_score for record in exam_records)
+    total_max_score = sum(record.max_score for record in exam_records)
+    success_rate = (total_score / total_max_score * 100) if total_max_score > 0 else 0
+    
+    # 错误答案分析
+    wrong_answers = [answer for answer in all_answers if not answer.is_correct]
+    error_rate = (len(wrong_answers) / len(all_answers) * 100) if all_answers else 0
+    
+    # 考试表现趋势
+    recent_records = sorted(exam_records, key=lambda x: x.submit_time)[-5:]  # 最近5次考试
+    trends = []
+    for record in recent_records:
+        rate = (record.total_score / record.max_score * 100) if record.max_score > 0 else 0
+        trends.append(f"{record.submit_time.strftime('%m-%d')}: {rate:.1f}%")
+    
+    prompt = f"""请分析学生ID为{student_id}的学习情况，并提供专业的学习建议。
+
+学生基本数据：
+- 总考试次数：{total_exams}次
+- 总体正确率：{success_rate:.1f}%
+- 错误率：{error_rate:.1f}%
+- 平均分：{total_score/total_exams if total_exams > 0 else 0:.1f}分
+
+最近考试表现趋势：
+{', '.join(trends)}
+
+请从以下几个方面进行分析：
+1. 学习表现总体评价
+2. 强项和弱项分析
+3. 学习趋势分析（是否有进步或退步）
+4. 具体学习建议和改进方向
+5. 老师关注重点
+
+请用专业、客观、建设性的语言进行分析，字数控制在500字以内。"""
+
+    return prompt
+
+def call_ai_for_analysis(prompt):
+    """调用AI生成分析报告"""
+    try:
+        return get_llm_gateway().chat(
+            name='student_analysis',
+            messages=[
+                {
+                    "role": "system",
+                    "content": "你是一位专业的教育分析师，擅长根据学生的学习数据进行深入分析并提供有价值的教学建议。请用专业、客观、建设性的语言进行分析。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=800,
+            temperature=0.7
+        )
+        
+    except Exception as e:
+        logger.error(f"AI分析调用失败: {str(e)}")
+        raise e
+
+def generate_mock_analysis(student_id, exam_records):
+    """生成模拟分析报告（演示模式）"""
+    total_exams = len(exam_records)
+    avg_score = sum(record.total_score for record in exam_records) / total_exams if total_exams > 0 else 0
+    
+    return f"""**学习表现分析报告**（演示模式）
+
+**总体评价：**
+学生{student_id}共参加了{total_exams}次考试，平均分为{avg_score:.1f}分。从整体表现来看，该学生学习态度较为积极，参与度较高。
+
+**强项分析：**
+- 考试参与度高，说明学习积极性较好
+- 持续性学习表现良好
+
+**改进建议：**
+1. 建议针对错误较多的题型进行专项练习
+2. 加强基础概念的理解和掌握
+3. 定期复习已学知识，形成知识体系
+4. 可以尝试做更多的综合性练习题
+
+**老师关注重点：**
+- 关注学生的学习方法是否得当
+- 及时反馈和鼓励，保持学习积极性
+- 个性化辅导，针对薄弱环节加强指导
+
+*注：当前为演示模式，配置DEEPSEEK_API_KEY后可获得更详细的AI分析报告。*"""
+
+def prefetch_student_data(student_ids):
+    """一次查询取出多个学生的考试记录和答题记录，按学生分组（与单个学生查询的排序一致）"""
+    exam_records = defaultdict(list)
+    answers = defaultdict(list)
+    for record in ExamRecord.query.filter(ExamRecord.student_id.in_(student_ids)).order_by(ExamRecord.submit_time.desc()):
+        exam_records[record.student_id].append(record)
+    for answer in Answer.query.filter(Answer.student_id.in_(student_ids)).order_by(Answer.answered_at.desc()):
+        answers[answer.student_id].append(answer)
+    return exam_records, answers
+
+def run_batch_analysis_job(job, student_ids, refresh, model_name, concurrency, rate_per_minute):
+    """批量生成学生分析报告的后台任务
+
+    已有有效报告的学生直接跳过（refresh 为真时全部重新生成），每份报告生成后立即保存并更新进度。
+    """
+    result = {'generated': [], 'cached': [], 'no_records': [], 'failed': {}}
+    completed = 0
+
+    def report_progress():
+        job.update(
+            completed=completed,
+            message=f"已完成 {completed}/{len(student_ids)} 名学生（新生成 {len(result['generated'])}，"
+                    f"沿用 {len(result['cached'])}，失败 {len(result['failed'])}）",
+            result=result
+        )
+
+    # 指纹由预取的记录计算，已保存报告的指纹一次查出，不再逐个学生查询
+    exam_records, answers = prefetch_student_data(student_ids)
+    saved_fingerprints = {} if refresh else StudentAnalysisReport.get_fingerprints(student_ids)
+    pending = {}
+    for student_id in student_ids:
+        fingerprint = StudentAnalysisReport.compute_fingerprint_from_records(
+            exam_records[student_id], answers[student_id], model_name
+        )
+        if fingerprint is None:
+            result['no_records'].append(student_id)
+            completed += 1
+        elif saved_fingerprints.get(student_id) == fingerprint:
+            result['cached'].append(student_id)
+            completed += 1
+        else:
+            prompt = prepare_ai_analysis_prompt(student_id, exam_records[student_id], answers[student_id])
+            pending[student_id] = (fingerprint, prompt)
+    report_progress()
+    if not pending:
+        return
+
+    # 突发量等于并发数，之后按 rate_per_minute 匀速放行
+    bucket = TokenBucket(rate=rate_per_minute / 60.0, capacity=max(1, concurrency))
+
+    # 与接口请求共用大模型调用名额（AI_MAX_IN_FLIGHT）
+    slot = background_llm_slot()
+
+    def analyze(prompt):
+        bucket.acquire()
+        with slot():
+            return call_ai_for_analysis(prompt)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch-analysis') as executor:
+        futures = {
+            executor.submit(analyze, prompt): student_id
+            for student_id, (_, prompt) in pending.items()
+        }
+        for future in as_completed(futures):
+            student_id = futures[future]
+            try:
+                report = future.result()
+                if not report:
+                    raise ValueError('AI返回内容为空')
+                StudentAnalysisReport.save_report(student_id, pending[student_id][0], report)
+                result['generated'].append(student_id)
+            except Exception as e:
+                result['failed'][student_id] = str(e)
+            completed += 1
+            report_progress()
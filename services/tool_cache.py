@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具HTML内容缓存
+"""
+
+import os
+import gzip
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import make_response, current_app
+from services.http_cache import brotli, etag_matches, choose_encoding, ENCODING_ETAG_SUFFIX
+
+class ToolCacheEntry:
+    """缓存条目：原始内容及其预压缩版本"""
+
+    def __init__(self, mtime_ns, size, body, compress_min_size, compress_level):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.checked_at = time.monotonic()
+        self.variants = {}
+        if len(body) >= compress_min_size:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=compress_level)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=min(compress_level, 11))
+
+    @property
+    def nbytes(self):
+        """条目占用的字节数（含压缩版本）"""
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+class ToolContentCache:
+    """按字节数限制容量的LRU缓存，通过文件mtime和大小判断是否失效"""
+
+    def __init__(self, max_bytes, max_entry_bytes, revalidate_seconds,
+                 compress_min_size=1024, compress_level=6):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.compress_min_size = compress_min_size
+        self.compress_level = compress_level
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path):
+        """获取文件内容，必要时从磁盘加载"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry and now - entry.checked_at < self.revalidate_seconds:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return entry
+
+        # 超过重新验证间隔：只做一次stat，文件未变化时继续使用缓存
+        stat = os.stat(file_path)
+        if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            with self._lock:
+                entry.checked_at = now
+                if file_path in self._entries:
+                    self._entries.move_to_end(file_path)
+                self.hits += 1
+            return entry
+
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        entry = ToolCacheEntry(stat.st_mtime_ns, stat.st_size, body,
+                               self.compress_min_size, self.compress_level)
+        with self._lock:
+            self.misses += 1
+            self._remove(file_path)
+            if entry.nbytes <= self.max_entry_bytes:
+                self._entries[file_path] = entry
+                self._total_bytes += entry.nbytes
+                while self._total_bytes > self.max_bytes and self._entries:
+                    oldest = next(iter(self._entries))
+                    self._remove(oldest)
+        return entry
+
+    def invalidate(self, file_path):
+        """移除指定文件的缓存"""
+        with self._lock:
+            self._remove(file_path)
+
+    def _remove(self, file_path):
+        entry = self._entries.pop(file_path, None)
+        if entry:
+            self._total_bytes -= entry.nbytes
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+def get_tool_cache():
+    """获取当前应用的工具内容缓存"""
+    return current_app.extensions['tool_cache']
+
+def tool_content_response(file_path):
+    """返回工具HTML内容，支持ETag/304并直接使用预压缩版本"""
+    entry = get_tool_cache().get(file_path)
+    encoding = choose_encoding() if entry.variants else None
+    etag = entry.etag + ENCODING_ETAG_SUFFIX[encoding] if encoding in entry.variants else entry.etag
+
+    if etag_matches(entry.etag):
+        response = make_response('', 304)
+    elif encoding in entry.variants:
+        response = make_response(entry.variants[encoding])
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = make_response(entry.body)
+
+    response.mimetype = 'text/html'
+    response.set_etag(etag)
+    if entry.variants:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def init_tool_cache(app):
+    """根据配置创建工具内容缓存"""
+    app.extensions['tool_cache'] = ToolContentCache(
+        max_bytes=app.config['TOOL_CACHE_MAX_BYTES'],
+        max_entry_bytes=app.config['TOOL_CACHE_MAX_ENTRY_BYTES'],
+        revalidate_seconds=app.config['TOOL_CACHE_REVALIDATE_SECONDS'],
+        compress_min_size=app.config['HTTP_COMPRESS_MIN_SIZE'],
+        compress_level=app.config['HTTP_COMPRESS_LEVEL']
+    )
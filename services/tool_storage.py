@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具文件的内容寻址存储
+
+上传文件按块流式写入临时文件并同时计算SHA-256，最终以内容哈希命名。
+相同内容只保存一份，多个工具记录通过 file_path 共享同一文件，
+删除时只有在没有任何工具引用该文件后才真正删除；复用文件和删除文件由存储锁互斥。
+"""
+
+import os
+import uuid
+import hashlib
+import threading
+import contextlib
+from models import db
+from models.tool import Tool
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 flock，只在进程内互斥
+    fcntl = None
+
+# 存储目录中的锁文件
+LOCK_FILE_NAME = '.storage.lock'
+
+_thread_lock = threading.Lock()
+
+def hash_file(file_path, chunk_size=64 * 1024):
+    """计算已有文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@contextlib.contextmanager
+def storage_lock(folder):
+    """工具文件的登记/释放锁
+
+    复用文件、写入工具记录与检查引用、删除文件必须互斥，否则删除时可能删掉刚被新工具复用的文件。
+    同一进程内用线程锁，多个工作进程之间用 flock（不支持 flock 的平台只在进程内互斥）。
+    """
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(folder, LOCK_FILE_NAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def store_upload(file_storage, folder, extension, chunk_size=64 * 1024):
+    """流式保存上传文件，with 语句中得到 (文件路径, 内容哈希, 文件大小)
+
+    已存在相同内容的文件时复用原文件，不再重复保存。调用方在 with 语句中写入工具记录，
+    整个过程持有存储锁；退出时（包括写入失败或中途放弃）文件没有被任何工具引用则删除。
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = os.path.join(folder, f'.upload-{uuid.uuid4().hex}.tmp')
+    try:
+        with open(temp_path, 'wb') as out:
+            for chunk in iter(lambda: file_storage.stream.read(chunk_size), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        content_hash = digest.hexdigest()
+
+        with storage_lock(folder):
+            # 优先复用数据库中已登记的同内容文件（包括按旧规则命名的文件）
+            existing = Tool.get_tool_by_content_hash(content_hash)
+            if existing and os.path.exists(existing.file_path):
+                file_path = existing.file_path
+            else:
+                file_path = os.path.join(folder, f'{content_hash}.{extension}')
+                if not os.path.exists(file_path):
+                    os.replace(temp_path, file_path)
+            try:
+                yield file_path, content_hash, size
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                _release_unlocked(file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _release_unlocked(file_path):
+    if Tool.count_file_references(file_path) > 0:
+        return False
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    return True
+
+def release_file(file_path):
+    """工具记录删除后调用：文件不再被任何工具引用时删除文件，返回是否删除"""
+    with storage_lock(os.path.dirname(file_path)):
+        return _release_unlocked(file_path)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具浏览次数合并写入
+
+每次打开工具只在内存中累加计数，由后台线程定期用一次批量UPDATE写入数据库，
+避免每次点击都占用SQLite写锁。进程正常退出时会写入剩余计数。
+"""
+
+import atexit
+import threading
+from collections import Counter
+from flask import current_app
+from models import db
+
+class ViewCounter:
+    """浏览次数缓冲区"""
+
+    def __init__(self, app, flush_interval, max_pending):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def increment(self, tool_id, count=1):
+        """累加浏览次数（不写数据库）"""
+        with self._lock:
+            self._pending[tool_id] += count
+            total = sum(self._pending.values())
+        if total >= self.max_pending:
+            self._wakeup.set()
+
+    def get_pending(self, tool_id):
+        """获取尚未写入数据库的浏览次数"""
+        with self._lock:
+            return self._pending.get(tool_id, 0)
+
+    def flush(self):
+        """将缓冲的浏览次数批量写入数据库，返回写入的工具数"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        params = [{'tool_id': tool_id, 'count': count} for tool_id, count in pending.items()]
+        try:
+            with self.app.app_context():
+                db.session.execute(
+                    db.text('UPDATE tools SET views = COALESCE(views, 0) + :count WHERE id = :tool_id'),
+                    params
+                )
+                db.session.commit()
+        except Exception as e:
+            # 写入失败时放回缓冲区，等待下次重试
+            with self._lock:
+                self._pending.update(pending)
+            self.app.logger.error(f"浏览次数写入失败: {str(e)}")
+            return 0
+        return len(params)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        """启动后台写入线程，并在进程退出时写入剩余计数"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+def get_view_counter():
+    """获取当前应用的浏览次数缓冲区"""
+    return current_app.extensions['view_counter']
+
+def init_view_counter(app):
+    """根据配置创建浏览次数缓冲区并启动后台写入"""
+    counter = ViewCounter(
+        app,
+        flush_interval=app.config['TOOL_VIEWS_FLUSH_SECONDS'],
+        max_pending=app.config['TOOL_VIEWS_MAX_PENDING']
+    )
+    app.extensions['view_counter'] = counter
+    counter.start()
+    return counter
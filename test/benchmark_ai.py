@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI接口压测脚本（使用本地模拟大模型服务，不访问外网）
+
+在临时数据库上启动应用，按不同并发数请求AI相关接口，统计吞吐量、延迟分位数和工作线程占用。
+工作线程占用 = 同时在处理中的请求数（包括流式响应输出期间），平均值按时间加权。
+
+运行方式（在项目根目录）：
+    PYTHONPATH=. python test/benchmark_ai.py --concurrency 1 4 16 --latency-ms 800 --latency-sigma 0.5
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_llm_server import MockLLMServer, LatencyModel
+
+class OccupancyMiddleware:
+    """统计同时处理中的请求数，响应体输出完毕才算请求结束"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.busy = getattr(self, 'busy', 0)
+            self.peak = self.busy
+            self.busy_seconds = 0.0
+            self.updated = time.monotonic()
+
+    def _change(self, delta):
+        with self.lock:
+            now = time.monotonic()
+            self.busy_seconds += self.busy * (now - self.updated)
+            self.updated = now
+            self.busy += delta
+            self.peak = max(self.peak, self.busy)
+
+    def snapshot(self):
+        self._change(0)
+        with self.lock:
+            return self.busy_seconds, self.peak
+
+    def __call__(self, environ, start_response):
+        self._change(1)
+        try:
+            body = self.app(environ, start_response)
+        except Exception:
+            self._change(-1)
+            raise
+        return self._wrap(body)
+
+    def _wrap(self, body):
+        try:
+            for chunk in body:
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self._change(-1)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def login(client, base, role, user_id):
+    client.post(f'{base}/{role}/login', data={'username': user_id, 'password': 'x'})
+
+def run_scenario(base, middleware, scenario, concurrency, requests_per_worker):
+    """按指定并发执行一个场景，返回统计结果"""
+    import httpx
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def worker(index):
+        with httpx.Client(timeout=120) as client:
+            scenario['login'](client, base, index)
+            for i in range(requests_per_worker):
+                start = time.monotonic()
+                try:
+                    ok = scenario['request'](client, base, index, i)
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.monotonic() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if not ok:
+                        failures.append(elapsed)
+
+    middleware.reset()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    wall = time.monotonic() - started
+    busy_seconds, peak = middleware.snapshot()
+    return {
+        'requests': len(latencies),
+        'errors': len(failures),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'avg_busy': busy_seconds / wall if wall else 0.0,
+        'peak_busy': peak,
+    }
+
+def build_scenarios(args):
+    """各AI接口的请求方式，返回False表示响应不符合预期"""
+    def student_login(client, base, index):
+        login(client, base, 'student', f'bench{index}')
+
+    def teacher_login(client, base, index):
+        login(client, base, 'teacher', f'teacher{index}')
+
+    def ai_chat(client, base, index, i):
+        resp = client.post(f'{base}/student/ai_chat', json={'message': f'问题{index}-{i}', 'no_cache': True})
+        return resp.status_code == 200 and resp.json().get('success', False)
+
+    def ai_chat_stream(client, base, index, i):
+        with client.stream('POST', f'{base}/student/ai_chat_stream',
+                           json={'message': f'问题{index}-{i}', 'no_cache': True}) as resp:
+            for _ in resp.iter_bytes():
+                pass
+            return resp.status_code == 200
+
+    def smart_quiz(client, base, index, i):
+        resp = client.post(f'{base}/teacher/smart-quiz', data={
+            'subject': '数学', 'grade': '初一', 'question_type': '选择题',
+            'num_questions': str(args.quiz_questions), 'knowledge_points': f'有理数{index}-{i}'
+        })
+        return resp.status_code in (200, 302)
+
+    def student_analysis(client, base, index, i):
+        resp = client.post(f'{base}/teacher/api/generate_student_analysis',
+                           json={'student_id': f'bench{index % args.students}', 'refresh': True})
+        return resp.status_code == 200 and resp.json().get('success', False)
+
+    return {
+        'ai_chat': {'login': student_login, 'request': ai_chat},
+        'ai_chat_stream': {'login': student_login, 'request': ai_chat_stream},
+        'smart_quiz': {'login': teacher_login, 'request': smart_quiz},
+        'student_analysis': {'login': teacher_login, 'request': student_analysis},
+    }
+
+def seed_exam_records(app, students):
+    """为学情分析场景准备考试记录"""
+    from models.paper import Paper
+    from models.exam_record import ExamRecord
+    with app.app_context():
+        paper = Paper.add_paper('压测试卷', status='published')
+        for index in range(students):
+            ExamRecord.add_exam_record(f'bench{index}', paper.id, 10, 10, 7, 70, 100)
+
+def main():
+    parser = argparse.ArgumentParser(description='AI接口压测')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=4, help='每个并发客户端发送的请求数')
+    parser.add_argument('--scenarios', nargs='+', default=['ai_chat', 'ai_chat_stream', 'smart_quiz', 'student_analysis'])
+    parser.add_argument('--latency-ms', type=float, default=500, help='模拟服务延迟中位数（毫秒）')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='模拟服务延迟的对数正态sigma')
+    parser.add_argument('--token-interval-ms', type=float, default=20, help='流式数据块间隔（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务错误率')
+    parser.add_argument('--quiz-questions', type=int, default=5, help='智能出题场景每次生成的题目数')
+    parser.add_argument('--students', type=int, default=8, help='学情分析场景的学生数')
+    args = parser.parse_args()
+
+    mock = MockLLMServer(latency=LatencyModel(args.latency_ms, args.latency_sigma),
+                         token_interval_ms=args.token_interval_ms, error_rate=args.error_rate)
+    mock.start()
+
+    # 配置在导入应用前通过环境变量设置
+    db_dir = tempfile.mkdtemp(prefix='quiz-bench-')
+    os.environ.update({
+        'DEEPSEEK_API_KEY': 'benchmark',
+        'DEEPSEEK_BASE_URL': mock.base_url,
+        'DATABASE_URL': f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+        'AI_CACHE_ENABLED': 'false',
+        'RATE_LIMIT_ENABLED': 'false',
+    })
+    from werkzeug.serving import make_server
+    from app import app
+
+    seed_exam_records(app, args.students)
+    middleware = OccupancyMiddleware(app.wsgi_app)
+    app.wsgi_app = middleware
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    print(f'模拟服务: {mock.base_url}  延迟中位数 {args.latency_ms}ms sigma {args.latency_sigma}  错误率 {args.error_rate}')
+    header = f"{'场景':<18}{'并发':>4}{'请求':>6}{'失败':>6}{'吞吐/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'平均占用':>10}{'峰值占用':>10}{'LLM峰值':>9}"
+    print(header)
+    scenarios = build_scenarios(args)
+    try:
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                mock.reset_stats()
+                result = run_scenario(base, middleware, scenarios[name], concurrency, args.requests)
+                print(f"{name:<18}{concurrency:>4}{result['requests']:>6}{result['errors']:>6}"
+                      f"{result['throughput']:>9.2f}{result['p50']:>8.2f}{result['p95']:>8.2f}{result['p99']:>8.2f}"
+                      f"{result['avg_busy']:>10.2f}{result['peak_busy']:>10}{mock.stats()['peak_in_flight']:>9}")
+    finally:
+        server.shutdown()
+        mock.stop()
+
+if __name__ == '__main__':
+    main()
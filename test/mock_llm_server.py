@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟大模型服务（OpenAI兼容的 /v1/chat/completions 接口，支持流式输出）
+
+用于在没有外网的环境下测试和压测AI相关功能，可以配置响应延迟分布、错误率和固定回复。
+默认回复会根据请求内容生成：出题请求返回所要求数量的题目JSON，学情分析请求返回分析报告，
+其余返回普通聊天回复。
+
+单独运行（然后把 DEEPSEEK_BASE_URL 指向它）：
+    python test/mock_llm_server.py --port 8001 --latency-ms 800 --latency-sigma 0.5 --error-rate 0.05
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def default_responder(payload):
+    """根据请求内容生成固定格式的回复文本"""
+    messages = payload.get('messages') or []
+    system = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+    prompt = messages[-1].get('content', '') if messages else ''
+    if '出题' in system:
+        match = re.search(r'请生成(\d+)道', prompt)
+        count = int(match.group(1)) if match else 1
+        seed = random.randrange(1_000_000)
+        quizzes = [
+            {
+                'id': i + 1,
+                'content': f'模拟题目{seed}-{i + 1}：下列说法正确的是？A. 选项一 B. 选项二 C. 选项三 D. 选项四',
+                'answer': random.choice('ABCD'),
+                'analysis': '这是模拟服务生成的答案解析。'
+            }
+            for i in range(count)
+        ]
+        return json.dumps({'quizzes': quizzes}, ensure_ascii=False)
+    if '教育分析师' in system:
+        return '**学习表现分析报告**（模拟）\n\n总体表现稳定，建议针对错题进行专项练习。'
+    return f'这是模拟回复：{prompt[:50]}'
+
+class LatencyModel:
+    """响应延迟分布：median_ms 为中位数，sigma 为对数正态分布的离散程度（0 表示固定延迟）"""
+
+    def __init__(self, median_ms=0, sigma=0.0, max_ms=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.max_ms = max_ms
+
+    def sample(self):
+        """返回一次请求的延迟（秒）"""
+        if self.median_ms <= 0:
+            return 0.0
+        value = self.median_ms * (random.lognormvariate(0, self.sigma) if self.sigma > 0 else 1)
+        if self.max_ms is not None:
+            value = min(value, self.max_ms)
+        return value / 1000
+
+class MockLLMServer:
+    """可在测试中启动的模拟大模型服务
+
+    - latency: 非流式请求的整体延迟，流式请求的首token延迟
+    - token_interval_ms: 流式输出相邻两个数据块之间的间隔
+    - error_rate: 随机返回 error_status 错误的比例
+    - fail_times: 前 N 次请求固定失败（用于测试重试和熔断）
+    - responder: 根据请求体返回回复文本的函数，默认 default_responder
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, token_interval_ms=0, chunk_chars=8,
+                 error_rate=0.0, error_status=500, fail_times=0, responder=None):
+        self.latency = latency or LatencyModel()
+        self.token_interval_ms = token_interval_ms
+        self.chunk_chars = chunk_chars
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_times = fail_times
+        self.responder = responder or default_responder
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.peak_in_flight = self.in_flight
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'errors': self.errors, 'peak_in_flight': self.peak_in_flight}
+
+    def start(self):
+        """在后台线程中启动服务，返回 base_url"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-llm', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _begin(self):
+        """登记一次请求，返回是否应当返回错误"""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            fail = self.calls <= self.fail_times or random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return fail
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                fail = server._begin()
+                try:
+                    time.sleep(server.latency.sample())
+                    if fail:
+                        self._send_json(server.error_status, {'error': {'message': 'mock failure'}})
+                    elif payload.get('stream'):
+                        self._send_stream(payload)
+                    else:
+                        self._send_completion(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端提前断开（如取消流式请求）
+                    pass
+                finally:
+                    server._end()
+
+            def _send_json(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_completion(self, payload):
+                text = server.responder(payload)
+                self._send_json(200, {
+                    'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': payload.get('model', 'mock'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': text}}],
+                    'usage': usage_for(payload, text)
+                })
+
+            def _send_stream(self, payload):
+                text = server.responder(payload)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for start in range(0, len(text), server.chunk_chars):
+                    if start and server.token_interval_ms:
+                        time.sleep(server.token_interval_ms / 1000)
+                    self._send_event({'choices': [{'index': 0, 'finish_reason': None,
+                                                   'delta': {'content': text[start:start + server.chunk_chars]}}]})
+                self._send_event({'choices': [{'index': 0, 'finish_reason': 'stop', 'delta': {}}]})
+                if (payload.get('stream_options') or {}).get('include_usage'):
+                    self._send_event({'choices': [], 'usage': usage_for(payload, text)})
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _send_event(self, body):
+                body.update({'id': 'mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                             'model': 'mock'})
+                self.wfile.write(f'data: {json.dumps(body, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def usage_for(payload, text):
+    """粗略估算token用量"""
+    prompt_chars = sum(len(m.get('content') or '') for m in payload.get('messages') or [])
+    return {'prompt_tokens': prompt_chars, 'completion_tokens': len(text), 'total_tokens': prompt_chars + len(text)}
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟大模型服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=500, help='响应延迟中位数（毫秒）')
+    parser.add_argument('--latency-sigma', type=float, default=0.0, help='对数正态分布的sigma，0为固定延迟')
+    parser.add_argument('--token-interval-ms', type=float, default=20, help='流式输出的数据块间隔（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回错误的比例')
+    parser.add_argument('--error-status', type=int, default=500)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        host=args.host, port=args.port,
+        latency=LatencyModel(args.latency_ms, args.latency_sigma),
+        token_interval_ms=args.token_interval_ms,
+        error_rate=args.error_rate, error_status=args.error_status
+    )
+    print(f'模拟大模型服务已启动: {server.base_url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
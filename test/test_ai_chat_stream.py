@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI聊天流式接口测试脚本（使用本地模拟大模型服务，不访问外网）
+"""
+
+import os
+import json
+import time
+import uuid
+from app import app
+from config import Config
+from models import db
+from models.conversation import Conversation, ConversationMessage
+from services import llm_gateway
+from services.llm_gateway import LLMGateway
+from services.rate_limit import get_rate_limiter
+from mock_llm_server import MockLLMServer
+
+REPLY = '这是模拟的流式回复，用于检查SSE事件的分段和结束事件。'
+
+def parse_events(body):
+    """把SSE响应体解析为 [(事件名, 数据)]，默认事件名为None"""
+    assert body.endswith('\n\n'), body
+    events = []
+    for block in body.split('\n\n')[:-1]:
+        event = None
+        data = None
+        for line in block.split('\n'):
+            field, _, value = line.partition(': ')
+            if field == 'event':
+                event = value
+            else:
+                assert field == 'data', line
+                data = json.loads(value)
+        events.append((event, data))
+    return events
+
+def test_ai_chat_stream():
+    """测试事件格式、done/error事件以及客户端断开时停止生成且不保存回复"""
+    print("=== AI聊天流式接口测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    server = MockLLMServer(chunk_chars=5, responder=lambda payload: REPLY)
+    server.start()
+    original = (Config.DEEPSEEK_API_KEY, llm_gateway._gateway, llm_gateway._gateway_pid)
+    Config.DEEPSEEK_API_KEY = 'test'
+    llm_gateway._gateway = LLMGateway(api_key='test', base_url=server.base_url, max_retries=0,
+                                      breaker_threshold=100, breaker_cooldown=1)
+    llm_gateway._gateway_pid = os.getpid()
+    client = app.test_client()
+
+    def post(index, **kwargs):
+        with client.session_transaction() as sess:
+            sess['student_id'] = f'{marker}-{index}'
+        return client.post('/student/ai_chat_stream',
+                           json={'message': f'{marker} 流式问题{index}', 'no_cache': True}, **kwargs)
+
+    def saved_messages(student_id):
+        return ConversationMessage.query.join(Conversation).filter(Conversation.student_id == student_id).count()
+
+    with app.app_context():
+        try:
+            # 1. 每条消息以空行结束，文本片段按顺序推送，最后是带完整回复的done事件
+            response = post(1)
+            assert response.mimetype == 'text/event-stream'
+            assert response.headers['Cache-Control'] == 'no-cache' and response.headers['X-Accel-Buffering'] == 'no'
+            events = parse_events(response.get_data(as_text=True))
+            # WSGI服务器在输出完毕后调用close()，限流名额在此时释放
+            response.close()
+            print(f"   事件数: {len(events)}")
+            deltas = [data['delta'] for event, data in events[:-1]]
+            assert all(event is None for event, _ in events[:-1]) and len(deltas) > 1
+            assert ''.join(deltas) == REPLY
+            event, done = events[-1]
+            assert event == 'done' and done['response'] == REPLY and done['cached'] is False
+            conversation = Conversation.get_student_conversation(f'{marker}-1', done['conversation_id'])
+            assert conversation and saved_messages(f'{marker}-1') == 2
+
+            # 2. 上游出错时推送error事件，不推送done，也不保存本轮问答
+            server.fail_times = server.calls + 1
+            response = post(2)
+            events = parse_events(response.get_data(as_text=True))
+            response.close()
+            print(f"   错误事件: {events}")
+            assert [event for event, _ in events] == ['error'] and 'AI服务暂时不可用' in events[0][1]['error']
+            assert saved_messages(f'{marker}-2') == 0
+
+            # 3. 客户端中途断开：关闭上游连接、释放调用名额，不保存不完整的回复
+            server.fail_times = 0
+            server.token_interval_ms = 100
+            response = post(3, buffered=False)
+            first = next(response.response)
+            assert json.loads(first.split(b'data: ', 1)[1])['delta'] == REPLY[:5]
+            response.close()
+            deadline = time.monotonic() + 5
+            while server.in_flight and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert server.in_flight == 0
+            assert get_rate_limiter().stats()['in_flight'] == 0
+            assert saved_messages(f'{marker}-3') == 0
+        finally:
+            Config.DEEPSEEK_API_KEY, llm_gateway._gateway, llm_gateway._gateway_pid = original
+            server.stop()
+            conversation_ids = [c.id for c in Conversation.query.filter(Conversation.student_id.like(f'{marker}-%'))]
+            ConversationMessage.query.filter(ConversationMessage.conversation_id.in_(conversation_ids)).delete()
+            Conversation.query.filter(Conversation.id.in_(conversation_ids)).delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_ai_chat_stream()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI回答缓存测试脚本
+"""
+
+from services.answer_cache import AnswerCache, normalize_question, is_context_dependent, make_cache_key
+
+def test_answer_cache():
+    """测试问题规范化、上下文判断、TTL和LRU淘汰"""
+    print("=== AI回答缓存测试 ===")
+
+    # 1. 只有标点、空白、大小写不同的问题视为同一个问题
+    assert normalize_question('什么是 Python？') == normalize_question('什么是python?')
+    key1 = make_cache_key('什么是 Python？', '系统提示', [])
+    key2 = make_cache_key('什么是python', '系统提示', [])
+    assert key1 == key2
+    assert key1 != make_cache_key('什么是python', '其他提示', [])
+
+    # 2. 有历史且含指代词的追问依赖上下文
+    history = [{'role': 'user', 'content': '什么是算法'}, {'role': 'assistant', 'content': '...'}]
+    assert is_context_dependent('它的时间复杂度是多少', history)
+    assert not is_context_dependent('它的时间复杂度是多少', [])
+    assert not is_context_dependent('什么是冒泡排序', history)
+
+    # 3. LRU淘汰与命中统计
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.set('a', '回答A')
+    cache.set('b', '回答B')
+    assert cache.get('a') == '回答A'
+    cache.set('c', '回答C')
+    assert cache.get('b') is None
+    assert cache.get('c') == '回答C'
+    print(f"   统计: {cache.stats()}")
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+    # 4. 过期后不再命中
+    expired = AnswerCache(max_entries=10, ttl=-1)
+    expired.set('a', '回答A')
+    assert expired.get('a') is None
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_answer_cache()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务中断检测测试脚本
+"""
+
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from app import app
+from models import db
+from models.background_job import BackgroundJob
+from services.jobs import owner_alive, process_owner
+
+def test_interrupted_jobs():
+    """只把执行进程已退出或租约过期的任务标记为失败，其他进程仍在执行的任务保持不变"""
+    print("=== 后台任务中断检测测试 ===")
+    host = socket.gethostname()
+    # 已退出的同主机进程
+    finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+    finished.wait()
+    with app.app_context():
+        jobs = {
+            'own': BackgroundJob.add_job('test_lease', owner=process_owner()),
+            'other_host': BackgroundJob.add_job('test_lease', owner='other-host:123'),
+            'expired': BackgroundJob.add_job('test_lease', owner='other-host:456'),
+            'dead_process': BackgroundJob.add_job('test_lease', owner=f'{host}:{finished.pid}'),
+            'legacy': BackgroundJob.add_job('test_lease'),
+        }
+        try:
+            jobs['expired'].update(heartbeat_at=datetime.utcnow() - timedelta(minutes=5))
+            assert not owner_alive(f'{host}:{finished.pid}') and owner_alive('other-host:1')
+
+            BackgroundJob.fail_interrupted_jobs(60, owner_alive)
+            db.session.expire_all()
+            statuses = {name: BackgroundJob.get_job(job.id).status for name, job in jobs.items()}
+            print(f"   任务状态: {statuses}")
+            assert statuses == {
+                'own': 'pending', 'other_host': 'pending', 'expired': 'failed', 'dead_process': 'failed', 'legacy': 'failed'
+            }
+
+            # 续租只更新本进程的任务
+            before = jobs['other_host'].heartbeat_at
+            assert BackgroundJob.renew_leases(process_owner()) == 1
+            db.session.expire_all()
+            assert BackgroundJob.get_job(jobs['other_host'].id).heartbeat_at == before
+        finally:
+            BackgroundJob.query.filter_by(kind='test_lease').delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_interrupted_jobs()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量AI分析测试脚本
+"""
+
+import uuid
+from sqlalchemy import event
+from app import app
+from models import db
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from models.background_job import BackgroundJob
+from models.student_analysis_report import StudentAnalysisReport
+from services.rate_limit import TokenBucket
+from services.student_analysis import prefetch_student_data, run_batch_analysis_job
+
+def test_batch_analysis():
+    """测试预取记录计算的指纹与逐个学生查询一致，批量任务的查询次数与学生数无关"""
+    print("=== 批量AI分析测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    students = [f'{marker}-s{i}' for i in range(6)]
+    with app.app_context():
+        try:
+            # 小数得分检验求和顺序和精度，最后一名学生没有考试记录
+            for index, student_id in enumerate(students[:-1]):
+                for quiz_id in range(1, index + 3):
+                    Answer.add_answer(student_id, 900000, quiz_id, 'A', quiz_id % 2 == 0, 0.1 * quiz_id)
+                ExamRecord.add_exam_record(student_id, 900000, 3, 3, 1, 0.1 + 0.2 * index, 3)
+            Answer.add_answer(students[-1], 900000, 1, 'A', True, 1)
+
+            # 1. 由预取记录计算的指纹与逐个学生查询的指纹一致
+            exam_records, answers = prefetch_student_data(students)
+            for student_id in students:
+                expected = StudentAnalysisReport.compute_fingerprint(student_id, 'model')
+                assert StudentAnalysisReport.compute_fingerprint_from_records(
+                    exam_records[student_id], answers[student_id], 'model') == expected, student_id
+            assert StudentAnalysisReport.compute_fingerprint(students[-1], 'model') is None
+
+            # 2. 已有有效报告时全部沿用，查询次数不随学生数增加
+            for student_id in students[:-1]:
+                StudentAnalysisReport.save_report(
+                    student_id, StudentAnalysisReport.compute_fingerprint(student_id, 'model'), '报告')
+            job = BackgroundJob.add_job('test_batch_analysis')
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                run_batch_analysis_job(job, students, False, 'model', 2, 60)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            result = job.get_result()
+            selects = [statement for statement in statements
+                       if statement.lstrip().upper().startswith('SELECT') and 'FROM background_jobs' not in statement]
+            print(f"   结果: {result}, SELECT语句数: {len(selects)}")
+            assert sorted(result['cached']) == sorted(students[:-1]) and result['no_records'] == [students[-1]]
+            assert len(selects) <= 3
+
+            # 3. 补充速率为0的令牌桶直接报错，不会在取令牌时除以0
+            try:
+                TokenBucket(rate=0, capacity=1)
+                assert False, '应当抛出ValueError'
+            except ValueError:
+                pass
+        finally:
+            Answer.query.filter(Answer.student_id.in_(students)).delete()
+            ExamRecord.query.filter(ExamRecord.student_id.in_(students)).delete()
+            StudentAnalysisReport.query.filter(StudentAnalysisReport.student_id.in_(students)).delete()
+            BackgroundJob.query.filter_by(kind='test_batch_analysis').delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_batch_analysis()
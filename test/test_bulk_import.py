@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导入测试脚本
+"""
+
+import io
+import json
+import time
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+from models.quiz_tag import QuizTag
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from services.bulk_import import import_quizzes, import_answer_sheets
+
+def test_bulk_import():
+    """测试题目导入（校验、查重、标签）、答题卡批量判分和上传接口"""
+    print("=== 批量导入测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    students = [f'{marker}-a', f'{marker}-b', f'{marker}-c', f'{marker}-d', f'{marker}-e']
+    paper = None
+    with app.app_context():
+        try:
+            # 1. 题目导入：缺少答案的行跳过，同一文件中的重复题目只保存一次（默认配置）
+            csv_data = (
+                'content,answer,analysis,tags\n'
+                f'{marker} 中国的首都是哪座城市？请写出城市名称,北京,,"{marker},地理"\n'
+                f'{marker} 一年有几个季节？请写出季节的数量,4,春夏秋冬,{marker}\n'
+                f'{marker} 缺少答案的题目,,,\n'
+                f'{marker} 中国的首都是哪座城市？请写出城市名称,北京,,{marker}\n'
+            )
+            result = import_quizzes(io.BytesIO(csv_data.encode('utf-8-sig')), 'csv', chunk_size=2)
+            print(f"   题目导入: {result}")
+            assert result['rows'] == 4 and result['imported'] == 2 and result['duplicates'] == 1
+            assert result['errors'][0]['line'] == 4
+            quizzes = Quiz.query.filter(Quiz.content.like(f'{marker}%')).order_by(Quiz.id).all()
+            assert QuizTag.query.filter_by(tag=marker).count() == 2
+
+            # 2. 答题卡导入：未判分的按试卷答案判分，已判分的沿用结果，每份答题卡生成一条考试记录
+            paper = Paper.add_paper(f'{marker} 线下考试')
+            PaperQuiz.replace_paper_quizzes(paper.id, [(quizzes[0].id, 3), (quizzes[1].id, 2)])
+            lines = [
+                {'student_id': students[0], 'paper_id': paper.id, 'question_order': 1, 'student_answer': ' 北京 '},
+                {'student_id': students[0], 'paper_id': paper.id, 'quiz_id': quizzes[1].id, 'student_answer': '5'},
+                {'student_id': students[1], 'paper_id': paper.id, 'question_order': 1, 'student_answer': '上海',
+                 'is_correct': True, 'submitted_at': '2026-01-05T09:30:00'},
+                {'student_id': students[1], 'paper_id': paper.id, 'question_order': 2, 'student_answer': ''},
+                {'student_id': students[1], 'paper_id': paper.id, 'question_order': 9, 'student_answer': 'A'},
+            ]
+            jsonl = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines) + '\nnot json\n'
+            result = import_answer_sheets(io.BytesIO(jsonl.encode('utf-8')), 'jsonl', chunk_size=2)
+            print(f"   答题卡导入: {result}")
+            assert result['imported'] == 3 and result['exam_records'] == 2 and result['error_count'] == 2
+            records = {record.student_id: record for record in ExamRecord.query.filter(ExamRecord.student_id.in_(students))}
+            assert (records[students[0]].correct_answers, records[students[0]].total_score) == (1, 3)
+            assert (records[students[1]].answered_questions, records[students[1]].total_score) == (1, 3)
+            assert records[students[0]].max_score == 5 and records[students[0]].total_questions == 2
+            assert records[students[1]].submit_time.day == 5
+
+            # 3. 重复导入同一文件：已有的作答跳过，不产生重复的考试记录
+            result = import_answer_sheets(io.BytesIO(jsonl.encode('utf-8')), 'jsonl', chunk_size=2)
+            print(f"   重复导入: {result}")
+            assert result['imported'] == 0 and result['existing'] == 3
+            assert result['exam_records'] == 0 and result['exam_records_updated'] == 0
+            assert Answer.query.filter(Answer.student_id.in_(students)).count() == 3
+            assert ExamRecord.query.filter(ExamRecord.student_id.in_(students)).count() == 2
+
+            # 4. 同一答题卡的行不连续时（块内和跨块）合并为一条考试记录
+            for chunk_size in (2, 10):
+                lines = [
+                    {'student_id': students[2], 'paper_id': paper.id, 'question_order': 1, 'student_answer': '北京'},
+                    {'student_id': students[3], 'paper_id': paper.id, 'question_order': 1, 'student_answer': '北京'},
+                    {'student_id': students[2], 'paper_id': paper.id, 'question_order': 2, 'student_answer': '4'},
+                ]
+                jsonl = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines)
+                result = import_answer_sheets(io.BytesIO(jsonl.encode('utf-8')), 'jsonl', chunk_size=chunk_size)
+                records = ExamRecord.query.filter(ExamRecord.student_id.in_(students[2:])).all()
+                assert len(records) == 2, result
+                record = next(record for record in records if record.student_id == students[2])
+                assert (record.answered_questions, record.correct_answers, record.total_score) == (2, 2, 5)
+                assert record.source == ExamRecord.SOURCE_IMPORT
+                Answer.query.filter(Answer.student_id.in_(students[2:])).delete()
+                ExamRecord.query.filter(ExamRecord.student_id.in_(students[2:])).delete()
+                db.session.commit()
+
+            # 5. 学生已在线考过该试卷：在线考试记录不被修改，已答过的题目跳过，新题目单独生成导入记录
+            online_student = students[4]
+            for _ in range(2):
+                Answer.add_answer(online_student, paper.id, quizzes[0].id, '北京', True, 3)
+                ExamRecord.add_exam_record(online_student, paper.id, 2, 1, 1, 3, 5)
+            only_existing = json.dumps({'student_id': online_student, 'paper_id': paper.id, 'question_order': 1,
+                                        'student_answer': '北京'}, ensure_ascii=False)
+            result = import_answer_sheets(io.BytesIO(only_existing.encode('utf-8')), 'jsonl', chunk_size=10)
+            assert result['existing'] == 1 and result['exam_records'] == 0 and result['exam_records_updated'] == 0
+            new_row = json.dumps({'student_id': online_student, 'paper_id': paper.id, 'question_order': 2,
+                                  'student_answer': '4'}, ensure_ascii=False)
+            result = import_answer_sheets(io.BytesIO((only_existing + '\n' + new_row).encode('utf-8')), 'jsonl',
+                                          chunk_size=10)
+            print(f"   在线考过的学生导入: {result}")
+            assert result['imported'] == 1 and result['exam_records'] == 1
+            records = ExamRecord.query.filter_by(student_id=online_student).order_by(ExamRecord.id).all()
+            assert [(record.source, record.answered_questions, record.total_score) for record in records] == [
+                ('online', 1, 3), ('online', 1, 3), ('import', 1, 2)
+            ]
+
+            # 6. 上传接口提交后台导入任务
+            client = app.test_client()
+            upload = f'{{"content": "{marker} 水的化学式是什么？", "answer": "H2O"}}\n'.encode('utf-8')
+            response = client.post('/teacher/import', data={'kind': 'quizzes', 'file': (io.BytesIO(upload), 'quizzes.jsonl')})
+            assert response.status_code == 202
+            status_url = response.get_json()['status_url']
+            for _ in range(100):
+                job = client.get(status_url).get_json()['job']
+                if job['finished']:
+                    break
+                time.sleep(0.05)
+            assert job['status'] == 'done' and job['result']['imported'] == 1, job
+            response = client.post('/teacher/import', data={'kind': 'quizzes', 'file': (io.BytesIO(upload), 'quizzes.txt')})
+            assert response.status_code == 400
+        finally:
+            Answer.query.filter(Answer.student_id.in_(students)).delete()
+            ExamRecord.query.filter(ExamRecord.student_id.in_(students)).delete()
+            if paper:
+                PaperQuiz.query.filter_by(paper_id=paper.id).delete()
+            db.session.commit()
+            if paper:
+                Paper.delete_paper(paper.id)
+            for quiz in Quiz.query.filter(Quiz.content.like(f'{marker}%')).all():
+                Quiz.delete_quiz(quiz.id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_bulk_import()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI对话历史测试脚本
+"""
+
+import uuid
+from app import app
+from config import Config
+from models import db
+from models.conversation import Conversation, ConversationMessage
+from services.chat_history import (
+    estimate_tokens, trim_summary, assemble_history, MESSAGE_OVERHEAD_TOKENS
+)
+
+def test_chat_history():
+    """测试token估算、按预算裁剪历史、摘要折叠以及对话在服务端的保存"""
+    print("=== AI对话历史测试 ===")
+    marker = uuid.uuid4().hex[:8]
+
+    # 1. token估算：中文按字计，其余约4个字符一个token
+    assert estimate_tokens('') == 0 and estimate_tokens(None) == 0
+    assert estimate_tokens('你好') == 2 and estimate_tokens('abcd') == 1 and estimate_tokens('你好abcde') == 4
+
+    # 2. 摘要超过上限时丢弃最早的行
+    summary = '\n'.join(f'第{i}行内容' for i in range(10))
+    trimmed = trim_summary(summary, 20)
+    assert estimate_tokens(trimmed) <= 20 and summary.endswith(trimmed) and trimmed.endswith('第9行内容')
+
+    with app.app_context():
+        try:
+            # 3. 每轮问答保存为两条消息，对话只能由所属学生读取
+            conversation = Conversation.add_conversation(f'{marker}-a', 'tutor')
+            for i in range(10):
+                question = f'第{i}个问题' + '问' * 40
+                answer = f'第{i}个回答' + '答' * 40
+                conversation.add_turn(question, answer, estimate_tokens(question), estimate_tokens(answer))
+            assert Conversation.get_student_conversation(f'{marker}-b', conversation.id) is None
+            assert Conversation.get_student_conversation(f'{marker}-a', conversation.id) is conversation
+            recent = conversation.get_recent_messages(4)
+            assert [m.role for m in recent] == ['assistant', 'user', 'assistant', 'user']
+            assert recent[0].content.startswith('第9个回答')
+
+            # 4. 只保留预算内最近的消息，以学生问题开头，更早的问题并入摘要
+            budget = 200
+            history = assemble_history(conversation, token_budget=budget, summary_max_tokens=1000, max_messages=20)
+            summary_message, messages = history[0], history[1:]
+            print(f"   保留消息数: {len(messages)}, 摘要: {len(conversation.summary)} 字")
+            assert summary_message['role'] == 'system' and '第0个问题' in summary_message['content']
+            assert messages[0]['role'] == 'user' and messages[-1]['content'].startswith('第9个回答')
+            assert sum(estimate_tokens(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in messages) <= budget
+            assert all(f'第{i}个问题' in conversation.summary for i in range(10 - len(messages) // 2))
+
+            # 5. 折叠进度持久化，已并入摘要的消息不再加载，重复组装结果不变
+            db.session.expire_all()
+            conversation = Conversation.get_student_conversation(f'{marker}-a', conversation.id)
+            folded_until = conversation.summarized_until_id
+            assert folded_until > 0
+            assert all(m.id > folded_until for m in conversation.get_recent_messages(100))
+            assert assemble_history(conversation, token_budget=budget, summary_max_tokens=1000, max_messages=20) == history
+            assert conversation.summarized_until_id == folded_until
+
+            # 6. 条数上限同样生效，摘要不超过token上限
+            history = assemble_history(conversation, token_budget=10 ** 6, summary_max_tokens=60, max_messages=2)
+            assert len(history) == 3 and history[1]['role'] == 'user'
+            assert 0 < estimate_tokens(conversation.summary) <= 60
+
+            # 7. 聊天接口按对话ID继续对话，不能使用其他学生的对话
+            original_key = Config.DEEPSEEK_API_KEY
+            Config.DEEPSEEK_API_KEY = None
+            client = app.test_client()
+            try:
+                with client.session_transaction() as sess:
+                    sess['student_id'] = f'{marker}-c'
+
+                def chat(message, conversation_id=None):
+                    response = client.post('/student/ai_chat', json={
+                        'message': f'{marker} {message}', 'conversation_id': conversation_id, 'no_cache': True
+                    })
+                    # WSGI服务器在输出完毕后调用close()，限流名额在此时释放
+                    response.close()
+                    return response.get_json()
+
+                first = chat('你好')
+                second = chat('继续', first['conversation_id'])
+                other = chat('借用', conversation.id)
+            finally:
+                Config.DEEPSEEK_API_KEY = original_key
+            assert first['success'] and second['conversation_id'] == first['conversation_id']
+            assert other['conversation_id'] not in (conversation.id, first['conversation_id'])
+            saved = ConversationMessage.query.filter_by(conversation_id=first['conversation_id']) \
+                .order_by(ConversationMessage.id).all()
+            assert [m.content for m in saved if m.role == 'user'] == [f'{marker} 你好', f'{marker} 继续']
+            assert all(m.token_count == estimate_tokens(m.content) for m in saved)
+        finally:
+            conversation_ids = [c.id for c in Conversation.query.filter(Conversation.student_id.like(f'{marker}-%'))]
+            ConversationMessage.query.filter(ConversationMessage.conversation_id.in_(conversation_ids)).delete()
+            Conversation.query.filter(Conversation.id.in_(conversation_ids)).delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_chat_history()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据导出测试脚本
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from app import app
+from models import db
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from services.data_export import export_chunks, parse_filters
+
+def test_data_export():
+    """测试按学生、试卷和时间筛选，分块输出和下载接口"""
+    print("=== 数据导出测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    students = [f'{marker}-a', f'{marker}-b']
+    with app.app_context():
+        try:
+            for index in range(5):
+                answer = Answer.add_answer(students[index % 2], 900000 + index % 2, 1, f'答案,{index}', index % 3 == 0, 1)
+                answer.answered_at = datetime(2026, 3, index + 1, 8, 0)
+            db.session.commit()
+            ExamRecord.add_exam_record(students[0], 900000, 3, 3, 2, 2, 3)
+
+            # 1. 按学生筛选，每2行输出一块，CSV可被标准库读回
+            filters = parse_filters({'student_id': students[0]})
+            chunks = list(export_chunks('answers', 'csv', filters, 2))
+            print(f"   CSV分块数: {len(chunks)}")
+            assert chunks[0].startswith('\ufeffid,') and len(chunks) == 3
+            rows = list(csv.DictReader(io.StringIO(''.join(chunks).lstrip('\ufeff'))))
+            assert [row['student_answer'] for row in rows] == ['答案,0', '答案,2', '答案,4']
+            assert [row['is_correct'] for row in rows] == ['1', '0', '0']
+
+            # 2. 日期范围包含结束当天
+            filters = parse_filters({'paper_id': 900001, 'start': '2026-03-02', 'end': '2026-03-04'})
+            lines = ''.join(export_chunks('answers', 'jsonl', filters, 100)).splitlines()
+            assert [json.loads(line)['answered_at'] for line in lines] == ['2026-03-02T08:00:00', '2026-03-04T08:00:00']
+
+            # 3. 下载接口
+            client = app.test_client()
+            response = client.get('/teacher/export/exam_records', query_string={'student_id': students[0], 'format': 'jsonl'})
+            assert response.is_streamed and 'attachment' in response.headers['Content-Disposition']
+            records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+            assert len(records) == 1 and records[0]['total_score'] == 2
+            # 4. 学生ID含中文和引号时下载头仍为合法的ASCII
+            response = client.get('/teacher/export/answers', query_string={'student_id': '张三"1'})
+            disposition = response.headers['Content-Disposition']
+            print(f"   下载头: {disposition}")
+            disposition.encode('latin-1')
+            assert "filename*=UTF-8''answers-%E5%BC%A0%E4%B8%89%221-" in disposition
+            assert disposition.count('"') == 2
+            assert client.get('/teacher/export/answers', query_string={'start': '3月1日'}).status_code == 400
+            assert client.get('/teacher/export/quizzes').status_code == 400
+        finally:
+            Answer.query.filter(Answer.student_id.in_(students)).delete()
+            ExamRecord.query.filter(ExamRecord.student_id.in_(students)).delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_data_export()
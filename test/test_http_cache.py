@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP条件缓存与压缩测试脚本
+"""
+
+import gzip
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+from services import http_cache
+
+def test_http_cache():
+    """测试304命中、编辑试卷后ETag失效，以及gzip/br协商"""
+    print("=== HTTP缓存测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        quizzes = Quiz.add_quizzes([{'content': f'{marker} 题目{i} ' + '内容' * 200, 'answer': 'A'} for i in range(3)])
+        ids = [quiz.id for quiz in quizzes]
+        paper = Paper.add_paper(f'{marker} 缓存')
+        paper_id = paper.id
+        client = app.test_client()
+        url = f'/teacher/paper/{paper_id}/view'
+        edit_url = f'/teacher/paper/{paper_id}/quizzes'
+
+        def put(items):
+            response = client.put(edit_url, json={'quizzes': [{'quiz_id': q, 'score': s} for q, s in items]})
+            assert response.status_code == 200, response.get_json()
+
+        def etag():
+            response = client.get(url)
+            assert response.status_code == 200
+            return response.get_etag()[0]
+
+        try:
+            put([(ids[0], 1), (ids[1], 2), (ids[2], 3)])
+
+            # 1. 携带相同ETag再次请求返回304且不含正文
+            first = etag()
+            response = client.get(url, headers={'If-None-Match': f'"{first}"'})
+            assert response.status_code == 304 and response.get_data() == b''
+            assert response.get_etag()[0] == first
+
+            # 2. 互换两题分值（题目数和总分都不变）、调整顺序后ETag都会变化
+            put([(ids[0], 2), (ids[1], 1), (ids[2], 3)])
+            swapped = etag()
+            assert swapped != first
+            assert client.get(url, headers={'If-None-Match': f'"{first}"'}).status_code == 200
+            put([(ids[1], 1), (ids[0], 2), (ids[2], 3)])
+            reordered = etag()
+            assert reordered not in (first, swapped)
+
+            # 3. 学生答题页同样支持304
+            Paper.update_paper_status(paper_id, 'published')
+            with client.session_transaction() as sess:
+                sess['student_id'] = f'{marker}-s'
+            student_url = f'/student/take_quiz/{paper_id}'
+            student_etag = client.get(student_url).get_etag()[0]
+            assert client.get(student_url, headers={'If-None-Match': f'"{student_etag}"'}).status_code == 304
+
+            # 4. 发布后ETag变化；gzip压缩的响应带-gz后缀，用该ETag重新验证仍然命中
+            published = etag()
+            assert published != reordered
+            response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            gz_etag = response.get_etag()[0]
+            print(f"   gzip: {len(response.get_data())} 字节, ETag: {gz_etag}")
+            assert response.headers['Content-Encoding'] == 'gzip' and gz_etag == published + '-gz'
+            assert b'<html' in gzip.decompress(response.get_data()).lower()
+            assert 'Accept-Encoding' in response.headers['Vary']
+            assert client.get(url, headers={'If-None-Match': f'"{gz_etag}"'}).status_code == 304
+
+            # 5. 仅在安装brotli时使用br，否则退回gzip或不压缩
+            response = client.get(url, headers={'Accept-Encoding': 'br, gzip'})
+            expected = 'br' if http_cache.brotli is not None else 'gzip'
+            assert response.headers['Content-Encoding'] == expected
+            response = client.get(url, headers={'Accept-Encoding': 'br'})
+            if http_cache.brotli is None:
+                assert 'Content-Encoding' not in response.headers and response.get_etag()[0] == published
+            else:
+                assert response.get_etag()[0] == published + '-br'
+        finally:
+            PaperQuiz.query.filter_by(paper_id=paper_id).delete()
+            db.session.commit()
+            Paper.delete_paper(paper_id)
+            for quiz_id in ids:
+                Quiz.delete_quiz(quiz_id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_http_cache()
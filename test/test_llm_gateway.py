@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型调用网关测试脚本（使用本地模拟服务，不访问外网）
+"""
+
+import time
+import threading
+import openai
+from services.llm_gateway import LLMGateway, LLMUnavailableError
+from mock_llm_server import MockLLMServer, LatencyModel
+
+REPLY = '你好，我是模拟回复'
+
+def test_llm_gateway():
+    """测试重试、熔断和统计"""
+    print("=== 大模型调用网关测试 ===")
+    server = MockLLMServer(chunk_chars=3, responder=lambda payload: REPLY)
+    base_url = server.start()
+    try:
+        gateway = LLMGateway(api_key='test', base_url=base_url, max_retries=2,
+                             retry_base_delay=0.01, breaker_threshold=3, breaker_cooldown=60)
+
+        # 1. 失败两次后重试成功
+        server.fail_times = 2
+        server.reset_stats()
+        reply = gateway.chat([{'role': 'user', 'content': '你好'}], name='test')
+        print(f"   回复: {reply}")
+        assert reply == REPLY
+        assert server.calls == 3
+        stats = gateway.metrics.snapshot()['test']
+        assert stats['retries'] == 2 and stats['completion_tokens'] == len(REPLY)
+
+        # 2. 流式调用逐段返回
+        server.fail_times = 0
+        server.reset_stats()
+        pieces = list(gateway.stream_chat([{'role': 'user', 'content': '你好'}], name='stream'))
+        print(f"   流式片段: {pieces}")
+        assert ''.join(pieces) == REPLY
+        assert 'ttft_ms' in gateway.metrics.snapshot()['stream']
+
+        # 3. 连续失败触发熔断，之后的调用直接拒绝
+        server.fail_times = 100
+        server.reset_stats()
+        try:
+            gateway.chat([{'role': 'user', 'content': '你好'}], name='test')
+            assert False, '应当抛出异常'
+        except openai.InternalServerError:
+            pass
+        assert gateway.breaker.state == 'open'
+        try:
+            gateway.chat([{'role': 'user', 'content': '你好'}], name='test')
+            assert False, '熔断后应当直接拒绝'
+        except LLMUnavailableError:
+            pass
+        assert server.calls == 3
+
+        # 4. 冷却期过后只放行一个试探请求，试探成功前其他并发调用直接拒绝
+        gateway.breaker.cooldown = 0.1
+        time.sleep(0.15)
+        server.fail_times = 0
+        server.latency = LatencyModel(median_ms=300)
+        server.reset_stats()
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(gateway.chat([{'role': 'user', 'content': '你好'}], name='probe'))
+            except LLMUnavailableError:
+                outcomes.append('rejected')
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"   半开状态并发调用: {outcomes}")
+        assert server.calls == 1 and outcomes.count(REPLY) == 1 and outcomes.count('rejected') == 4
+        assert gateway.breaker.state == 'closed'
+
+        # 5. 试探请求被取消时归还试探名额
+        breaker = gateway.breaker
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.15)
+        allowed, probe = breaker.acquire()
+        assert allowed and probe is not None and breaker.acquire() == (False, None)
+        breaker.release_probe(probe)
+        assert breaker.acquire()[0]
+        print(f"   统计: {gateway.metrics.snapshot()}")
+        gateway.close()
+    finally:
+        server.stop()
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_llm_gateway()
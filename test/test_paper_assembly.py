@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动组卷测试脚本
+"""
+
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+from models.quiz_tag import QuizTag
+from models.answer import Answer
+from services.paper_assembly import parse_constraints, distribute_scores, assemble_paper, PaperAssemblyError
+
+def test_paper_assembly():
+    """测试条件解析、分值分配、知识点覆盖和排除最近做过的题目"""
+    print("=== 自动组卷测试 ===")
+
+    # 1. 条件解析和分值分配
+    constraints = parse_constraints({'count': '5', 'total_score': '10', 'tags': '方程:2 函数'}, 100)
+    assert constraints['tags'] == {'方程': 2, '函数': 1}
+    assert distribute_scores(100, 3) == [33.34, 33.33, 33.33]
+    for bad in ({'count': 0}, {'count': 2, 'tags': {'方程': 3}}, {'count': 'x'}):
+        try:
+            parse_constraints(bad, 100)
+            assert False, f'应当拒绝: {bad}'
+        except PaperAssemblyError:
+            pass
+
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        quizzes = Quiz.add_quizzes(
+            [{'content': f'{marker} 方程题{i}', 'answer': 'A', 'tags': [marker, f'{marker}方程']} for i in range(3)]
+            + [{'content': f'{marker} 函数题{i}', 'answer': 'B', 'tags': [marker, f'{marker}函数']} for i in range(3)]
+        )
+        ids = [quiz.id for quiz in quizzes]
+        paper = Paper.add_paper(f'{marker} 自动组卷')
+        try:
+            # 2. 排除最近做过的题目后按知识点抽题
+            Answer.add_answer('assembly-student', paper.id, ids[0], 'A', True, 1)
+            constraints = parse_constraints({
+                'count': 4, 'total_score': 10, 'tags': {f'{marker}方程': 2}, 'pool_tags': [marker],
+                'exclude_recent_days': 1, 'student_ids': ['assembly-student']
+            }, 100)
+            quiz_ids, scores = assemble_paper(paper.id, constraints)
+            print(f"   抽到题目: {quiz_ids}, 分值: {scores}")
+            assert len(quiz_ids) == 4 and ids[0] not in quiz_ids
+            assert set(ids[1:3]) <= set(quiz_ids)
+            paper_quizzes = PaperQuiz.get_paper_quizzes(paper.id)
+            assert [pq.question_order for pq in paper_quizzes] == [1, 2, 3, 4]
+            assert sum(pq.score for pq in paper_quizzes) == 10
+
+            # 3. 题目不足时不写入任何题目
+            try:
+                assemble_paper(paper.id, parse_constraints({'count': 3, 'pool_tags': [marker]}, 100))
+                assert False, '题目不足时应当失败'
+            except PaperAssemblyError as e:
+                print(f"   题目不足: {e}")
+            assert len(PaperQuiz.get_paper_quizzes(paper.id)) == 4
+        finally:
+            Answer.query.filter_by(paper_id=paper.id).delete()
+            PaperQuiz.query.filter_by(paper_id=paper.id).delete()
+            db.session.commit()
+            Paper.delete_paper(paper.id)
+            for quiz_id in ids:
+                Quiz.delete_quiz(quiz_id)
+        assert QuizTag.query.filter_by(tag=marker).count() == 0
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_paper_assembly()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+试卷批量编辑测试脚本
+"""
+
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+
+def test_paper_bulk_edit():
+    """测试整体替换题目列表、连续编号、参数校验、移除题目后的顺序和试卷更新时间"""
+    print("=== 试卷批量编辑测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        quizzes = Quiz.add_quizzes([{'content': f'{marker} 题目{i}', 'answer': 'A'} for i in range(5)])
+        ids = [quiz.id for quiz in quizzes]
+        paper = Paper.add_paper(f'{marker} 批量编辑')
+        client = app.test_client()
+        url = f'/teacher/paper/{paper.id}/quizzes'
+
+        def orders():
+            return [(pq.quiz_id, pq.question_order, pq.score) for pq in PaperQuiz.get_paper_quizzes(paper.id)]
+
+        try:
+            # 1. 空试卷一次添加三道题
+            data = client.put(url, json={'quizzes': [{'quiz_id': quiz_id, 'score': 2} for quiz_id in ids[:3]]}).get_json()
+            assert data['success'] and data['changes']['added'] == 3 and data['total_score'] == 6
+            assert orders() == [(ids[0], 1, 2), (ids[1], 2, 2), (ids[2], 3, 2)]
+
+            # 2. 调整顺序、改分值、删一道、加两道，只写入有变化的行
+            items = [(ids[2], 2), (ids[0], 5), (ids[3], 1), (ids[4], 1)]
+            data = client.put(url, json={'quizzes': [{'quiz_id': q, 'score': s} for q, s in items]}).get_json()
+            print(f"   变更: {data['changes']}")
+            assert data['changes'] == {'added': 2, 'removed': 1, 'updated': 2, 'unchanged': 0}
+            assert orders() == [(q, order, s) for order, (q, s) in enumerate(items, 1)]
+
+            # 3. 非法请求不做任何修改
+            for body in ({'quizzes': [{'quiz_id': ids[0]}, {'quiz_id': ids[0]}]},
+                         {'quizzes': [{'quiz_id': -1}]},
+                         {'quizzes': [{'quiz_id': ids[0], 'score': -1}]},
+                         {}):
+                response = client.put(url, json=body)
+                assert response.status_code == 400, body
+            assert client.put('/teacher/paper/0/quizzes', json={'quizzes': []}).status_code == 404
+            assert len(orders()) == 4
+
+            # 4. 移除题目后顺序保持连续
+            PaperQuiz.remove_quiz_from_paper(paper.id, ids[0])
+            assert [order for _, order, _ in orders()] == [1, 2, 3]
+
+            # 5. 修改题目列表时同一事务中更新试卷的 updated_at，试卷页面ETag随之变化
+            def stamp():
+                db.session.expire_all()
+                return Paper.get_paper_by_id(paper.id).updated_at
+
+            view_url = f'/teacher/paper/{paper.id}/view'
+            items = [(pq.quiz_id, pq.score) for pq in PaperQuiz.get_paper_quizzes(paper.id)]
+            before, etag = stamp(), client.get(view_url).get_etag()[0]
+            client.put(url, json={'quizzes': [{'quiz_id': q, 'score': s} for q, s in reversed(items)]})
+            after = stamp()
+            assert after > before and client.get(view_url).get_etag()[0] != etag
+            data = client.put(url, json={'quizzes': [{'quiz_id': q, 'score': s} for q, s in reversed(items)]}).get_json()
+            assert data['changes']['unchanged'] == len(items) and stamp() == after
+        finally:
+            PaperQuiz.query.filter_by(paper_id=paper.id).delete()
+            db.session.commit()
+            Paper.delete_paper(paper.id)
+            for quiz_id in ids:
+                Quiz.delete_quiz(quiz_id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_paper_bulk_edit()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+试卷复制测试脚本
+"""
+
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+from models.quiz_tag import QuizTag
+
+def test_paper_clone():
+    """测试只复制题目关联和同时复制题目（含标签、签名、检索）两种方式"""
+    print("=== 试卷复制测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        quizzes = Quiz.add_quizzes([
+            {'content': f'{marker} 复制题目{i}', 'answer': str(i), 'analysis': f'解析{i}', 'tags': [marker]}
+            for i in range(3)
+        ])
+        ids = [quiz.id for quiz in quizzes]
+        paper = Paper.add_paper(f'{marker} 原试卷', status='published')
+        PaperQuiz.replace_paper_quizzes(paper.id, [(ids[2], 3), (ids[0], 1), (ids[1], 2)])
+        clones = []
+        try:
+            # 1. 只复制题目关联，新试卷为草稿，题目顺序和分值不变
+            shallow = Paper.clone_paper(paper.id)
+            clones.append(shallow)
+            assert shallow.status == 'draft' and shallow.name.startswith(f'{marker} 原试卷')
+            rows = [(pq.quiz_id, pq.question_order, pq.score) for pq in PaperQuiz.get_paper_quizzes(shallow.id)]
+            assert rows == [(ids[2], 1, 3), (ids[0], 2, 1), (ids[1], 3, 2)]
+
+            # 2. 同时复制题目：新题目内容、签名、标签与原题一致，且可被全文检索
+            client = app.test_client()
+            data = client.post(f'/teacher/paper/{paper.id}/clone',
+                               json={'name': f'{marker} 深复制', 'copy_quizzes': True}).get_json()
+            deep = Paper.get_paper_by_id(data['paper']['id'])
+            clones.append(deep)
+            assert data['success'] and data['question_count'] == 3
+            copies = PaperQuiz.get_paper_quizzes(deep.id)
+            new_ids = [pq.quiz_id for pq in copies]
+            print(f"   原题目: {[ids[2], ids[0], ids[1]]}, 复制出的题目: {new_ids}")
+            assert not set(new_ids) & set(ids)
+            for pq, original_id in zip(copies, [ids[2], ids[0], ids[1]]):
+                original, copy = Quiz.get_quiz_by_id(original_id), Quiz.get_quiz_by_id(pq.quiz_id)
+                assert (copy.content, copy.answer, copy.analysis, copy.content_signature) == \
+                       (original.content, original.answer, original.analysis, original.content_signature)
+            assert QuizTag.query.filter(QuizTag.tag == marker, QuizTag.quiz_id.in_(new_ids)).count() == 3
+            assert Quiz.search_quizzes(f'{marker} 复制题目')[1] == 6
+
+            assert client.post('/teacher/paper/0/clone', json={}).status_code == 404
+        finally:
+            for clone in clones:
+                PaperQuiz.query.filter_by(paper_id=clone.id).delete()
+            PaperQuiz.query.filter_by(paper_id=paper.id).delete()
+            db.session.commit()
+            for clone in clones:
+                Paper.delete_paper(clone.id)
+            Paper.delete_paper(paper.id)
+            for quiz in Quiz.query.filter(Quiz.content.like(f'{marker}%')).all():
+                Quiz.delete_quiz(quiz.id)
+        assert QuizTag.query.filter_by(tag=marker).count() == 0
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_paper_clone()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台删除试卷测试脚本
+"""
+
+import time
+import uuid
+from app import app
+from models import db
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.quiz import Quiz
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from models.background_job import BackgroundJob
+from models.student_analysis_report import StudentAnalysisReport
+from models.migrations import delete_orphaned_exam_records
+from services.paper_deletion import run_paper_deletion_job, delete_paper_row
+
+def create_paper_with_records(marker, quiz_ids, students):
+    """创建一份有答题记录、考试记录和分析报告的试卷"""
+    paper = Paper.add_paper(f'{marker} 待删除', status='published')
+    PaperQuiz.replace_paper_quizzes(paper.id, [(quiz_id, 1) for quiz_id in quiz_ids])
+    for student_id in students:
+        for quiz_id in quiz_ids:
+            Answer.add_answer(student_id, paper.id, quiz_id, 'A', True, 1)
+        ExamRecord.add_exam_record(student_id, paper.id, len(quiz_ids), len(quiz_ids), len(quiz_ids),
+                                   len(quiz_ids), len(quiz_ids))
+        StudentAnalysisReport.save_report(student_id, 'fingerprint', '报告')
+    return paper
+
+def test_paper_deletion():
+    """测试分批删除、进度汇报、分析报告失效、删除接口和遗留考试记录清理"""
+    print("=== 后台删除试卷测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    students = [f'{marker}-s{i}' for i in range(3)]
+    with app.app_context():
+        quizzes = Quiz.add_quizzes([{'content': f'{marker} 删除题目{i}', 'answer': 'A'} for i in range(2)])
+        quiz_ids = [quiz.id for quiz in quizzes]
+        try:
+            # 1. 按批删除所有关联数据，进度等于删除的行数
+            paper_id = create_paper_with_records(marker, quiz_ids, students).id
+            job = BackgroundJob.add_job('paper_deletion')
+            run_paper_deletion_job(job, paper_id, 2, 0)
+            result = job.get_result()
+            print(f"   删除结果: {result}")
+            assert result['answers'] == 6 and result['exam_records'] == 3 and result['paper_quizzes'] == 2
+            assert result['analysis_reports'] == 3 and result['paper_deleted']
+            assert job.completed == job.total == 11
+            assert Paper.get_paper_by_id(paper_id) is None
+            assert ExamRecord.query.filter_by(paper_id=paper_id).count() == 0
+            assert StudentAnalysisReport.query.filter(StudentAnalysisReport.student_id.in_(students)).count() == 0
+
+            # 2. 删除接口提交后台任务，试卷立即对学生不可见
+            paper_id = create_paper_with_records(marker, quiz_ids, students[:1]).id
+            client = app.test_client()
+            response = client.post(f'/teacher/paper/{paper_id}/delete', json={})
+            assert response.status_code == 202
+            status_url = response.get_json()['status_url']
+            assert Paper.update_paper_status(paper_id, 'published') is False
+            for _ in range(100):
+                data = client.get(status_url).get_json()['job']
+                if data['finished']:
+                    break
+                time.sleep(0.05)
+            assert data['status'] == 'done', data
+            db.session.expire_all()
+            assert Paper.get_paper_by_id(paper_id) is None
+            assert client.post('/teacher/paper/0/delete', json={}).status_code == 404
+
+            # 3. 启动迁移清理旧版删除试卷时遗留的考试记录
+            ExamRecord.add_exam_record(students[0], paper_id, 1, 1, 1, 1, 1)
+            delete_orphaned_exam_records()
+            assert ExamRecord.query.filter(ExamRecord.student_id.in_(students)).count() == 0
+
+            # 4. 删除中的试卷拒绝修改和复制，删除试卷前清理并发写入的题目关联
+            paper_id = Paper.add_paper(f'{marker} 删除中', status=Paper.STATUS_DELETING).id
+            assert client.put(f'/teacher/paper/{paper_id}/quizzes', json={'quizzes': []}).status_code == 409
+            assert client.post(f'/teacher/paper/{paper_id}/assemble', json={'count': 1}).status_code == 409
+            assert client.post(f'/teacher/paper/{paper_id}/clone', json={}).status_code == 409
+            client.post(f'/teacher/paper/{paper_id}/add_quiz', data={'quiz_id': quiz_ids[0]})
+            assert PaperQuiz.query.filter_by(paper_id=paper_id).count() == 0
+            PaperQuiz.add_quiz_to_paper(paper_id, quiz_ids[0], 1)
+            leftovers, deleted = delete_paper_row(paper_id)
+            print(f"   遗留数据: {leftovers}")
+            assert leftovers['paper_quizzes'] == 1 and deleted
+            assert PaperQuiz.query.filter_by(paper_id=paper_id).count() == 0
+        finally:
+            for quiz_id in quiz_ids:
+                Quiz.delete_quiz(quiz_id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_paper_deletion()
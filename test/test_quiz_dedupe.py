@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题库近似重复检测测试脚本
+"""
+
+import time
+import random
+from array import array
+from services.quiz_dedupe import (
+    QuizSimilarityIndex, compute_signature, signature_similarity, shingle_hashes, PERMUTATIONS, MERSENNE_PRIME
+)
+
+def reference_signature(text):
+    """逐个排列取最小值的原始算法，数据库中保存的签名由它生成"""
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return None
+    return array('I', [
+        min((a * h + b) % MERSENNE_PRIME for h in hashes) & 0xFFFFFFFF for a, b in PERMUTATIONS
+    ]).tobytes()
+
+def test_quiz_dedupe():
+    """测试签名相似度、近似重复查找、删除和重复分组"""
+    print("=== 题库查重测试 ===")
+
+    quiz = '下列关于二次函数y=ax^2+bx+c的说法中，正确的是？A. 开口向上 B. 对称轴为x=-b/2a C. 顶点在原点 D. 与x轴必有交点'
+    variant = quiz.replace('A. 开口向上', 'A. 开口向下')
+    other = '计算：(3x+2)(x-5) 的展开结果是多少？请写出详细步骤。'
+
+    # 1. 只有空白和标点不同的题目签名完全相同，不同题目相似度很低
+    assert compute_signature(quiz) == compute_signature(quiz.replace(' ', '') + '。')
+    assert signature_similarity(compute_signature(quiz), compute_signature(other)) < 0.2
+    assert compute_signature('  ，。 ') is None
+
+    # 2. 改动一个选项的题目被识别为近似重复
+    index = QuizSimilarityIndex(threshold=0.8)
+    index.load_signatures([(1, compute_signature(quiz)), (2, compute_signature(other))])
+    start = time.perf_counter()
+    match = index.find_duplicate(compute_signature(variant))
+    print(f"   查找耗时: {(time.perf_counter() - start) * 1000:.3f} ms, 结果: {match}")
+    assert match and match[0] == 1
+    assert index.find_duplicate(compute_signature('请简述光合作用的过程和意义。')) is None
+
+    # 3. 重复分组
+    index.add(3, compute_signature(variant))
+    groups = index.duplicate_groups()
+    assert [ids for ids, _ in groups] == [[1, 3]]
+
+    # 4. 删除后不再参与查重
+    index.remove(1)
+    index.remove(3)
+    assert index.find_duplicate(compute_signature(quiz)) is None
+    assert index.duplicate_groups() == []
+
+    # 5. 打包计算的签名与原始算法逐字节相同，已保存的签名无需重算
+    rng = random.Random(0)
+    chars = ''.join(chr(code) for code in range(0x4e00, 0x4e00 + 500)) + 'abcxyz0123'
+    texts = [quiz, variant, other, 'a', 'ab', 'abcd'] + [
+        ''.join(rng.choice(chars) for _ in range(rng.randint(1, 300))) for _ in range(200)
+    ]
+    for text in texts:
+        assert compute_signature(text) == reference_signature(text), text
+    start = time.perf_counter()
+    for text in texts:
+        compute_signature(text)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for text in texts:
+        reference_signature(text)
+    print(f"   签名耗时: {elapsed * 1000 / len(texts):.3f} ms/题, 原始算法: {(time.perf_counter() - start) * 1000 / len(texts):.3f} ms/题")
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_dedupe()
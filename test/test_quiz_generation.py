@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能出题分组生成测试脚本（使用本地模拟大模型服务，不访问外网）
+"""
+
+import os
+import re
+import json
+import threading
+import contextlib
+from services import llm_gateway
+from services.llm_gateway import LLMGateway
+from services.quiz_generation import split_into_chunks, generate_quizzes
+from mock_llm_server import MockLLMServer
+
+PARAMS = {'subject': '数学', 'grade': '七年级', 'question_type': '选择题', 'knowledge_points': '有理数'}
+
+class QuizResponder:
+    """按提示中的组号和题目数生成题目，可以指定某些组返回无效内容或少返回题目"""
+
+    def __init__(self):
+        self.broken_parts = set()
+        self.short_once = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def __call__(self, payload):
+        prompt = payload['messages'][-1]['content']
+        count = int(re.search(r'请生成(\d+)道', prompt).group(1))
+        match = re.search(r'第(\d+)组（共', prompt)
+        part = int(match.group(1)) if match else 1
+        with self._lock:
+            self.requests.append((part, count))
+            if part in self.broken_parts:
+                return '抱歉，无法生成题目。'
+            shortage = self.short_once.pop(part, 0)
+        quizzes = [{'id': i, 'content': f'P{part}-{len(self.requests)}-{i}', 'answer': 'A', 'analysis': '解析'}
+                   for i in range(count - shortage)]
+        return json.dumps({'quizzes': quizzes}, ensure_ascii=False)
+
+def test_quiz_generation():
+    """测试题目数拆分、分组结果按顺序合并、只重试缺少的题目以及单组失败不影响其他组"""
+    print("=== 智能出题分组生成测试 ===")
+
+    # 1. 按每组题目数拆分
+    assert split_into_chunks(12, 5) == [5, 5, 2]
+    assert split_into_chunks(10, 5) == [5, 5]
+    assert split_into_chunks(3, 0) == [1, 1, 1]
+    assert split_into_chunks(0, 5) == []
+
+    responder = QuizResponder()
+    server = MockLLMServer(chunk_chars=7, token_interval_ms=5, responder=responder)
+    server.start()
+    original = (llm_gateway._gateway, llm_gateway._gateway_pid)
+    llm_gateway._gateway = LLMGateway(api_key='test', base_url=server.base_url, max_retries=0,
+                                      breaker_threshold=100, breaker_cooldown=1)
+    llm_gateway._gateway_pid = os.getpid()
+    try:
+        # 2. 各组并发生成，结果按组顺序合并，边生成边回调，每组都在 slot 内请求
+        batches = []
+        # [进行中, 最大并发, 进入次数]
+        holders = [0, 0, 0]
+        lock = threading.Lock()
+
+        @contextlib.contextmanager
+        def slot():
+            with lock:
+                holders[0] += 1
+                holders[1] = max(holders[1], holders[0])
+                holders[2] += 1
+            try:
+                yield
+            finally:
+                with lock:
+                    holders[0] -= 1
+
+        quizzes, errors = generate_quizzes(PARAMS, 12, chunk_size=5, max_concurrency=2, retries=1,
+                                           on_quizzes=batches.append, slot=slot)
+        parts = [int(quiz['content'].split('-')[0][1:]) for quiz in quizzes]
+        print(f"   分组: {parts}, 回调批次: {len(batches)}, 最大并发: {holders[1]}")
+        assert errors == [] and parts == [1] * 5 + [2] * 5 + [3] * 2
+        assert sorted(responder.requests) == [(1, 5), (2, 5), (3, 2)]
+        assert sum(len(batch) for batch in batches) == 12
+        assert holders[0] == 0 and holders[1] <= 2 and holders[2] == 3
+
+        # 3. 一次返回的题目不足时，只为缺少的数量重新请求
+        responder.requests.clear()
+        responder.short_once = {1: 3}
+        quizzes, errors = generate_quizzes(PARAMS, 5, chunk_size=5, max_concurrency=1, retries=1)
+        assert errors == [] and len(quizzes) == 5
+        assert responder.requests == [(1, 5), (1, 3)]
+
+        # 4. 某一组重试后仍然失败，其他组的题目照常返回并记录失败的组
+        responder.requests.clear()
+        responder.broken_parts = {2}
+        quizzes, errors = generate_quizzes(PARAMS, 12, chunk_size=5, max_concurrency=3, retries=1)
+        print(f"   失败分组: {errors}")
+        assert [quiz['content'][:2] for quiz in quizzes] == ['P1'] * 5 + ['P3'] * 2
+        assert len(errors) == 1 and errors[0].startswith('第2组')
+        assert [request for request in responder.requests if request[0] == 2] == [(2, 5), (2, 5)]
+    finally:
+        llm_gateway._gateway, llm_gateway._gateway_pid = original
+        server.stop()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_generation()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查重和检索索引的多进程同步测试脚本
+"""
+
+import uuid
+from datetime import datetime
+from app import app
+from models import db
+from models.quiz import Quiz
+from services.quiz_dedupe import QuizSimilarityIndex, compute_signature
+from services.quiz_retrieval import BM25Index
+
+def insert_quiz(content, quiz_id=None):
+    """模拟其他进程保存题目：直接写数据库，不经过本进程的索引"""
+    row = {'content': content, 'answer': '答案', 'analysis': None,
+           'content_signature': compute_signature(content), 'created_at': datetime.utcnow()}
+    if quiz_id is not None:
+        row['id'] = quiz_id
+    quiz_id = db.session.execute(db.insert(Quiz).values(**row)).inserted_primary_key[0]
+    db.session.commit()
+    return quiz_id
+
+def delete_quiz(quiz_id):
+    """模拟其他进程删除题目"""
+    db.session.execute(db.delete(Quiz).where(Quiz.id == quiz_id))
+    db.session.commit()
+
+def test_quiz_index_sync():
+    """测试其他进程增删题目后，本进程的查重索引和检索索引按间隔同步"""
+    print("=== 索引多进程同步测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    first = f'{marker} 下列关于光合作用场所的说法中，正确的是哪一项？请说明理由'
+    second = f'{marker} 计算等差数列前二十项的和，首项为三，公差为五，写出步骤'
+    created = []
+    with app.app_context():
+        try:
+            index = QuizSimilarityIndex(threshold=0.8, sync_interval=0)
+            retriever = BM25Index(sync_interval=0)
+            throttled = QuizSimilarityIndex(threshold=0.8, sync_interval=3600)
+            for loaded in (index, retriever, throttled):
+                loaded.ensure_loaded()
+
+            # 1. 其他进程新增的题目在下次使用时被同步
+            created.append(insert_quiz(first))
+            match = index.find_duplicate(compute_signature(first))
+            hits = retriever.search(first)
+            print(f"   查重结果: {match}, 检索结果: {hits[:1]}")
+            assert match and match[0] == created[0]
+            assert hits and hits[0][0] == created[0]
+
+            # 2. 检查间隔内不查询数据库
+            assert throttled.find_duplicate(compute_signature(first)) is None
+
+            # 3. 其他进程删除的题目被移除
+            delete_quiz(created.pop())
+            assert index.find_duplicate(compute_signature(first)) is None
+            assert not retriever.search(marker)
+
+            # 4. 删除最大ID后新题目复用了同一个ID，按新内容重新登记
+            created.append(insert_quiz(first))
+            index.find_duplicate(compute_signature(first))
+            retriever.search(first)
+            delete_quiz(created[0])
+            insert_quiz(second, quiz_id=created[0])
+            assert index.find_duplicate(compute_signature(first)) is None
+            match = index.find_duplicate(compute_signature(second))
+            assert match and match[0] == created[0]
+            hits = retriever.search(second)
+            assert hits and hits[0][0] == created[0] and hits[0][2] > 0.9
+        finally:
+            for quiz_id in created:
+                delete_quiz(quiz_id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_index_sync()
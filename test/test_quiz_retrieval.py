@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题库检索测试脚本
+"""
+
+import time
+import uuid
+from app import app
+from models import db
+from models.quiz import Quiz
+from models.paper import Paper
+from models.paper_quiz import PaperQuiz
+from models.exam_record import ExamRecord
+from services.quiz_retrieval import BM25Index, tokenize, retrieve_for_chat, add_reference_context
+
+def test_quiz_retrieval():
+    """测试中文切词、BM25排序、覆盖率和增量增删"""
+    print("=== 题库检索测试 ===")
+
+    # 1. 汉字切成二元组，英文和数字整体保留，全角字符统一为半角
+    assert tokenize('光合作用') == ['光合', '合作', '作用']
+    assert tokenize('求 f(x)=2x 的值') == ['求', 'f', 'x', '2x', '的值']
+    assert tokenize('ＡＢＣ，水') == ['abc', '水']
+
+    index = BM25Index()
+    index.load_documents([
+        (1, '光合作用的主要场所是什么？\n光合作用在叶绿体中进行，叶绿体是植物细胞特有的细胞器。'),
+        (2, '细胞呼吸的主要场所是什么？\n有氧呼吸主要在线粒体中进行。'),
+        (3, '一元二次方程 x^2-5x+6=0 的解是多少？\n因式分解得 (x-2)(x-3)=0。'),
+    ])
+
+    # 2. 与题目基本相同的问题覆盖率接近1，排在第一位
+    start = time.perf_counter()
+    hits = index.search('光合作用的主要场所是什么')
+    print(f"   检索耗时: {(time.perf_counter() - start) * 1000:.3f} ms, 结果: {hits}")
+    assert hits[0][0] == 1 and hits[0][2] > 0.9
+    assert hits[1][0] == 2 and hits[1][2] < hits[0][2]
+
+    # 3. 只有部分词语相关时覆盖率较低
+    partial = index.search('叶绿体和线粒体有什么区别')
+    assert {doc_id for doc_id, _, _ in partial} == {1, 2}
+    assert all(coverage < 0.9 for _, _, coverage in partial)
+    assert index.search('今天天气怎么样') == []
+
+    # 4. 增量添加和删除
+    index.add(4, '光合作用的主要场所是叶绿体吗？')
+    assert 4 in {doc_id for doc_id, _, _ in index.search('光合作用的主要场所')}
+    index.remove(1)
+    index.remove(4)
+    assert 1 not in {doc_id for doc_id, _, _ in index.search('光合作用的主要场所是什么')}
+    assert index.stats()['documents'] == 2
+
+    print("=== 测试完成 ===")
+
+def test_unsubmitted_paper_quizzes_withheld():
+    """已发布试卷中学生还没有交卷的题目不直接回答，也不作为参考资料"""
+    print("=== 未交卷试卷题目保护测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    question = f'{marker} 地球绕太阳公转一周大约需要多少天'
+    paper = None
+    with app.app_context():
+        quiz = Quiz.add_quiz(question, f'{marker}答案365天', f'{marker}解析')
+        try:
+            paper = Paper.add_paper(f'{marker} 期末考试', status='published')
+            PaperQuiz.replace_paper_quizzes(paper.id, [(quiz.id, 1)])
+
+            # 1. 未交卷：不返回答案，参考资料中也没有该题
+            direct_answer, passages = retrieve_for_chat(question, student_id=f'{marker}-a')
+            assert direct_answer is None and quiz not in passages
+            prompt = add_reference_context([{'role': 'user', 'content': question}], passages)
+            assert f'{marker}答案' not in str(prompt)
+
+            # 2. 交卷后可以直接用题目回答
+            ExamRecord.add_exam_record(f'{marker}-a', paper.id, 1, 1, 1, 1, 1)
+            direct_answer, passages = retrieve_for_chat(question, student_id=f'{marker}-a')
+            print(f"   交卷后直接回答: {direct_answer is not None}")
+            assert f'{marker}答案' in direct_answer and passages[0].id == quiz.id
+
+            # 3. 其他学生仍然看不到
+            assert retrieve_for_chat(question, student_id=f'{marker}-b') == (None, [])
+        finally:
+            ExamRecord.query.filter(ExamRecord.student_id.like(f'{marker}-%')).delete()
+            PaperQuiz.query.filter_by(quiz_id=quiz.id).delete()
+            db.session.commit()
+            if paper:
+                Paper.delete_paper(paper.id)
+            Quiz.delete_quiz(quiz.id)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_retrieval()
+    test_unsubmitted_paper_quizzes_withheld()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题库全文检索测试脚本
+"""
+
+import uuid
+from app import app
+from models import db
+from models.quiz import Quiz
+
+def test_quiz_search():
+    """测试全文检索、触发器同步、短关键词和分页接口"""
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        print("=== 题库搜索测试 ===")
+        quizzes = Quiz.add_quizzes([
+            {'content': f'{marker} 光合作用的主要场所是什么？', 'answer': '叶绿体', 'analysis': '光合作用在叶绿体中进行'},
+            {'content': f'{marker} 细胞呼吸的主要场所是什么？', 'answer': '线粒体', 'analysis': None},
+        ])
+        ids = [quiz.id for quiz in quizzes]
+        try:
+            # 1. 新增题目由触发器同步到索引，可按内容和解析检索
+            found, total = Quiz.search_quizzes(f'{marker} 光合作用')
+            print(f"   检索结果: {[quiz.id for quiz in found]} / {total}")
+            assert [quiz.id for quiz in found] == [ids[0]] and total == 1
+            found, total = Quiz.search_quizzes(f'{marker} 主要场所', per_page=1)
+            assert total == 2 and len(found) == 1
+
+            # 2. 少于3个字的关键词退回LIKE查询
+            found, total = Quiz.search_quizzes(f'{marker} 线粒')
+            assert [quiz.id for quiz in found] == [ids[1]]
+
+            # 3. 修改题目后索引同步更新
+            quizzes[1].content = f'{marker} 有氧呼吸分几个阶段？'
+            db.session.commit()
+            assert Quiz.search_quizzes(f'{marker} 细胞呼吸')[1] == 0
+            assert Quiz.search_quizzes(f'{marker} 有氧呼吸')[1] == 1
+
+            # 4. 搜索接口返回分页信息
+            with app.test_client() as client:
+                data = client.get('/teacher/api/quizzes/search',
+                                  query_string={'q': marker, 'per_page': 1, 'page': 2}).get_json()
+            assert data['success'] and data['total'] == 2 and data['pages'] == 2 and len(data['quizzes']) == 1
+        finally:
+            for quiz_id in ids:
+                Quiz.delete_quiz(quiz_id)
+
+        # 5. 删除后不再出现在结果中
+        assert Quiz.search_quizzes(marker)[1] == 0
+        print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_search()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式出题结果增量解析测试脚本
+"""
+
+import json
+from services.quiz_stream_parser import QuizStreamParser
+
+def feed_in_pieces(parser, text, size):
+    """按固定长度分段喂给解析器，记录每道题在第几段时解析出来"""
+    results = []
+    for index in range(0, len(text), size):
+        for item in parser.feed(text[index:index + size]):
+            results.append((index // size, item))
+    return results
+
+def test_quiz_stream_parser():
+    """测试题目对象闭合即返回、错误对象单独丢弃、字符串中的括号不影响解析"""
+    print("=== 流式出题解析测试 ===")
+
+    quizzes = [
+        {"id": 1, "content": "下列哪个是{质数}？A. 4, B. 6, C. 7, D. 9", "answer": "C", "analysis": "7只能被1和\"7\"整除"},
+        {"id": 2, "content": "数组 [1, 2] 的长度是多少？", "answer": "2", "analysis": "含有两个元素"},
+        {"id": 3, "content": "1+1=?", "answer": "2", "analysis": "基本加法"}
+    ]
+    text = '```json\n' + json.dumps({"quizzes": quizzes}, ensure_ascii=False, indent=2) + '\n```'
+
+    # 1. 分段接收时每道题闭合后立即返回，且早于整段结束
+    parser = QuizStreamParser()
+    results = feed_in_pieces(parser, text, 7)
+    assert [item for _, item in results] == quizzes
+    last_piece = (len(text) - 1) // 7
+    assert results[0][0] < last_piece
+    print(f"   第1道题在第 {results[0][0]} 段解析完成（共 {last_piece + 1} 段）")
+
+    # 2. 格式错误的题目只丢弃这一道
+    broken = '{"quizzes": [{"content": "a", "answer": "A"}, {"content": "b", "answer": }, {"content": "c", "answer": "C"}]}'
+    parser = QuizStreamParser()
+    items = parser.feed(broken)
+    assert [item['content'] for item in items] == ['a', 'c']
+    assert parser.invalid == 1
+
+    # 3. 直接返回数组也可以解析；被截断的最后一道题不会返回
+    parser = QuizStreamParser()
+    items = parser.feed('[{"content": "a", "answer": "A"}, {"content": "b", "ans')
+    assert [item['content'] for item in items] == ['a']
+
+    # 4. 其他键下的数组不会被当作题目
+    parser = QuizStreamParser()
+    items = parser.feed('{"meta": [{"content": "x"}], "quizzes": [{"content": "y", "answer": "Y"}]}')
+    assert [item['content'] for item in items] == ['y']
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_quiz_stream_parser()
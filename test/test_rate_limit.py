@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+令牌桶限流测试脚本
+"""
+
+import os
+import time
+import tempfile
+import threading
+from flask import Flask, session, jsonify, Response
+from services.rate_limit import (
+    TokenBucket, MemoryLimiterStore, SQLiteLimiterStore, RateLimiter, RateLimitExceeded, rate_limited
+)
+
+def test_token_bucket():
+    """测试突发容量、等待时间和匀速补充"""
+    print("=== 令牌桶测试 ===")
+
+    # 1. 容量内的突发请求立即通过，超出后给出需要等待的时间
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert all(bucket.try_acquire()[0] for _ in range(3))
+    ok, wait = bucket.try_acquire()
+    assert not ok and 0 < wait <= 0.05 + 1e-6
+    print(f"   需等待: {wait * 1000:.1f} ms")
+
+    # 2. 阻塞获取按速率放行
+    start = time.monotonic()
+    for _ in range(4):
+        assert bucket.acquire()
+    elapsed = time.monotonic() - start
+    print(f"   4个令牌耗时: {elapsed * 1000:.0f} ms")
+    assert 0.15 <= elapsed < 0.5
+
+    # 3. 超时返回False
+    slow = TokenBucket(rate=0.1, capacity=1)
+    assert slow.acquire(timeout=0.01)
+    assert not slow.acquire(timeout=0.01)
+
+    print("=== 测试完成 ===")
+
+def test_limiter_stores():
+    """测试内存和SQLite两种存储的令牌桶与并发名额"""
+    print("=== 限流存储测试 ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rate_limit.db')
+        for store in (MemoryLimiterStore(), SQLiteLimiterStore(path)):
+            # 1. 不同用户的令牌桶相互独立
+            assert store.try_acquire('a', rate=1, capacity=2)[0]
+            assert store.try_acquire('a', rate=1, capacity=2)[0]
+            ok, wait = store.try_acquire('a', rate=1, capacity=2)
+            assert not ok and 0 < wait <= 1
+            assert store.try_acquire('b', rate=1, capacity=2)[0]
+
+            # 2. 并发名额用完后拒绝，释放后可再次占用
+            leases = [store.acquire_slot('llm', 2, 60) for _ in range(2)]
+            assert all(leases) and store.acquire_slot('llm', 2, 60) is None
+            assert store.in_flight('llm') == 2
+            store.release_slot('llm', leases[0])
+            assert store.acquire_slot('llm', 2, 60) is not None
+
+        # 3. SQLite存储在多个实例（模拟多个进程）之间共享，过期的租约自动回收
+        first, second = SQLiteLimiterStore(path), SQLiteLimiterStore(path)
+        assert not second.try_acquire('a', rate=1, capacity=2)[0]
+        assert first.acquire_slot('short', 1, -1) is not None
+        assert second.acquire_slot('short', 1, 60) is not None
+
+        # 4. 退回令牌后可以再次取得，不超过桶容量
+        first.refund('a', rate=1, capacity=2)
+        assert first.try_acquire('a', rate=1, capacity=2)[0]
+
+    # 5. 进程内存储定期清理已补满的令牌桶，未补满的保留
+    store = MemoryLimiterStore(sweep_interval=0)
+    store.try_acquire('idle', rate=1000, capacity=1)
+    time.sleep(0.01)
+    store.try_acquire('busy', rate=0.001, capacity=1)
+    store.try_acquire('other', rate=0.001, capacity=1)
+    print(f"   清理后的令牌桶: {sorted(store._buckets)}")
+    assert sorted(store._buckets) == ['busy', 'other']
+
+    # 6. SQLite存储同样定期删除已补满的令牌桶，退回令牌后提前补满的桶也会被删除
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteLimiterStore(os.path.join(tmp, 'rate_limit.db'), sweep_interval=0)
+        store.try_acquire('idle', rate=1000, capacity=1)
+        store.try_acquire('refunded', rate=0.001, capacity=1)
+        store.refund('refunded', rate=0.001, capacity=1)
+        time.sleep(0.01)
+        store.try_acquire('busy', rate=0.001, capacity=1)
+        assert store.bucket_count() == 1
+        assert not store.try_acquire('busy', rate=0.001, capacity=1)[0]
+    print("=== 测试完成 ===")
+
+def test_rate_limited_decorator():
+    """测试超出限制时立即返回429，流式响应结束后才释放名额"""
+    print("=== 接口限流测试 ===")
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', RATE_LIMIT_ENABLED=True)
+    limiter = RateLimiter(MemoryLimiterStore(), user_rate=0.5, user_burst=2,
+                          endpoint_rate=100, endpoint_burst=100, max_in_flight=1)
+    app.extensions['rate_limiter'] = limiter
+    release_stream = threading.Event()
+
+    @app.route('/login/<student_id>')
+    def login(student_id):
+        session['student_id'] = student_id
+        return 'ok'
+
+    @app.route('/chat', methods=['POST'])
+    @rate_limited('chat')
+    def chat():
+        return jsonify({'success': True})
+
+    @app.route('/stream', methods=['POST'])
+    @rate_limited('stream')
+    def stream():
+        def generate():
+            yield 'data: start\n\n'
+            release_stream.wait(5)
+            yield 'data: done\n\n'
+        return Response(generate(), mimetype='text/event-stream')
+
+    def post(client, url):
+        # WSGI服务器在响应输出完毕后调用close()，名额在此时释放
+        response = client.post(url)
+        response.close()
+        return response
+
+    alice, bob = app.test_client(), app.test_client()
+    alice.get('/login/alice')
+    bob.get('/login/bob')
+
+    # 1. 突发次数用完后返回429和Retry-After，其他学生不受影响
+    assert [post(alice, '/chat').status_code for _ in range(3)] == [200, 200, 429]
+    response = post(alice, '/chat')
+    print(f"   Retry-After: {response.headers['Retry-After']}")
+    assert response.status_code == 429 and int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['success'] is False
+    assert post(bob, '/chat').status_code == 200
+
+    # 2. 流式响应输出期间占用名额，其他请求立即被拒绝
+    started = time.monotonic()
+    streaming = bob.post('/stream', buffered=False)
+    assert limiter.stats()['in_flight'] == 1
+    assert post(alice, '/stream').status_code == 429
+    assert time.monotonic() - started < 1
+    release_stream.set()
+    assert streaming.get_data() == b'data: start\n\ndata: done\n\n'
+    streaming.close()
+    assert limiter.stats()['in_flight'] == 0
+    # 因名额已满被拒绝的请求退回了令牌，突发次数仍然完整
+    assert [post(alice, '/stream').status_code for _ in range(2)] == [200, 200]
+    print(f"   统计: {limiter.stats()}")
+    assert limiter.stats()['rejected'] == {'user': 2, 'endpoint': 0, 'in_flight': 1}
+
+    # 3. 未超出速率时 check 不抛异常
+    try:
+        limiter.check('other', 'student:carol')
+    except RateLimitExceeded:
+        assert False, '不应限流'
+
+    # 4. 后台任务等待名额而不是直接失败，等待超时时抛出 RateLimitExceeded
+    release = limiter.acquire_slot()
+    try:
+        with limiter.hold_slot(timeout=0.05):
+            assert False, '名额已满时不应进入'
+    except RateLimitExceeded:
+        pass
+    threading.Timer(0.1, release).start()
+    with limiter.hold_slot(timeout=5):
+        assert limiter.stats()['in_flight'] == 1
+    assert limiter.stats()['in_flight'] == 0
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_token_bucket()
+    test_limiter_stores()
+    test_rate_limited_decorator()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学生AI分析报告复用测试脚本（使用本地模拟大模型服务，不访问外网）
+"""
+
+import os
+import uuid
+from app import app
+from config import Config
+from models import db
+from models import student_analysis_report
+from models.answer import Answer
+from models.exam_record import ExamRecord
+from models.background_job import BackgroundJob
+from models.student_analysis_report import StudentAnalysisReport
+from services import llm_gateway
+from services.llm_gateway import LLMGateway
+from services.student_analysis import run_batch_analysis_job
+from mock_llm_server import MockLLMServer
+
+def test_student_analysis_report():
+    """测试数据不变时沿用已保存的报告，考试、答题、判分、模型或提示词版本变化时重新生成"""
+    print("=== 学生AI分析报告复用测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    student_id = f'{marker}-s'
+    server = MockLLMServer()
+    server.start()
+    original = (Config.DEEPSEEK_API_KEY, llm_gateway._gateway, llm_gateway._gateway_pid)
+    Config.DEEPSEEK_API_KEY = 'test'
+    llm_gateway._gateway = LLMGateway(api_key='test', base_url=server.base_url, max_retries=0,
+                                      breaker_threshold=100, breaker_cooldown=1)
+    llm_gateway._gateway_pid = os.getpid()
+    client = app.test_client()
+    requests_sent = [0]
+
+    def analyze(**extra):
+        # 每次使用不同的老师账号，避免触发接口限流
+        requests_sent[0] += 1
+        with client.session_transaction() as sess:
+            sess['teacher_id'] = f'{marker}-t{requests_sent[0]}'
+        response = client.post('/teacher/api/generate_student_analysis', json=dict(student_id=student_id, **extra))
+        # WSGI服务器在输出完毕后调用close()，限流名额在此时释放
+        response.close()
+        data = response.get_json()
+        assert data['success'], data
+        return data
+
+    with app.app_context():
+        try:
+            # 1. 没有考试记录时不调用大模型
+            response = client.post('/teacher/api/generate_student_analysis', json={'student_id': student_id})
+            response.close()
+            assert not response.get_json()['success'] and server.calls == 0
+
+            ExamRecord.add_exam_record(student_id, 900001, 2, 2, 1, 5, 10)
+            answer = Answer.add_answer(student_id, 900001, 1, 'A', True, 5)
+            Answer.add_answer(student_id, 900001, 2, 'B', False, 0)
+
+            # 2. 首次生成并保存，数据不变时直接返回已保存的报告
+            first = analyze()
+            assert first['cached'] is False and server.calls == 1
+            second = analyze()
+            assert second['cached'] is True and second['analysis'] == first['analysis'] and server.calls == 1
+
+            # 3. 新的答题记录、重新判分、新的考试记录都会使报告失效
+            fingerprint = StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL)
+            Answer.add_answer(student_id, 900001, 3, 'C', True, 5)
+            assert analyze()['cached'] is False and server.calls == 2
+            answer.is_correct, answer.score = False, 0
+            db.session.commit()
+            assert analyze()['cached'] is False and server.calls == 3
+            ExamRecord.add_exam_record(student_id, 900002, 1, 1, 1, 5, 5)
+            assert analyze()['cached'] is False and server.calls == 4
+            assert analyze()['cached'] is True and server.calls == 4
+            assert StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL) != fingerprint
+
+            # 4. 更换模型或提示词版本时指纹变化；refresh 强制重新生成
+            current = StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL)
+            assert StudentAnalysisReport.compute_fingerprint(student_id, 'other-model') != current
+            version = student_analysis_report.ANALYSIS_REPORT_VERSION
+            student_analysis_report.ANALYSIS_REPORT_VERSION = version + '-test'
+            try:
+                assert StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL) != current
+            finally:
+                student_analysis_report.ANALYSIS_REPORT_VERSION = version
+            assert analyze(refresh=True)['cached'] is False and server.calls == 5
+
+            # 5. 批量分析沿用有效报告，数据变化后只为该学生重新生成
+            job = BackgroundJob.add_job('test_student_analysis_report')
+            run_batch_analysis_job(job, [student_id], False, Config.DEEPSEEK_MODEL, 1, 600)
+            assert job.get_result()['cached'] == [student_id] and server.calls == 5
+            Answer.add_answer(student_id, 900002, 4, 'D', True, 5)
+            job = BackgroundJob.add_job('test_student_analysis_report')
+            run_batch_analysis_job(job, [student_id], False, Config.DEEPSEEK_MODEL, 1, 600)
+            print(f"   批量结果: {job.get_result()}, 大模型调用次数: {server.calls}")
+            assert job.get_result()['generated'] == [student_id] and server.calls == 6
+            saved = StudentAnalysisReport.get_valid_report(
+                student_id, StudentAnalysisReport.compute_fingerprint(student_id, Config.DEEPSEEK_MODEL))
+            assert saved is not None
+        finally:
+            Config.DEEPSEEK_API_KEY, llm_gateway._gateway, llm_gateway._gateway_pid = original
+            server.stop()
+            Answer.query.filter_by(student_id=student_id).delete()
+            ExamRecord.query.filter_by(student_id=student_id).delete()
+            StudentAnalysisReport.query.filter_by(student_id=student_id).delete()
+            BackgroundJob.query.filter_by(kind='test_student_analysis_report').delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_student_analysis_report()
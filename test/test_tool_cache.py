@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具内容缓存测试脚本
+"""
+
+import os
+import time
+import tempfile
+from services.tool_cache import ToolContentCache
+
+def test_tool_cache():
+    """测试工具内容缓存的命中、失效和容量限制"""
+    print("=== 工具内容缓存测试 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_a = os.path.join(tmp_dir, 'a.html')
+        path_b = os.path.join(tmp_dir, 'b.html')
+        with open(path_a, 'w', encoding='utf-8') as f:
+            f.write('<html>' + '工具A' * 1000 + '</html>')
+        with open(path_b, 'w', encoding='utf-8') as f:
+            f.write('<html>工具B</html>')
+
+        cache = ToolContentCache(max_bytes=10 * 1024, max_entry_bytes=8 * 1024, revalidate_seconds=0)
+
+        # 1. 首次加载与再次命中
+        entry = cache.get(path_a)
+        assert 'gzip' in entry.variants
+        assert cache.get(path_a) is entry
+        print(f"   命中统计: {cache.stats()}")
+
+        # 2. 文件修改后重新加载
+        with open(path_a, 'w', encoding='utf-8') as f:
+            f.write('<html>新版本</html>')
+        os.utime(path_a, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        new_entry = cache.get(path_a)
+        assert new_entry is not entry
+        assert new_entry.body == '<html>新版本</html>'.encode('utf-8')
+        assert new_entry.etag != entry.etag
+
+        # 3. 超过容量时淘汰最久未使用的条目
+        cache.max_bytes = len(new_entry.body)
+        cache.get(path_b)
+        assert cache.stats()['entries'] == 1
+        assert cache.stats()['total_bytes'] <= cache.max_bytes
+
+        # 4. 主动失效
+        cache.invalidate(path_b)
+        assert cache.stats()['entries'] == 0
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_tool_cache()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具文件存储测试脚本
+"""
+
+import io
+import os
+import uuid
+import tempfile
+import threading
+from werkzeug.datastructures import FileStorage
+from app import app
+from models import db
+from models.tool import Tool
+from services.tool_storage import store_upload, release_file
+
+def upload(folder, content, name, creator):
+    """模拟上传：保存文件并登记工具，返回工具"""
+    file = FileStorage(stream=io.BytesIO(content), filename=f'{name}.html')
+    with store_upload(file, folder, 'html', chunk_size=7) as (file_path, content_hash, size):
+        return Tool.add_tool(name=name, description='', file_path=file_path, file_name=f'{name}.html',
+                             file_size=size, creator=creator, content_hash=content_hash)
+
+def test_tool_storage():
+    """测试相同内容去重、引用计数释放、登记失败时清理文件以及并发上传和删除"""
+    print("=== 工具文件存储测试 ===")
+    creator = f'test-{uuid.uuid4().hex[:8]}'
+    content = f'<html>{creator}</html>'.encode('utf-8')
+    with app.app_context(), tempfile.TemporaryDirectory() as folder:
+        try:
+            # 1. 相同内容只保存一份，不同内容各自保存
+            first = upload(folder, content, 'a', creator)
+            second = upload(folder, content, 'b', creator)
+            other = upload(folder, content + b'!', 'c', creator)
+            assert first.file_path == second.file_path != other.file_path
+            assert Tool.count_file_references(first.file_path) == 2
+            assert len([name for name in os.listdir(folder) if name.endswith('.html')]) == 2
+
+            # 2. 还有其他工具引用时不删除文件，最后一个引用删除后才删除
+            file_path = first.file_path
+            first.delete_tool()
+            assert not release_file(file_path) and os.path.exists(file_path)
+            second.delete_tool()
+            assert release_file(file_path) and not os.path.exists(file_path)
+
+            # 3. 登记工具失败或中途放弃时删除未被引用的文件，已被引用的文件保留
+            file = FileStorage(stream=io.BytesIO(b'<html>orphan</html>'), filename='orphan.html')
+            try:
+                with store_upload(file, folder, 'html') as (orphan_path, _, _):
+                    raise RuntimeError('写入工具记录失败')
+            except RuntimeError:
+                pass
+            assert not os.path.exists(orphan_path)
+            file = FileStorage(stream=io.BytesIO(content + b'!'), filename='c.html')
+            with store_upload(file, folder, 'html') as (shared_path, _, _):
+                pass
+            assert shared_path == other.file_path and os.path.exists(shared_path)
+            assert [name for name in os.listdir(folder) if name.endswith('.tmp')] == []
+
+            # 4. 并发上传和删除同一内容：工具记录存在时文件一定存在
+            missing = []
+
+            def worker(index):
+                with app.app_context():
+                    for round_index in range(10):
+                        tool = upload(folder, content, f'w{index}-{round_index}', creator)
+                        if not os.path.exists(tool.file_path):
+                            missing.append(tool.name)
+                        path = tool.file_path
+                        tool.delete_tool()
+                        release_file(path)
+
+            threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            print(f"   文件缺失次数: {len(missing)}")
+            assert not missing
+            assert Tool.count_file_references(file_path) == 0 and not os.path.exists(file_path)
+        finally:
+            Tool.query.filter_by(creator=creator).delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_tool_storage()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URL链接工具跳转地址测试脚本
+"""
+
+import io
+import os
+import uuid
+import tempfile
+from app import app
+from models import db
+from models.tool import Tool
+from models.migrations import backfill_tool_target_urls
+from services.tool_storage import release_file
+
+def test_tool_target_url():
+    """测试上传时解析跳转地址，以及旧数据回填只处理一次"""
+    print("=== URL链接工具跳转地址测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context(), tempfile.TemporaryDirectory() as folder:
+        client = app.test_client()
+        try:
+            # 1. 上传URL链接文件时解析跳转地址，预览时直接重定向
+            content = f'<html><a href="https://example.com/{marker}">链接</a></html>'.encode('utf-8')
+            response = client.post('/teacher/toolbox/upload', data={
+                'name': f'{marker} 链接', 'file': (io.BytesIO(content), f'url_{marker}.html')
+            }, content_type='multipart/form-data')
+            assert response.status_code == 302
+            tool = Tool.query.filter_by(name=f'{marker} 链接').one()
+            assert tool.target_url == f'https://example.com/{marker}'
+            response = client.get(f'/teacher/toolbox/tool/{tool.id}/preview')
+            assert response.status_code == 302 and response.headers['Location'] == tool.target_url
+
+            # 2. 解析不出地址的上传被拒绝，不留下工具记录和文件
+            empty = b'\n  \n'
+            client.post('/teacher/toolbox/upload', data={
+                'name': f'{marker} 空链接', 'file': (io.BytesIO(empty), f'url_{marker}_empty.html')
+            }, content_type='multipart/form-data')
+            assert Tool.query.filter_by(name=f'{marker} 空链接').count() == 0
+
+            # 3. 旧数据回填：能解析的写入地址，文件缺失或内容为空的记为空字符串
+            def legacy(name, text):
+                path = os.path.join(folder, f'{name}.html')
+                if text is not None:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                return Tool.add_tool(name=f'{marker} {name}', description='', file_path=path,
+                                     file_name=f'url_{name}.html', file_size=0, creator=marker)
+
+            parsed = legacy('parsed', 'example.org/old')
+            missing = legacy('missing', None)
+            blank = legacy('blank', '  \n')
+            backfill_tool_target_urls()
+            db.session.expire_all()
+            print(f"   回填结果: {[parsed.target_url, missing.target_url, blank.target_url]}")
+            assert parsed.target_url == 'http://example.org/old'
+            assert missing.target_url == '' and blank.target_url == ''
+
+            # 4. 再次启动时不再处理已回填的工具
+            with open(blank.file_path, 'w', encoding='utf-8') as f:
+                f.write('https://example.net/')
+            backfill_tool_target_urls()
+            db.session.expire_all()
+            assert blank.target_url == ''
+            assert Tool.query.filter(Tool.creator == marker, Tool.target_url.is_(None)).count() == 0
+        finally:
+            for tool in Tool.query.filter(Tool.name.like(f'{marker}%')).all():
+                file_path = tool.file_path
+                tool.delete_tool()
+                if tool.creator != marker:
+                    release_file(file_path)
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_tool_target_url()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具浏览次数合并写入测试脚本
+"""
+
+import os
+import sys
+import time
+import uuid
+import subprocess
+from sqlalchemy import event
+from app import app
+from models import db
+from models.tool import Tool
+from services.view_counter import ViewCounter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_view_counter():
+    """测试批量写入、读取时包含待写入次数、达到上限提前写入和进程退出时写入"""
+    print("=== 工具浏览次数测试 ===")
+    marker = uuid.uuid4().hex[:8]
+    with app.app_context():
+        tools = [Tool.add_tool(name=f'{marker} 工具{i}', description='', file_path=f'{marker}-{i}.html',
+                               file_name=f'{marker}-{i}.html', file_size=0, creator=marker) for i in range(3)]
+        ids = [tool.id for tool in tools]
+        original = app.extensions['view_counter']
+        # 使用未启动后台线程的缓冲区，写入时机完全由测试控制
+        counter = app.extensions['view_counter'] = ViewCounter(app, flush_interval=60, max_pending=10 ** 6)
+
+        def views(tool_id):
+            db.session.expire_all()
+            return Tool.get_tool_by_id(tool_id).views or 0
+
+        try:
+            # 1. 浏览只计入内存，读取实时次数时包含待写入的部分
+            for _ in range(5):
+                tools[0].increment_views()
+            tools[1].increment_views()
+            assert views(ids[0]) == 0 and counter.get_pending(ids[0]) == 5
+            assert Tool.get_tool_by_id(ids[0]).get_live_views() == 5
+
+            # 2. 多个工具的计数合并为一条批量UPDATE写入
+            statements = []
+            listener = lambda *args: statements.append((args[2], args[5]))
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                assert counter.flush() == 2
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            updates = [(statement, many) for statement, many in statements if statement.startswith('UPDATE tools')]
+            print(f"   UPDATE语句: {len(updates)}, executemany: {updates[0][1]}")
+            assert len(updates) == 1
+            assert views(ids[0]) == 5 and views(ids[1]) == 1 and counter.get_pending(ids[0]) == 0
+            assert Tool.get_tool_by_id(ids[0]).get_live_views() == 5
+            assert counter.flush() == 0
+
+            # 3. 缓冲次数达到上限时后台线程提前写入，不等待定期写入的间隔
+            eager = ViewCounter(app, flush_interval=60, max_pending=3)
+            eager.start()
+            for _ in range(3):
+                eager.increment(ids[2])
+            deadline = time.monotonic() + 5
+            while views(ids[2]) < 3 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert views(ids[2]) == 3
+
+            # 4. 进程正常退出时写入剩余计数（定期写入间隔设为很长，只能由退出时写入）
+            script = (
+                'from app import app\n'
+                'from models.tool import Tool\n'
+                'with app.app_context():\n'
+                f'    tool = Tool.get_tool_by_id({ids[1]})\n'
+                '    for _ in range(4):\n'
+                '        tool.increment_views()\n'
+            )
+            env = dict(os.environ, TOOL_VIEWS_FLUSH_SECONDS='3600')
+            subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True, timeout=60)
+            assert views(ids[1]) == 5
+        finally:
+            app.extensions['view_counter'] = original
+            Tool.query.filter_by(creator=marker).delete()
+            db.session.commit()
+
+    print("=== 测试完成 ===")
+
+if __name__ == '__main__':
+    test_view_counter()